@@ -0,0 +1,55 @@
+'''
+Benchmark of the multi-period dispatch model assembly: dense generator expressions against the sparse
+(nonzeros only) power balance assembly of RAUtilities.OptDispatchMP. Also checks that both give identical
+load curtailment and SOC profiles.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_assembly.py --model Nodal --periods 24 --windows 3 --solver appsi_highs
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_utilities import RAUtilities
+from bench_system import load_system, random_window, BMva
+
+def run(model, time_periods, windows, solver, seed):
+
+    sys_data = load_system(model, 'multi_period')
+    ng, nl, nz, ness = sys_data["ng"], sys_data["nl"], sys_data["nz"], sys_data["ness"]
+    rng = np.random.default_rng(seed)
+    window_data = [random_window(sys_data, rng, time_periods) for _ in range(windows)]
+
+    results = {}
+    for name, sparse_assembly in [("dense", False), ("sparse", True)]:
+        raut = RAUtilities(dispatch_solver=solver, sparse_assembly=sparse_assembly)
+        SOC_old = 0.5*sys_data["ess_pmax"]*sys_data["ess_duration"]/BMva
+        curt, soc = [], []
+        tic = perf_counter()
+        for net_load, fb_Pg, fb_flow, fb_ess, fb_soc, fb_ren in window_data:
+            load_curt, SOC_profile, *_ = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, sys_data["A_inc"], \
+                                                            sys_data["gen_mat"], sys_data["curt_mat"], sys_data["ch_mat"], sys_data["gencost"], \
+                                                            net_load, SOC_old, sys_data["ess_pmax"], sys_data["ess_pmax"], sys_data["ess_eff"], \
+                                                            sys_data["disch_cost"], sys_data["ch_cost"], time_periods, model == 'Copper Sheet')
+            curt.append(load_curt)
+            soc.append(SOC_profile)
+        results[name] = ((perf_counter() - tic)/windows, np.concatenate(curt), np.hstack(soc))
+
+    print(f"Model: {model}, window: {time_periods} h, windows: {windows}, solver: {solver}")
+    print(f"  dense assembly  : {results['dense'][0]:8.3f} s/window")
+    print(f"  sparse assembly : {results['sparse'][0]:8.3f} s/window")
+    print(f"  speed-up        : {results['dense'][0]/results['sparse'][0]:8.1f}x")
+    print(f"  max |load_curt| difference: {np.max(np.abs(results['dense'][1] - results['sparse'][1])):.2e}")
+    print(f"  max |SOC| difference      : {np.max(np.abs(results['dense'][2] - results['sparse'][2])):.2e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Nodal", choices=["Copper Sheet", "Zonal", "Nodal"])
+    parser.add_argument("--periods", type=int, default=24)
+    parser.add_argument("--windows", type=int, default=3)
+    parser.add_argument("--solver", default="appsi_highs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.model, args.periods, args.windows, args.solver, args.seed)
@@ -0,0 +1,112 @@
+'''
+Regression check and benchmark of the batched sampler (MCS_batch) with solar data. A synthetic data set is written
+to a temporary directory: the bundled system data, a load proportional to the installed conventional capacity of
+every bus, and random solar cluster profiles of the bundled solar sites. The same run is then simulated in blocks
+of --batch samples and in blocks of one sample, and sample --replay alone (as with --replay-sample). Every sample
+draws from its own streams, so the indices of a sample must not depend on its block (up to the rounding of the
+vectorized sums). Reports the time per sample.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_batch.py --model Zonal --samples 8 --batch 4 --hours 720
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+from time import perf_counter
+import numpy as np
+import pandas as pd
+
+from progress.mod_mcs_utils import MCS_utils
+from progress.mod_batch import MCS_batch
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'progress', 'Data')
+
+def make_data(directory, hours, n_clusters, days, seed):
+    """
+    Writes the synthetic data set: System (bundled data and load.csv) and Solar (sites, clusters and probabilities).
+
+    Parameters:
+        directory (str): Data directory to write.
+        hours (int): Number of hours of the load.
+        n_clusters (int): Number of solar clusters.
+        days (int): Number of days of every cluster.
+        seed (int): Seed of the synthetic profiles.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory + '/System')
+    for f in ['gen.csv', 'branch.csv', 'bus.csv', 'storage.csv']:
+        shutil.copy(DATA_DIR + '/System/' + f, directory + '/System/' + f)
+
+    gen, bus = pd.read_csv(DATA_DIR + '/System/gen.csv'), pd.read_csv(DATA_DIR + '/System/bus.csv')
+    bus_cap = gen.groupby('Bus No.')['Max Cap'].sum().reindex(bus['Bus No.'], fill_value = 0).values
+    shape = 0.6 + 0.2*np.sin(2*np.pi*(np.arange(hours) % 24 - 9)/24) + 0.05*rng.standard_normal(hours)
+    load = pd.DataFrame(np.outer(shape, bus_cap), columns = bus['Bus Name'])
+    load.insert(0, 'datetime', pd.date_range('2020-01-01', periods = hours, freq = 'h'))
+    load.to_csv(directory + '/System/load.csv', index = False)
+
+    os.makedirs(directory + '/Solar')
+    shutil.copy(DATA_DIR + '/Solar/solar_sites.csv', directory + '/Solar/solar_sites.csv')
+    sites = pd.read_csv(DATA_DIR + '/Solar/solar_sites.csv')['Site Name']
+    daylight = np.clip(np.sin(np.pi*(np.arange(24) - 6)/12), 0, None)
+    for c in range(1, n_clusters + 1):
+        os.makedirs(directory + f'/Solar/Clusters/{c}')
+        for site in sites:
+            profile = np.outer(rng.uniform(0.2, 1.0, days), daylight)
+            pd.DataFrame(profile, columns = [str(h) for h in range(24)]).to_csv(directory + f'/Solar/Clusters/{c}/{site}.csv', index = False)
+    # probability of every cluster (rows) in every month (columns)
+    probs = rng.uniform(0.1, 1.0, (n_clusters, 12))
+    pd.DataFrame(probs/probs.sum(axis = 0)).to_csv(directory + '/Solar/solar_probs.csv', index = False)
+
+def run_batch(config, batch_size, replay=None):
+    """
+    Simulates the run of config with batched sampling, or only sample replay (0-based) of it.
+
+    Returns:
+        tuple: Indices recorder and the elapsed time.
+    """
+    mcs = MCS_utils(dict(config))
+    if replay is not None:
+        mcs.samples, mcs.sample_offset = 1, replay
+    mcs.initialize_params()
+    mcs.process_renewable_data()
+    mcs.setup_importance_sampling()
+    *_, indices_rec, LOL_track = mcs.process_matrices()
+    tic = perf_counter()
+    indices_rec, _, _ = MCS_batch(mcs, mcs.raut, batch_size).run(indices_rec, LOL_track)
+    return(indices_rec, perf_counter() - tic)
+
+def run(model, samples, batch, hours, load_factor, replay, seed):
+
+    with tempfile.TemporaryDirectory() as data:
+        make_data(data, hours, n_clusters = 3, days = 20, seed = seed)
+        config = {"data": data, "model": model, "samples": samples, "sim_hours": hours, "load_factor": load_factor, "optimization_period": 1, \
+                  "use_pcm": False, "dispatch_solver": "appsi_highs", "persistent_dispatch": True, "screen_adequate_hours": True, \
+                  "batch_samples": batch, "seed": seed}
+
+        print(f"Model: {model}, samples: {samples}, hours: {hours}, solar sites: {len(pd.read_csv(data + '/Solar/solar_sites.csv'))}")
+        print(f"{'blocks of':>10} {'s/sample':>9} {'mean LOLP':>10}")
+        runs = {}
+        for size in [batch, 1]:
+            runs[size], elapsed = run_batch(config, size)
+            print(f"{size:>10} {elapsed/samples:>9.3f} {np.mean(runs[size]['LOLP_rec']):>10.4f}")
+        alone, _ = run_batch(config, 1, replay = replay)
+
+    for index in ["LOLP_rec", "EUE_rec", "LOLF_rec"]:
+        assert np.allclose(runs[batch][index], runs[1][index], rtol = 1e-9, atol = 0), f"{index} depends on the block size"
+        assert np.isclose(runs[batch][index][replay], alone[index][0], rtol = 1e-9, atol = 0), f"{index} of sample {replay} differs when replayed alone"
+    print(f"per-sample indices agree in blocks of {batch} and of 1, and for sample {replay} replayed alone")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Zonal", choices=["Copper Sheet", "Zonal", "Nodal"])
+    parser.add_argument("--samples", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--hours", type=int, default=720)
+    parser.add_argument("--load-factor", type=float, default=1.0)
+    parser.add_argument("--replay", type=int, default=5, help="sample (0-based) replayed alone")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.model, args.samples, args.batch, args.hours, args.load_factor, args.replay, args.seed)
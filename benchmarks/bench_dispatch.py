@@ -0,0 +1,79 @@
+'''
+Benchmark of the single-period dispatch: RAUtilities.OptDispatch (model rebuilt every hour) against
+PersistentDispatch (model built once, bounds updated every hour) and HighsDispatch (LP passed to HiGHS directly,
+without Pyomo). Reports simulated hours per second and the largest load curtailment difference to OptDispatch.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_dispatch.py --model Zonal --hours 200 --solver appsi_highs
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_utilities import RAUtilities
+from progress.mod_dispatch import PersistentDispatch, HighsDispatch
+from bench_system import load_system, random_hour, bound_functions, BMva
+
+def run(model, hours, solver, seed):
+
+    sys_data = load_system(model)
+    ng, nl, nz, ness = sys_data["ng"], sys_data["nl"], sys_data["nz"], sys_data["ness"]
+    copper_sheet = model == 'Copper Sheet'
+    raut = RAUtilities(dispatch_solver=solver)
+
+    rng = np.random.default_rng(seed)
+    hourly_data = [random_hour(sys_data, rng) for _ in range(hours)]
+
+    def rebuild(current_cap, net_load, ess_smax, ess_smin, SOC_old):
+        fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(sys_data, current_cap, ess_smax, ess_smin)
+        return raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, sys_data["A_inc"], sys_data["gen_mat"], \
+                                sys_data["curt_mat"], sys_data["ch_mat"], sys_data["gencost"], net_load, SOC_old, sys_data["ess_pmax"], \
+                                sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"], copper_sheet)
+
+    tic = perf_counter()
+    dispatch = PersistentDispatch(ng, nz, nl, ness, BMva, sys_data["A_inc"], sys_data["gen_mat"], sys_data["curt_mat"], sys_data["ch_mat"], \
+                                  sys_data["gencost"], sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"], \
+                                  copper_sheet, solver)
+    build_time = perf_counter() - tic
+
+    def persistent(current_cap, net_load, ess_smax, ess_smin, SOC_old):
+        fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(sys_data, current_cap, ess_smax, ess_smin)
+        return dispatch.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old)
+
+    tic = perf_counter()
+    highs = HighsDispatch(ng, nz, nl, ness, BMva, sys_data["A_inc"], sys_data["gen_mat"], sys_data["curt_mat"], sys_data["ch_mat"], \
+                          sys_data["gencost"], sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"], copper_sheet)
+    highs_build_time = perf_counter() - tic
+
+    def direct(current_cap, net_load, ess_smax, ess_smin, SOC_old):
+        fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(sys_data, current_cap, ess_smax, ess_smin)
+        return highs.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old)
+
+    results = {}
+    for name, method in [("rebuild", rebuild), ("persistent", persistent), ("highs", direct)]:
+        SOC_old = 0.5*sys_data["ess_pmax"]*sys_data["ess_duration"]/BMva
+        curt = np.zeros(hours)
+        tic = perf_counter()
+        for n, (current_cap, net_load, ess_smax, ess_smin) in enumerate(hourly_data):
+            SOC_old = np.clip(SOC_old, ess_smin/BMva, ess_smax/BMva)
+            curt[n], SOC_old, *_ = method(current_cap, net_load, ess_smax, ess_smin, SOC_old)
+        results[name] = (hours/(perf_counter() - tic), curt)
+
+    print(f"Model: {model}, hours: {hours}, solver: {dispatch.dispatch_solver}")
+    print(f"  rebuild every hour : {results['rebuild'][0]:10.1f} hours/sec")
+    print(f"  persistent model   : {results['persistent'][0]:10.1f} hours/sec (one-time build {build_time:.3f} s)")
+    print(f"  highspy backend    : {results['highs'][0]:10.1f} hours/sec (one-time build {highs_build_time:.3f} s, {1e3/results['highs'][0]:.3f} ms/hour)")
+    print(f"  speed-up           : {results['persistent'][0]/results['rebuild'][0]:10.1f}x (persistent), {results['highs'][0]/results['rebuild'][0]:.1f}x (highspy)")
+    for name in ["persistent", "highs"]:
+        print(f"  max |load_curt| difference ({name}): {np.max(np.abs(results['rebuild'][1] - results[name][1])):.2e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Zonal", choices=["Copper Sheet", "Zonal", "Nodal"])
+    parser.add_argument("--hours", type=int, default=200)
+    parser.add_argument("--solver", default="appsi_highs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.model, args.hours, args.solver, args.seed)
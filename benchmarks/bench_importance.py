@@ -0,0 +1,83 @@
+'''
+Benchmark of importance sampling of generator outages: number of samples (years) needed to estimate LOLP with a
+COV of 5%, with plain sampling of the component-state timeline and with failure rate multipliers optimized by the
+cross-entropy method in the risk hours. Loss of load is evaluated with the copper-sheet capacity proxy of
+mod_importance.capacity_margin on the bundled RTS-GMLC generators, under a synthetic hourly load with seasonal
+and daily cycles peaking at --peak times the installed conventional capacity (the repository ships no load
+profile). The required samples are Var(x)/(COV^2 * E[x]^2) of the per-sample estimate x. In the full simulation
+a sample costs 8760 dispatch evaluations, so the sample reduction rather than the proxy time per sample sets the
+run time.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_importance.py --samples 2000 --peak 0.8
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from bench_system import load_system
+from progress.mod_importance import risk_hours, capacity_margin, cross_entropy_factors
+from progress.mod_timeline import StateTimeline
+
+SIM_HOURS = 8760
+
+def synthetic_load(pmax, peak):
+    """Hourly system load with a winter/summer and a daily cycle, peaking at peak*sum(pmax)."""
+    h = np.arange(SIM_HOURS)
+    shape = 0.75 + 0.15*np.cos(2*np.pi*(h/SIM_HOURS - 0.55)) + 0.10*np.sin(2*np.pi*((h % 24) - 8)/24)
+    return(peak*pmax.sum()*shape/shape.max())
+
+def estimate(sys_data, load, samples, rng, bias_factor=None, bias_hours=None):
+    """Per-sample weighted LOLP estimates and the sampling time per sample."""
+    ng, nl, ness = sys_data["ng"], sys_data["nl"], sys_data["ness"]
+    timeline = StateTimeline(ng, nl, ness, sys_data["lambda_tot"], sys_data["mu_tot"], sys_data["ess_units"], rng = rng, \
+                             bias_factor = bias_factor, bias_hours = bias_hours)
+    pmax = np.asarray(sys_data["pmax"], dtype = float)
+    x = np.zeros(samples)
+    tic = perf_counter()
+    for i in range(samples):
+        timeline.generate(SIM_HOURS)
+        x[i] = timeline.weight*np.mean(capacity_margin(timeline, pmax, load) < 0)
+    return(x, (perf_counter() - tic)/samples)
+
+def report(name, x, t_sample, target_cov):
+    mean = x.mean()
+    n_req = x.var()/(target_cov*mean)**2 if mean > 0 else np.inf
+    print(f"{name:<22} LOLP {mean:.3e}   single-sample COV {np.sqrt(x.var())/mean if mean > 0 else np.inf:6.2f}   "
+          f"samples for COV={target_cov:.0%}: {n_req:8.0f}   {t_sample*1e3:5.1f} ms/sample   max weight share {x.max()/x.sum() if x.sum() > 0 else 0:.3f}")
+    return(n_req)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=2000, help="samples per estimate")
+    parser.add_argument("--peak", type=float, default=0.8, help="peak load as a share of the installed conventional capacity")
+    parser.add_argument("--hours", type=float, default=0.02, help="share of the highest-load hours that are biased")
+    parser.add_argument("--lead", type=int, default=0, help="hours biased before each high-load hour")
+    parser.add_argument("--pilot", type=int, default=400, help="pilot samples per cross-entropy iteration")
+    parser.add_argument("--cov", type=float, default=0.05, help="target coefficient of variation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sys_data = load_system('Copper Sheet')
+    ng, nl, ness = sys_data["ng"], sys_data["nl"], sys_data["ness"]
+    load = synthetic_load(np.asarray(sys_data["pmax"], dtype = float), args.peak)
+    flags = risk_hours(load, args.hours, args.lead)
+    print(f"{ng} generators, peak load {load.max():.0f} MW, {flags.sum()} biased hours")
+
+    seeds = np.random.SeedSequence(args.seed).spawn(3)
+    x, t_plain = estimate(sys_data, load, args.samples, np.random.default_rng(seeds[0]))
+    n_plain = report("plain", x, t_plain, args.cov)
+
+    tic = perf_counter()
+    factors = cross_entropy_factors(ng, nl, ness, sys_data["lambda_tot"], sys_data["mu_tot"], sys_data["ess_units"], sys_data["pmax"], \
+                                    load, flags, np.random.default_rng(seeds[1]), pilot_samples = args.pilot)
+    t_ce = perf_counter() - tic
+    biased = factors[0:ng] > 1
+    print(f"cross-entropy: {t_ce:.1f} s, {biased.sum()} generators biased, multipliers up to {factors.max():.2f}")
+    x, t_is = estimate(sys_data, load, args.samples, np.random.default_rng(seeds[2]), factors, flags)
+    n_is = report("importance sampling", x, t_is, args.cov)
+    print(f"sample reduction: {n_plain/n_is:.1f}x")
+
+if __name__ == "__main__":
+    main()
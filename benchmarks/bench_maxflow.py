@@ -0,0 +1,66 @@
+'''
+Benchmark of the max-flow curtailment engine of the single-period Zonal/Nodal model: the same random hours are
+dispatched by PersistentDispatch (Pyomo), HighsDispatch (highspy) and MaxFlowCurtailment, which leaves the hours
+in which an ESS would be dispatched to HighsDispatch, as in the simulation. The line ratings can be scaled down so
+that the network binds. Reports the time per hour, the number of curtailed hours, the number of hours solved by the
+max flow and the largest load curtailment difference to HighsDispatch.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_maxflow.py --model Nodal --hours 2000 --line-scale 0.5
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_dispatch import PersistentDispatch, HighsDispatch
+from progress.mod_maxflow import MaxFlowCurtailment
+from bench_system import load_system, random_hour, bound_functions, BMva
+
+def run(model, hours, solver, line_scale, outage_prob, seed):
+
+    sys_data = load_system(model)
+    ng, nl, nz, ness = sys_data["ng"], sys_data["nl"], sys_data["nz"], sys_data["ness"]
+    sys_data["cap_max"][ng:ng + nl] *= line_scale
+    rng = np.random.default_rng(seed)
+    hour_data = [random_hour(sys_data, rng, load_level = (0.6, 1.0), outage_prob = outage_prob) for _ in range(hours)]
+    SOC_old = [rng.uniform(smin, smax)/BMva for _, _, smax, smin in hour_data]
+
+    args = (ng, nz, nl, ness, BMva, sys_data["A_inc"], sys_data["gen_mat"], sys_data["curt_mat"], sys_data["ch_mat"], sys_data["gencost"], \
+            sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"], False)
+    maxflow = MaxFlowCurtailment(ng, nz, nl, ness, BMva, sys_data["A_inc"], sys_data["gen_mat"], sys_data["gencost"], \
+                                 sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"])
+    engines = {"Pyomo persistent": PersistentDispatch(*args, solver), "highspy": HighsDispatch(*args), "max flow": maxflow}
+    fallback = HighsDispatch(*args)
+
+    print(f"Model: {model}, hours: {hours}, line ratings x{line_scale}")
+    print(f"{'dispatch':>17} {'ms/hour':>9} {'curtailed hours':>16}")
+    curt = {}
+    solved = 0
+    for name, engine in engines.items():
+        curt[name] = []
+        tic = perf_counter()
+        for (current_cap, net_load, ess_smax, ess_smin), SOC in zip(hour_data, SOC_old):
+            out = engine.solve(current_cap, net_load, SOC, ess_smax, ess_smin) if name == "max flow" else None
+            if out is None:
+                fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(sys_data, current_cap, ess_smax, ess_smin)
+                out = (fallback if name == "max flow" else engine).solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC)
+            elif name == "max flow":
+                solved += 1
+            curt[name].append(out[0])
+        elapsed = perf_counter() - tic
+        print(f"{name:>17} {elapsed/hours*1e3:>9.3f} {np.sum(np.array(curt[name]) > 1e-9):>16}")
+    print(f"hours solved by the max flow: {solved}/{hours}")
+    print(f"max |load_curt| difference to highspy: {np.max(np.abs(np.subtract(curt['max flow'], curt['highspy']))):.2e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Nodal", choices=["Zonal", "Nodal"])
+    parser.add_argument("--hours", type=int, default=2000)
+    parser.add_argument("--solver", default="appsi_highs")
+    parser.add_argument("--line-scale", type=float, default=1.0)
+    parser.add_argument("--outage-prob", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.model, args.hours, args.solver, args.line_scale, args.outage_prob, args.seed)
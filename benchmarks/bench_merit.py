@@ -0,0 +1,69 @@
+'''
+Benchmark of the merit-order dispatch of the Copper Sheet single-period model: the same random hours are
+dispatched by the highspy LP (HighsDispatch, one solve per hour), by MeritOrderDispatch (one hour at a time) and by
+MeritOrderDispatchBatch (all hours at once). The charge cost is set below efficiency x discharge cost so that the
+merit order applies (the built-in single-period costs do not allow it). Reports the time per hour and the largest
+difference of the load curtailment and of the SOC with respect to the LP.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_merit.py --hours 5000
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_dispatch import HighsDispatch
+from progress.mod_utilities import RAUtilities
+from bench_system import load_system, random_hour, bound_functions, BMva
+
+def run(hours, charge_ratio, seed):
+
+    sys_data = load_system('Copper Sheet')
+    ng, nl, nz, ness = sys_data["ng"], sys_data["nl"], sys_data["nz"], sys_data["ness"]
+    ch_cost = charge_ratio*sys_data["ess_eff"]*sys_data["disch_cost"]
+    raut = RAUtilities()
+    if not raut.MeritOrderApplicable(sys_data["gencost"], sys_data["ess_pmin"], sys_data["ess_eff"], sys_data["disch_cost"], ch_cost):
+        raise SystemExit("The merit order does not apply to these costs; use --charge-ratio below 1")
+    rng = np.random.default_rng(seed)
+    hour_data = [random_hour(sys_data, rng) for _ in range(hours)]
+    SOC_old = [rng.uniform(smin, smax)/BMva for _, _, smax, smin in hour_data]
+    costs = (sys_data["gencost"], sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], ch_cost)
+
+    print(f"Copper Sheet, hours: {hours}, ESS: {ness}")
+    print(f"{'dispatch':>22} {'ms/hour':>9}")
+    dispatch = HighsDispatch(ng, nz, nl, ness, BMva, sys_data["A_inc"], sys_data["gen_mat"], sys_data["curt_mat"], sys_data["ch_mat"], \
+                             sys_data["gencost"], sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], ch_cost, True)
+    lp = []
+    tic = perf_counter()
+    for (current_cap, net_load, ess_smax, ess_smin), SOC in zip(hour_data, SOC_old):
+        fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(sys_data, current_cap, ess_smax, ess_smin)
+        lp.append(dispatch.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC)[0:2])
+    print(f"{'LP (highspy)':>22} {(perf_counter() - tic)/hours*1e3:>9.4f}")
+
+    tic = perf_counter()
+    single = [raut.MeritOrderDispatch(ng, nl, BMva, current_cap, net_load, SOC, ess_smax, ess_smin, *costs)[0:2] \
+              for (current_cap, net_load, ess_smax, ess_smin), SOC in zip(hour_data, SOC_old)]
+    print(f"{'merit order':>22} {(perf_counter() - tic)/hours*1e3:>9.4f}")
+
+    cap_max = np.array([h[0]["max"] for h in hour_data])
+    net_load, ess_smax, ess_smin = (np.array([h[i] for h in hour_data]) for i in (1, 2, 3))
+    tic = perf_counter()
+    solved, load_curt, SOC_new, *_ = raut.MeritOrderDispatchBatch(ng, nl, BMva, cap_max, net_load, np.array(SOC_old), ess_smax, ess_smin, *costs)
+    print(f"{'merit order (batch)':>22} {(perf_counter() - tic)/hours*1e3:>9.4f}")
+
+    lp_curt, lp_SOC = np.array([c for c, _ in lp]), np.array([s for _, s in lp])
+    print(f"solved by the batch: {solved.sum()}/{hours}")
+    print(f"max |load_curt| difference: {np.max(np.abs(lp_curt - np.array([c for c, _ in single]))):.2e} (single), "
+          f"{np.max(np.abs(lp_curt[solved] - load_curt[solved])):.2e} (batch)")
+    print(f"max |SOC| difference: {np.max(np.abs(lp_SOC - np.array([s for _, s in single]))):.2e} (single), "
+          f"{np.max(np.abs(lp_SOC[solved] - SOC_new[solved])):.2e} (batch)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=5000)
+    parser.add_argument("--charge-ratio", type=float, default=0.9, help="charge cost as a fraction of efficiency x discharge cost")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.hours, args.charge_ratio, args.seed)
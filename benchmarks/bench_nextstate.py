@@ -0,0 +1,87 @@
+'''
+Microbenchmark of the component state sampler RAUtilities.NextState against the previous loop-based
+implementation for synthetic systems with 100, 1,000 and 10,000 components. Every call draws a new set of
+transition times (t_min = 0), which is the expensive path of the sampler.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_nextstate.py --calls 2000
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_utilities import RAUtilities
+
+def loop_next_state(t_min, ng, ness, nl, lambda_tot, mu_tot, current_state, cap_max, cap_min, ess_units):
+    """Sampling part of the previous RAUtilities.NextState (Python loops, arrays re-allocated for every event)."""
+    if t_min <= 0:
+        U = np.random.uniform(0, 1, ng + nl)
+        time_gt = np.zeros(ng + nl)
+        for u in range(ng + nl):
+            if current_state[u] == 1:
+                time_gt[u] = -np.log(U[u])/lambda_tot[u]
+            else:
+                time_gt[u] = -np.log(U[u])/mu_tot[u]
+
+        V_fail = np.random.uniform(0, 1, ness)
+        V_repair = np.random.uniform(0, 1, ness)
+        time_ess_fail = np.zeros(ness)
+        time_ess_repair = np.ones(ness)*1e7
+        for v in range(ness):
+            time_ess_fail[v] = -np.log(V_fail[v])/lambda_tot[ng + nl + v]
+            if current_state[ng + nl + v] < 1:
+                time_ess_repair[v] = -np.log(V_repair[v])/mu_tot[ng + nl + v]
+
+        time_ess = np.vstack((time_ess_fail, time_ess_repair))
+        time_all = np.append(time_gt, time_ess.min())
+        t_min = min(time_all)
+        index_min = np.argmin(time_all)
+        if index_min != time_all.size - 1 and t_min - 1 <= 0:
+            current_state[index_min] = 1 - current_state[index_min]
+
+    current_cap = {"max": np.multiply(current_state, cap_max), "min": np.multiply(current_state, cap_min)}
+    return(current_state, current_cap, t_min - 1)
+
+def synthetic_system(n_comp, rng):
+    """Random failure/repair rates and capacities; 80% generators, 15% lines, 5% ESS."""
+    ness = max(1, n_comp//20)
+    nl = n_comp*15//100
+    ng = n_comp - nl - ness
+    lambda_tot = 1/rng.uniform(500, 3000, n_comp)
+    mu_tot = 1/rng.uniform(10, 100, n_comp)
+    cap_max = rng.uniform(10, 500, n_comp)
+    cap_min = np.zeros(n_comp)
+    ess_units = np.full(ness, 10)
+    state = (rng.uniform(0, 1, n_comp) > 0.05).astype(float)
+    return ng, ness, nl, lambda_tot, mu_tot, state, cap_max, cap_min, ess_units
+
+def run(calls, seed):
+    rng = np.random.default_rng(seed)
+    print(f"{'components':>10} {'loop [us/call]':>15} {'vectorized [us/call]':>21} {'speed-up':>9}")
+    for n_comp in [100, 1000, 10000]:
+        ng, ness, nl, lambda_tot, mu_tot, state, cap_max, cap_min, ess_units = synthetic_system(n_comp, rng)
+        n_calls = max(20, calls*100//n_comp) if n_comp > 100 else calls
+
+        current_state = state.copy()
+        tic = perf_counter()
+        for _ in range(n_calls):
+            current_state, _, _ = loop_next_state(0, ng, ness, nl, lambda_tot, mu_tot, current_state, cap_max, cap_min, ess_units)
+        t_loop = (perf_counter() - tic)/n_calls
+
+        raut = RAUtilities(rng=np.random.default_rng(seed))
+        current_state = state.copy()
+        tic = perf_counter()
+        for _ in range(n_calls):
+            current_state, _, _ = raut.NextState(0, ng, ness, nl, lambda_tot, mu_tot, current_state, cap_max, cap_min, ess_units)
+        t_vec = (perf_counter() - tic)/n_calls
+
+        print(f"{n_comp:>10} {t_loop*1e6:>15.1f} {t_vec*1e6:>21.1f} {t_loop/t_vec:>8.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.calls, args.seed)
@@ -0,0 +1,90 @@
+'''
+Microbenchmark of the solar sampler for one simulated year (8760 hours): the previous loop-based
+RAUtilities.SolarPower, the vectorized SolarPower called hour by hour with the precomputed cluster distribution
+and zone matrix, and the whole-year generator SolarYear. Synthetic profiles with 100 and 1,000 sites in 20 zones
+and 6 clusters are used. All three draw the same uniforms, so the zonal outputs are checked to be identical.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_solar.py --hours 8760
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_utilities import RAUtilities
+
+CLUSTERS = 6
+
+def loop_solar_power(rng, state, n, nz, s_zone_no, solar_prob, s_profiles, s_sites, s_max):
+    """Previous RAUtilities.SolarPower (sorted zip table, cluster loop and nested zone loops)."""
+    if n%24 == 0:
+        month = np.floor(n/731).astype(int)
+        prob_col = solar_prob[:, month]
+        prob_index = np.array(list(zip(prob_col, range(len(prob_col)))))
+        sorted_prob = prob_index[prob_index[:, 0].argsort(kind = 'stable')]
+        sorted_prob[:, 0] = np.cumsum(sorted_prob[:, 0])
+        rand_clust = rng.uniform(0, 1)
+        for i in range(len(sorted_prob)):
+            if i == 0 and rand_clust < sorted_prob[i, 0]:
+                state["clust"] = int(sorted_prob[i, 1])
+                break
+            elif i > 0 and sorted_prob[i - 1, 0] < rand_clust < sorted_prob[i, 0]:
+                state["clust"] = int(sorted_prob[i, 1])
+                break
+        days = s_profiles[state["clust"]].shape[0]
+        rand_day = np.floor(rng.uniform(0, 1)*days).astype(int)
+        sgen_sites = np.zeros((s_sites, 24))
+        for sg in range(s_sites):
+            sgen_sites[sg] = s_profiles[state["clust"]][rand_day, :, sg]*s_max[sg]
+        state["s_zones"] = np.zeros((nz, 24))
+        for b in range(nz):
+            for z in range(len(s_zone_no)):
+                if b == s_zone_no[z] - 1:
+                    state["s_zones"][b] += sgen_sites[z]
+    return(np.transpose(state["s_zones"]))
+
+def synthetic_solar(s_sites, nz, rng):
+    """Random monthly cluster probabilities, daily profiles per cluster, zones and capacities."""
+    solar_prob = rng.dirichlet(np.ones(CLUSTERS), 12).T
+    s_profiles = [np.sin(np.pi*np.arange(24)/24)[None, :, None]*rng.uniform(0, 1, (int(rng.integers(20, 80)), 24, s_sites)) \
+                  for _ in range(CLUSTERS)]
+    s_zone_no = rng.integers(1, nz + 1, s_sites)
+    s_max = rng.uniform(10, 200, s_sites)
+    return solar_prob, s_profiles, s_zone_no, s_max
+
+def run(hours, seed):
+    rng = np.random.default_rng(seed)
+    nz = 20
+    print(f"{'sites':>6} {'loop [ms/year]':>15} {'hourly [ms/year]':>17} {'SolarYear [ms/year]':>20} {'speed-up':>9}")
+    for s_sites in [100, 1000]:
+        solar_prob, s_profiles, s_zone_no, s_max = synthetic_solar(s_sites, nz, rng)
+
+        loop_rng, state = np.random.default_rng(seed), {}
+        tic = perf_counter()
+        loop_out = [loop_solar_power(loop_rng, state, n, nz, s_zone_no, solar_prob, s_profiles, s_sites, s_max)[n%24] for n in range(hours)]
+        t_loop = perf_counter() - tic
+
+        raut = RAUtilities(rng = np.random.default_rng(seed))
+        raut.solar_rng = np.random.default_rng(seed)
+        cluster_cdf, zone_mat = raut.SolarClusterCDF(solar_prob), raut.ZoneMatrix(nz, s_zone_no)
+        tic = perf_counter()
+        hourly_out = [raut.SolarPower(n, nz, s_zone_no, solar_prob, s_profiles, s_sites, s_max, cluster_cdf = cluster_cdf, zone_mat = zone_mat)[n%24] \
+                      for n in range(hours)]
+        t_hourly = perf_counter() - tic
+
+        raut.solar_rng = np.random.default_rng(seed)
+        tic = perf_counter()
+        year_out = raut.SolarYear(hours, nz, s_zone_no, solar_prob, s_profiles, s_max, cluster_cdf = cluster_cdf, zone_mat = zone_mat)[0:hours]
+        t_year = perf_counter() - tic
+
+        assert np.allclose(loop_out, hourly_out) and np.allclose(loop_out, year_out)
+        print(f"{s_sites:>6} {t_loop*1e3:>15.1f} {t_hourly*1e3:>17.1f} {t_year*1e3:>20.1f} {t_loop/t_year:>8.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=8760)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.hours, args.seed)
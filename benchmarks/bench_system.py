@@ -0,0 +1,127 @@
+'''Shared helpers for the benchmark scripts: loads the bundled RTS-GMLC system data and generates random hours.'''
+
+import os
+import numpy as np
+
+from progress.mod_sysdata import RASystemData
+from progress.mod_matrices import RAMatrices
+from progress.mod_utilities import RAUtilities
+
+SYSTEM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'progress', 'Data', 'System')
+BMva = 100
+
+def load_system(model='Zonal', opt_type='single_period', system_directory=SYSTEM_DIR):
+    """
+    Loads generator, branch, bus and storage data and builds the optimization matrices.
+
+    Parameters:
+        model (str): 'Copper Sheet', 'Zonal' or 'Nodal'.
+        opt_type (str): 'single_period' or 'multi_period'.
+        system_directory (str): Directory containing gen.csv, branch.csv, bus.csv and storage.csv.
+
+    Returns:
+        dict: System data and matrices.
+    """
+    rasd = RASystemData(opt_type, model)
+    sys_data = {}
+    sys_data["genbus"], sys_data["ng"], sys_data["pmax"], sys_data["pmin"], _, sys_data["MTTF_gen"], sys_data["MTTR_gen"], \
+        sys_data["gencost"], _ = rasd.gen(system_directory + '/gen.csv')
+    sys_data["nl"], sys_data["fb"], sys_data["tb"], sys_data["cap_trans"], sys_data["MTTF_trans"], sys_data["MTTR_trans"], _ = \
+        rasd.branch(system_directory + '/branch.csv', system_directory + '/bus.csv')
+    _, _, sys_data["nz"] = rasd.bus(system_directory + '/bus.csv')
+    _, sys_data["essbus"], sys_data["ness"], sys_data["ess_pmax"], sys_data["ess_pmin"], sys_data["ess_duration"], sys_data["ess_socmax"], \
+        sys_data["ess_socmin"], sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"], sys_data["MTTF_ess"], sys_data["MTTR_ess"], \
+        sys_data["ess_units"], _ = rasd.storage(system_directory + '/storage.csv')
+
+    ramat = RAMatrices(sys_data["nz"])
+    sys_data["gen_mat"] = ramat.genmat(sys_data["ng"], np.asarray(sys_data["genbus"]), sys_data["ness"], sys_data["essbus"])
+    sys_data["ch_mat"] = ramat.chmat(sys_data["ness"], sys_data["essbus"], sys_data["nz"])
+    sys_data["A_inc"] = ramat.Ainc(sys_data["nl"], sys_data["fb"], sys_data["tb"])
+    sys_data["curt_mat"] = ramat.curtmat(sys_data["nz"])
+
+    raut = RAUtilities()
+    sys_data["cap_max"], sys_data["cap_min"] = raut.capacities(sys_data["nl"], sys_data["pmax"], sys_data["pmin"], sys_data["ess_pmax"], \
+                                                               sys_data["ess_pmin"], sys_data["cap_trans"])
+    sys_data["mu_tot"], sys_data["lambda_tot"] = raut.reltrates(sys_data["MTTF_gen"], sys_data["MTTF_trans"], sys_data["MTTR_gen"], \
+                                                                sys_data["MTTR_trans"], sys_data["MTTF_ess"], sys_data["MTTR_ess"])
+
+    # synthetic zonal load, proportional to the installed conventional capacity in each zone
+    zone_cap = sys_data["gen_mat"][:, 0:sys_data["ng"]] @ sys_data["pmax"]
+    sys_data["load_share"] = zone_cap/zone_cap.sum()
+    return sys_data
+
+def random_hour(sys_data, rng, load_level=(0.5, 0.95), outage_prob=0.1):
+    """
+    Draws random component states and a random net load, and returns them in the form used by the dispatch.
+
+    Parameters:
+        sys_data (dict): System data from load_system.
+        rng (numpy.random.Generator): Random number generator.
+        load_level (tuple): Range of the system net load as a fraction of the installed conventional capacity.
+        outage_prob (float): Probability that a component is out of service.
+
+    Returns:
+        tuple: current_cap, net_load, ess_smax, ess_smin
+    """
+    ng, nl = sys_data["ng"], sys_data["nl"]
+    state = (rng.uniform(0, 1, sys_data["cap_max"].size) > outage_prob).astype(float)
+    current_cap = {"max": state*sys_data["cap_max"], "min": state*sys_data["cap_min"]}
+    net_load = sys_data["load_share"]*sys_data["pmax"].sum()*rng.uniform(*load_level)
+    ess_emax = current_cap["max"][ng + nl::]*sys_data["ess_duration"]
+    return current_cap, net_load, ess_emax*sys_data["ess_socmax"], ess_emax*sys_data["ess_socmin"]
+
+def bound_functions(sys_data, current_cap, ess_smax, ess_smin):
+    """
+    Builds the single-period bound functions exactly as the MCS hourly loop does.
+
+    Returns:
+        tuple: fb_Pg, fb_flow, fb_ess, fb_soc
+    """
+    ng, nl = sys_data["ng"], sys_data["nl"]
+    gt_limits = {"g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
+                 "tl": current_cap["max"][ng:ng + nl]/BMva}
+
+    def fb_Pg(model, i):
+        return (0, gt_limits["g_ub"][i])
+    def fb_flow(model,i):
+        return (-gt_limits["tl"][i], gt_limits["tl"][i])
+    def fb_ess(model, i):
+        return(-current_cap["max"][ng + nl::][i]/BMva, current_cap["min"][ng + nl::][i]/BMva)
+    def fb_soc(model, i):
+        return(ess_smin[i]/BMva, ess_smax[i]/BMva)
+
+    return fb_Pg, fb_flow, fb_ess, fb_soc
+
+def random_window(sys_data, rng, time_periods, load_level=(0.6, 1.0), outage_prob=0.15):
+    """
+    Draws random component states and net loads for a multi-period optimization window and builds the
+    bound functions exactly as the MCS hourly loop does.
+
+    Returns:
+        tuple: net_load, fb_Pg, fb_flow, fb_ess, fb_soc, fb_ren
+    """
+    ng, nl, nz = sys_data["ng"], sys_data["nl"], sys_data["nz"]
+    holder_dict = {"g_limit": {}, "capacity": {}, "net_load": np.zeros((nz, time_periods)), "ren_limit": np.zeros((nz, time_periods)), \
+                   "ess_min": np.zeros((sys_data["ness"], time_periods)), "ess_max": np.zeros((sys_data["ness"], time_periods))}
+    for t in range(time_periods):
+        current_cap, net_load, ess_smax, ess_smin = random_hour(sys_data, rng, load_level, outage_prob)
+        holder_dict["g_limit"][t] = {"g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
+                                     "tl": current_cap["max"][ng:ng + nl]/BMva}
+        holder_dict["capacity"][t] = current_cap
+        holder_dict["net_load"][:, t] = net_load
+        holder_dict["ren_limit"][:, t] = rng.uniform(0, 0.05, nz)*net_load
+        holder_dict["ess_min"][:, t] = ess_smin
+        holder_dict["ess_max"][:, t] = ess_smax
+
+    def fb_Pg(model, i, t):
+        return (0, holder_dict["g_limit"][t]["g_ub"][i])
+    def fb_flow(model,i, t):
+        return (-holder_dict["g_limit"][t]["tl"][i], holder_dict["g_limit"][t]["tl"][i])
+    def fb_ess(model, i, t):
+        return(-holder_dict["capacity"][t]["max"][ng + nl::][i]/BMva, holder_dict["capacity"][t]["min"][ng + nl::][i]/BMva)
+    def fb_soc(model, i, t):
+        return(holder_dict["ess_min"][i,t]/BMva, holder_dict["ess_max"][i,t]/BMva)
+    def fb_ren(model, i, t):
+        return(0, holder_dict["ren_limit"][i,t]/BMva)
+
+    return holder_dict["net_load"], fb_Pg, fb_flow, fb_ess, fb_soc, fb_ren
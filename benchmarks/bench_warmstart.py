@@ -0,0 +1,111 @@
+'''
+Benchmark of the warm start of the highspy dispatch backends: HighsDispatch (single-period) and HighsDispatchMP
+(multi-period windows) solve the consecutive hours of a few samples once from scratch (cold) and once from the last
+optimal basis of the sample (warm). The component states follow failure/repair timelines (StateTimeline, with the
+failure rates scaled up so that outages occur) and the net load follows a daily profile, as in the hourly MCS loop.
+Reports the average number of simplex iterations per solve, the solve time, and the largest load curtailment
+difference between the two runs.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_warmstart.py --model Zonal --samples 3 --hours 720
+'''
+
+import argparse
+from time import perf_counter
+import numpy as np
+
+from progress.mod_dispatch import HighsDispatch, HighsDispatchMP
+from progress.mod_timeline import StateTimeline
+from bench_system import load_system, bound_functions, BMva
+
+def sample_hours(sys_data, hours, rng, failure_scale):
+    """
+    Generates the consecutive hours of one sample.
+
+    Returns:
+        list: current_cap, net_load, ess_smax, ess_smin of every hour.
+    """
+    ng, nl, ness = sys_data["ng"], sys_data["nl"], sys_data["ness"]
+    timeline = StateTimeline(ng, nl, ness, sys_data["lambda_tot"]*failure_scale, sys_data["mu_tot"], sys_data["ess_units"], rng = rng)
+    timeline.generate(hours)
+    daily = 0.75 + 0.15*np.sin(2*np.pi*(np.arange(hours) - 8)/24)
+    out = []
+    for n in range(hours):
+        _, current_cap = timeline.state_at(n, sys_data["cap_max"], sys_data["cap_min"])
+        net_load = sys_data["load_share"]*sys_data["pmax"].sum()*daily[n]*rng.uniform(0.97, 1.03, sys_data["nz"])
+        ess_emax = current_cap["max"][ng + nl::]*sys_data["ess_duration"]
+        out.append((current_cap, net_load, ess_emax*sys_data["ess_socmax"], ess_emax*sys_data["ess_socmin"]))
+    return out
+
+def window_functions(sys_data, window):
+    """Builds the multi-period bound functions of a window exactly as the MCS hourly loop does."""
+    ng, nl = sys_data["ng"], sys_data["nl"]
+    g_ub = [np.concatenate((w[0]["max"][0:ng]/BMva, w[0]["max"][ng + nl::]/BMva)) for w in window]
+    def fb_Pg(model, i, t):
+        return (0, g_ub[t][i])
+    def fb_flow(model, i, t):
+        return (-window[t][0]["max"][ng + i]/BMva, window[t][0]["max"][ng + i]/BMva)
+    def fb_ess(model, i, t):
+        return(-window[t][0]["max"][ng + nl::][i]/BMva, window[t][0]["min"][ng + nl::][i]/BMva)
+    def fb_soc(model, i, t):
+        return(window[t][3][i]/BMva, window[t][2][i]/BMva)
+    def fb_ren(model, i, t):
+        return(0, 0.05*window[t][1][i]/BMva)
+    return fb_Pg, fb_flow, fb_ess, fb_soc, fb_ren
+
+def run(model, samples, hours, time_periods, failure_scale, seed):
+
+    sys_data = load_system(model)
+    ng, nl, nz, ness = sys_data["ng"], sys_data["nl"], sys_data["nz"], sys_data["ness"]
+    args = (ng, nz, nl, ness, BMva, sys_data["A_inc"], sys_data["gen_mat"], sys_data["curt_mat"], sys_data["ch_mat"], sys_data["gencost"], \
+            sys_data["ess_pmax"], sys_data["ess_eff"], sys_data["disch_cost"], sys_data["ch_cost"], model == 'Copper Sheet')
+    rng = np.random.default_rng(seed)
+    sample_data = [sample_hours(sys_data, hours, rng, failure_scale) for _ in range(samples)]
+    SOC_init = 0.5*sys_data["ess_pmax"]*sys_data["ess_duration"]*sys_data["ess_socmax"]/BMva
+
+    print(f"Model: {model}, samples: {samples}, hours: {hours}, window: {time_periods} hours")
+    print(f"{'dispatch':>15} {'start':>6} {'iterations/solve':>17} {'ms/solve':>9} {'curtailed hours':>16}")
+    curt = {}
+    for name in ["single-period", "multi-period"]:
+        for warm_start in [False, True]:
+            if name == "single-period":
+                dispatch = HighsDispatch(*args, warm_start = warm_start)
+            else:
+                dispatch = HighsDispatchMP(*args, time_periods, warm_start = warm_start)
+            iterations, solves, elapsed, curt[name, warm_start] = 0, 0, 0.0, []
+            for hour_data in sample_data:
+                dispatch.reset()
+                SOC_old, ESS_initial = SOC_init.copy(), sys_data["cap_max"][ng + nl::]
+                tic = perf_counter()
+                if name == "single-period":
+                    for current_cap, net_load, ess_smax, ess_smin in hour_data:
+                        SOC_old = np.clip(SOC_old, ess_smin/BMva, ess_smax/BMva)
+                        fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(sys_data, current_cap, ess_smax, ess_smin)
+                        load_curt, SOC_old, *_ = dispatch.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old)
+                        curt[name, warm_start].append(load_curt)
+                else:
+                    for start in range(0, hours - time_periods + 1, time_periods):
+                        window = hour_data[start:start + time_periods]
+                        fb_Pg, fb_flow, fb_ess, fb_soc, fb_ren = window_functions(sys_data, window)
+                        net_load = np.column_stack([w[1] for w in window])
+                        load_curt, SOC_profile, *_ = dispatch.solve(fb_ess, fb_soc, fb_ren, fb_Pg, fb_flow, net_load, SOC_old, ESS_initial)
+                        SOC_old, ESS_initial = SOC_profile[:, -1], window[-1][0]["max"][ng + nl::]
+                        curt[name, warm_start].extend(load_curt)
+                elapsed += perf_counter() - tic
+                iterations += dispatch.iterations
+                solves += dispatch.solves
+            curt_hours = np.sum(np.array(curt[name, warm_start]) > 1e-9)
+            print(f"{name:>15} {'warm' if warm_start else 'cold':>6} {iterations/solves:>17.1f} {elapsed/solves*1e3:>9.3f} {curt_hours:>16}")
+        print(f"{'':>15} max |load_curt| difference: {np.max(np.abs(np.subtract(curt[name, False], curt[name, True]))):.2e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="Zonal", choices=["Copper Sheet", "Zonal", "Nodal"])
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--hours", type=int, default=720)
+    parser.add_argument("--time-periods", type=int, default=24)
+    parser.add_argument("--failure-scale", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.model, args.samples, args.hours, args.time_periods, args.failure_scale, args.seed)
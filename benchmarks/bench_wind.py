@@ -0,0 +1,95 @@
+'''
+Microbenchmark of the hourly wind sampler RAUtilities.WindPower against the previous loop-based implementation
+for synthetic wind fleets with 10, 100 and 1,000 sites and 12 wind speed classes. Both draw the same uniforms,
+so the zonal outputs and the wind speed classes are checked to be identical.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_wind.py --hours 500
+'''
+
+import argparse
+import warnings
+from time import perf_counter
+import numpy as np
+
+from progress.mod_utilities import RAUtilities
+
+W_CLASSES = 12
+
+def loop_wind_power(rng, nz, w_sites, zone_no, w_classes, r_cap, current_w_class, tr_mats, p_class, w_turbines, out_curve2, out_curve3):
+    """Previous RAUtilities.WindPower (site/class loops, np.matrix and nested zone loops)."""
+    W = rng.uniform(0, 1, (w_sites, w_classes))
+    tr_mats[tr_mats == 0] = 1e-10
+    time_wind = np.zeros((w_sites, w_classes))
+    for w in range(w_sites):
+        for c in range(w_classes):
+            if current_w_class[w] == c:
+                time_wind[w, :] = -np.log(W[w, :])/tr_mats[w, c, :]
+                break
+    tmin_wind = np.matrix(time_wind).argmin(1)
+    w_power = np.zeros(w_sites)
+    for w in range(w_sites):
+        if p_class[w] == 2:
+            w_power[w] = out_curve2[tmin_wind[w]]*w_turbines[w]*r_cap[w]
+        else:
+            w_power[w] = out_curve3[tmin_wind[w]]*w_turbines[w]*r_cap[w]
+    w_zones = np.zeros(nz)
+    for b in range(nz):
+        for z in range(len(zone_no)):
+            if b == zone_no[z] - 1:
+                w_zones[b] += w_power[z]
+    return(w_zones, tmin_wind)
+
+def synthetic_fleet(w_sites, nz, rng):
+    """Random sparse transition rates, zones, turbine counts and power curves."""
+    tr_mats = rng.uniform(0, 0.5, (w_sites, W_CLASSES, W_CLASSES))*(rng.uniform(0, 1, (w_sites, W_CLASSES, W_CLASSES)) < 0.6)
+    zone_no = rng.integers(1, nz + 1, w_sites)
+    p_class = rng.integers(2, 4, w_sites)
+    out_curve2 = np.sort(rng.uniform(0, 1, W_CLASSES))
+    out_curve3 = np.sort(rng.uniform(0, 1, W_CLASSES))
+    w_turbines = rng.integers(10, 100, w_sites)
+    r_cap = rng.uniform(1.5, 3.5, w_sites)
+    return tr_mats, zone_no, p_class, out_curve2, out_curve3, w_turbines, r_cap
+
+def run(hours, seed):
+    rng = np.random.default_rng(seed)
+    nz = 20
+    print(f"{'sites':>6} {'loop [us/hour]':>15} {'vectorized [us/hour]':>21} {'speed-up':>9}")
+    for w_sites in [10, 100, 1000]:
+        tr_mats, zone_no, p_class, out_curve2, out_curve3, w_turbines, r_cap = synthetic_fleet(w_sites, nz, rng)
+        n_hours = max(20, hours*10//w_sites) if w_sites > 10 else hours
+
+        loop_rng = np.random.default_rng(seed)
+        current_w_class = np.zeros(w_sites, dtype = int)
+        loop_out = []
+        tic = perf_counter()
+        for _ in range(n_hours):
+            w_zones, current_w_class = loop_wind_power(loop_rng, nz, w_sites, zone_no, W_CLASSES, r_cap, current_w_class, tr_mats.copy(), \
+                                                       p_class, w_turbines, out_curve2, out_curve3)
+            loop_out.append(w_zones)
+        t_loop = (perf_counter() - tic)/n_hours
+
+        raut = RAUtilities(rng=np.random.default_rng(seed))
+        rates = np.where(tr_mats == 0, 1e-10, tr_mats) # sanitized once, as when the data are loaded
+        class_power = raut.WindClassPower(p_class, w_turbines, r_cap, out_curve2, out_curve3)
+        current_w_class = np.zeros(w_sites, dtype = int)
+        vec_out = []
+        tic = perf_counter()
+        for _ in range(n_hours):
+            w_zones, current_w_class = raut.WindPower(nz, w_sites, zone_no, W_CLASSES, r_cap, current_w_class, rates, p_class, w_turbines, \
+                                                      out_curve2, out_curve3, class_power = class_power)
+            vec_out.append(w_zones)
+        t_vec = (perf_counter() - tic)/n_hours
+
+        assert np.allclose(loop_out, vec_out)
+        print(f"{w_sites:>6} {t_loop*1e6:>15.1f} {t_vec*1e6:>21.1f} {t_loop/t_vec:>8.1f}x")
+
+if __name__ == "__main__":
+    # the previous implementation indexes with 1x1 np.matrix rows
+    warnings.simplefilter("ignore", DeprecationWarning)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.hours, args.seed)
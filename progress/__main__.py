@@ -21,6 +21,7 @@ from progress.dpi import is_windows, get_scale_factor
 import logging
 import sys
 import os
+import multiprocessing
 
 root = logging.getLogger()
 for h in list(root.handlers):
@@ -432,4 +433,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # worker processes of the sample-parallel runner re-enter here in frozen builds
+    multiprocessing.freeze_support()
     main()
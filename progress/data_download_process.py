@@ -27,22 +27,18 @@ class DataProcess:
             wind_sites = wind_directory + '/wind_sites.csv'
             wind_power_curves = wind_directory + '/w_power_curves.csv'
             windspeed_data = wind_directory + '/windspeed_data.csv'
-            wind_tr_rate = wind_directory + '/t_rate.xlsx'
             
             wind = Wind(wind_directory)
 
             if self.config['download_w'] == 'Yes':
 
                 # download wind data
-                wind.DownloadWindData(self.config['year_start_w'], self.config['year_end_w'])
+                wind.DownloadWindData(self.config['year_start_w'], self.config['year_end_w'], workers=self.config.get('download_workers', 4))
                 
 
-            # calculate transition rates 
+            # calculate transition rates (cached in t_rate.npz, exported to t_rate.xlsx)
             wind.CalWindTrRates(wind_directory, windspeed_data, wind_power_curves)
 
-            tr_mats = pd.read_excel(wind_tr_rate, sheet_name=None)
-            tr_mats = np.array([tr_mats[sheet_name].to_numpy() for sheet_name in tr_mats])
-
             return
 
     def ProcessSolarData(self):
@@ -58,13 +54,14 @@ class DataProcess:
             solar_site_data = solar_directory+"/solar_sites.csv"
             solar_prob_data = solar_directory+"/solar_probs.csv"
 
-            solar = Solar(solar_directory, self.model)
+            solar = Solar(solar_directory, self.model, storage_format=self.config.get('storage_format', 'csv'))
 
             if self.config['download_s'] == 'Yes':
 
                 # download weather data and calculate solar generation
                 start_year = self.config['year_start_s']; end_year = self.config['year_end_s']
-                solar.run_pipeline(start_year, end_year)
+                solar.run_pipeline(start_year, end_year, download_workers=self.config.get('download_workers', 4), \
+                                   processes=self.config.get('pv_processes', 1))
             
             # Initialize the KMeans_Pipeline class
             pipeline = KMeans_Pipeline(solar_directory, solar_site_data)
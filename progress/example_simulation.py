@@ -10,8 +10,11 @@ import yaml
 import argparse
 import logging
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from progress.mod_sysdata import RASystemData
 from progress.mod_utilities import RAUtilities
+from progress.mod_timeline import StateTimeline
+from progress.mod_batch import MCS_batch
 from progress.mod_mcs_utils import MCS_utils, MCS_samples, MCS_hourly
 from progress.mod_plot import RAPlotTools
 from datetime import datetime, timedelta
@@ -24,7 +27,315 @@ class StopSimulation(Exception):
     """Raised when the user requests the simulation to stop."""
 
 
-def MCS(input_file, results_subdir, stop_event=None) :   
+def run_sample(s, mcs_params, raut, results_subdir):
+    '''
+    Simulates one Monte Carlo sample (year) hour by hour and saves its results in results_subdir/Sample_<s+1>.
+    The random streams of the sample are seeded from the run seed and the index of the sample in the run.
+
+    Parameters:
+        s (int): Sample index, counted from mcs_params.sample_offset.
+        mcs_params (MCS_utils): Simulation parameters with the system data, renewable data and matrices processed.
+        raut (RAUtilities): Utilities used for component states, dispatch and loss of load tracking.
+        results_subdir (str): Results folder of the MCS.
+
+    Returns:
+        tuple: Temporary variables of the sample (var_s) and its loss of load states (sim_hours,).
+    '''
+    sim_hours = mcs_params.sim_hours
+    gen_params, line_params, ess_params = mcs_params.gen_params, mcs_params.line_params, mcs_params.ess_params
+    ng, nl, ness, nz = gen_params["ng"], line_params["nl"], ess_params["ness"], mcs_params.bus_params["nz"]
+    BMva = mcs_params.BMva
+    optimization_period = mcs_params.optimization_period
+    time_periods = mcs_params.time_periods
+    network_model = mcs_params.network_model
+    gen_mat, ch_mat, A_inc, curt_mat = mcs_params.gen_mat, mcs_params.ch_mat, mcs_params.A_inc, mcs_params.curt_mat
+    LOL_track = np.zeros((1, sim_hours)) # loss of load states of this sample
+
+    # random streams and results folder follow the index of the sample in the run
+    s = mcs_params.sample_offset + s
+    raut.SeedSample(mcs_params.seed, s)
+    logger.info(f'Sample: {s+1}/{mcs_params.samples}')
+
+    sample_instance= MCS_samples(mcs_params)
+    sample_instance.initialize_sample_data()
+    if mcs_params.dispatch is not None:
+        mcs_params.dispatch.reset() # the dispatch of a sample starts from scratch, then from its last optimal basis
+    if mcs_params.event_timeline:
+        # failure/repair events of all components for the whole sample
+        timeline = StateTimeline(ng, nl, ness, mcs_params.lambda_tot, mcs_params.mu_tot, ess_params["ess_units"], rng = raut.rng, \
+                                 bias_factor = mcs_params.bias_factor, bias_hours = mcs_params.bias_hours)
+        timeline.generate(sim_hours)
+    if optimization_period == "multi_period":
+        holder_dict = sample_instance.holder_dict
+        ess_smax_store = np.zeros((ness,sim_hours))
+
+    # initalize sample components that will be modified within the hourly loop
+    current_state = np.ones(ng + nl + ness) # all gens and TLs in up state at the start of the year
+     # temp variables to be used for each sample
+    var_s = {"t_min": 0, "LLD": 0, "curtailment": np.zeros(sim_hours), "label_LOLF": np.zeros(sim_hours), "freq_LOLF": 0, "LOL_days": 0, "screened_hours": 0, \
+             "outage_day": np.zeros(365)}
+    if mcs_params.bias_factor is not None:
+        var_s["weight"] = timeline.weight # likelihood ratio of the importance-sampled outages
+        logger.info(f'Sample {s+1}: importance sampling weight {timeline.weight:.4g}')
+    # Initialize ESS SOC and duration which will be updated after dispatch and degradation evaluation in each hour
+    SOC_old = 0.5*(np.multiply(np.multiply(ess_params["ess_pmax"], ess_params["ess_duration"]), ess_params["ess_socmax"]))/BMva
+    ess_duration_temp = ess_params["ess_duration"].astype(float).copy()
+    ESS_initial_capacities = ess_params["ess_pmax"].copy()
+
+    for n in range(mcs_params.sim_hours):
+    
+        hourly_instance = MCS_hourly(sample_instance)
+        # get current states(up/down) and capacities of all system components
+        if mcs_params.event_timeline:
+            current_state, current_cap = timeline.state_at(n, mcs_params.cap_max, mcs_params.cap_min)
+        else:
+            next_state, current_cap, var_s["t_min"] = raut.NextState(var_s["t_min"], ng, ness, nl, mcs_params.lambda_tot, mcs_params.mu_tot, \
+                                                                     current_state, mcs_params.cap_max, mcs_params.cap_min, ess_params["ess_units"])
+            current_state = copy.deepcopy(next_state)
+        net_load, tot_ren, w_zones, s_zones = hourly_instance.get_net_load(n)
+    
+        # optimize dipatch and calculate load curtailment
+        if optimization_period == "single_period":
+
+            # calculate upper and lower bounds of gens and tls
+            ess_smax, ess_smin, SOC_old = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
+            sample_instance.ess_smax_store[:, n] = ess_smax
+
+            gt_limits = {"g_lb": np.concatenate((current_cap["min"][0:ng]/BMva, current_cap["min"][ng + nl::]/BMva)), \
+                        "g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
+                        "tl": current_cap["max"][ng:ng + nl]/BMva}
+        
+            def fb_Pg(model, i):
+                return (0, gt_limits["g_ub"][i])
+            def fb_flow(model,i):
+                return (-gt_limits["tl"][i], gt_limits["tl"][i])
+            def fb_ess(model, i):
+                return(-current_cap["max"][ng + nl::][i]/BMva, current_cap["min"][ng + nl::][i]/BMva)
+            def fb_soc(model, i):
+                return(ess_smin[i]/BMva, ess_smax[i]/BMva)
+    
+            dispatch = raut.AdequacyScreen(ng, nl, ness, BMva, current_cap, net_load, SOC_old, ess_smax, ess_smin, gen_mat, ch_mat, ess_params["ess_eff"], \
+                                           ess_params["disch_cost"], ess_params["ch_cost"], network_model == 'Copper Sheet') if mcs_params.screen_adequate_hours else None
+            merit_order = raut.MeritOrderDispatch(ng, nl, BMva, current_cap, net_load, SOC_old, ess_smax, ess_smin, gen_params["gencost"], ess_params["ess_pmax"], \
+                                                  ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"]) \
+                          if dispatch is None and mcs_params.merit_order_dispatch else None
+            maxflow = mcs_params.maxflow.solve(current_cap, net_load, SOC_old, ess_smax, ess_smin) \
+                      if dispatch is None and mcs_params.maxflow is not None else None
+            if dispatch is not None:
+                load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = dispatch
+                var_s["screened_hours"] += 1
+            elif merit_order is not None:
+                load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = merit_order
+            elif maxflow is not None:
+                load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = maxflow
+            elif mcs_params.persistent_dispatch:
+                load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = mcs_params.dispatch.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old)
+            elif network_model in ['Zonal', 'Nodal']:
+                load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, A_inc, gen_mat, curt_mat, ch_mat, \
+                                                    gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], copper_sheet = False)
+            elif network_model == 'Copper Sheet':
+                load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, A_inc, gen_mat, curt_mat, ch_mat,  \
+                                                                gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], copper_sheet = True)
+            # Store hourly and outage-specific data
+            hourly_instance.record_hourly_data(load_curt, SOC_old, P_dis, P_ch, Pg, curtbus, w_zones, s_zones, n, flow, None)
+            # track loss of load states
+            var_s, LOL_track = raut.TrackLOLStates(load_curt, BMva, var_s, LOL_track, 0, n)
+
+        if optimization_period  == "multi_period" and not mcs_params.enable_pcm:
+        
+            current_day,_ = divmod(n, 24)
+            normalized_hour = n%time_periods
+
+            ess_smax, ess_smin, _ = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
+            sample_instance.ess_smax_store[:, n] = ess_smax
+
+            holder_dict["g_limit"][normalized_hour] = {"g_lb": np.concatenate((current_cap["min"][0:ng]/BMva, current_cap["min"][ng + nl::]/BMva)), \
+                        "g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
+                        "tl": current_cap["max"][ng:ng + nl]/BMva}
+            holder_dict["capacity"][normalized_hour] = current_cap
+            holder_dict["net_load"][:, normalized_hour] = net_load
+            holder_dict["ess_min"][:, normalized_hour] = ess_smin
+            holder_dict["ess_max"][:, normalized_hour] = ess_smax
+            holder_dict["ren_limit"][:, normalized_hour] = tot_ren
+        
+            if (n+1)%time_periods == 0:
+            
+                def fb_Pg(model, i, t):
+                    return (0, holder_dict["g_limit"][t]["g_ub"][i])
+                def fb_flow(model,i, t):
+                    return (-holder_dict["g_limit"][t]["tl"][i], holder_dict["g_limit"][t]["tl"][i])
+                def fb_ess(model, i, t):
+                    return(-holder_dict["capacity"][t]["max"][ng + nl::][i]/BMva, holder_dict["capacity"][t]["min"][ng + nl::][i]/BMva)
+                def fb_soc(model, i, t):
+                    return(holder_dict["ess_min"][i,t]/BMva, holder_dict["ess_max"][i,t]/BMva)
+                def fb_ren(model, i, t):
+                    return(0, holder_dict["ren_limit"][i,t]/BMva)
+            
+                dispatch = raut.AdequacyScreenMP(ng, nl, nz, ness, BMva, holder_dict, SOC_old, ESS_initial_capacities, gen_mat, time_periods, \
+                                                 network_model == 'Copper Sheet') if mcs_params.screen_adequate_hours else None
+                if dispatch is not None:
+                    load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = dispatch
+                    var_s["screened_hours"] += time_periods
+                elif mcs_params.dispatch is not None:
+                    load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = mcs_params.dispatch.solve(fb_ess, fb_soc, fb_ren, fb_Pg, fb_flow, holder_dict["net_load"], \
+                                                                                                       SOC_old, ESS_initial_capacities)
+                elif network_model in ['Zonal', 'Nodal']:
+
+                    load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, \
+                                                                                                A_inc, gen_mat, curt_mat, ch_mat, gen_params["gencost"], holder_dict["net_load"], \
+                                                                                                SOC_old, ESS_initial_capacities, ess_params["ess_pmax"], ess_params["ess_eff"], \
+                                                                                                ess_params["disch_cost"], ess_params["ch_cost"], time_periods, copper_sheet = False)
+                elif network_model == 'Copper Sheet':
+                    load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, A_inc, 
+                                                                                                gen_mat, curt_mat, ch_mat, gen_params["gencost"], holder_dict["net_load"], \
+                                                                                                SOC_old, ESS_initial_capacities, ess_params["ess_pmax"], ess_params["ess_eff"], \
+                                                                                                ess_params["disch_cost"], ess_params["ch_cost"], time_periods, copper_sheet = True)
+            
+                # record values for initilzing next optimiation period
+                SOC_old = SOC_profile[:,-1]
+                ESS_initial_capacities = current_cap["max"][ng + nl::]
+                sample_instance.initialize_holder_vars(holder_dict)
+                # Store hourly and outage-specific data
+                hourly_instance.record_hourly_data(load_curt, SOC_profile, P_dis, P_ch, Pg, curtbus, w_zones, s_zones, n, flow, current_day)
+            
+                # track loss of load states
+                for i in range(time_periods):
+                    start_day = int(current_day+1-time_periods/24)
+                    current_n = start_day * 24 + i
+                    var_s, LOL_track = raut.TrackLOLStates(load_curt[i], BMva, var_s, LOL_track, 0, current_n)
+    
+        if mcs_params.enable_pcm:
+            ess_smax, ess_smin, _ = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
+            hourly_instance.populate_pcm_data(n, ng, nl, ness, current_cap, ess_smax, ess_smin, holder_dict)
+
+        if mcs_params.evaluate_degradation == True and not mcs_params.enable_pcm:
+            if (n+1)%time_periods == 0:
+                SOC_old, ess_duration_temp = hourly_instance.degradation_evaluation(n, ess_duration_temp, SOC_old)
+
+        if (n+1)%100 == 0:
+            logger.info(f'Hour {n + 1}')
+
+    if mcs_params.screen_adequate_hours:
+        logger.info(f'Sample {s+1}: {var_s["screened_hours"]}/{sim_hours} hours screened as adequate, dispatch optimization skipped')
+    if getattr(mcs_params.dispatch, "solves", 0):
+        logger.info(f'Sample {s+1}: {mcs_params.dispatch.mean_iterations():.1f} simplex iterations per dispatch solve')
+
+    # setting up folder for saving results for each sample
+    sample_subdir = os.path.join(results_subdir, f'Sample_{s + 1}')
+    os.makedirs(sample_subdir, exist_ok=True)
+    if mcs_params.event_timeline:
+        timeline.export(os.path.join(sample_subdir, 'outage_timeline.csv'), \
+                        np.concatenate((gen_params["genname"], line_params["branchname"], ess_params["essname"])))
+
+    if mcs_params.enable_pcm:
+        logger.info(f'Sample {s+1}: Running PCM simulation...')
+        var_s, LOL_track = sample_instance.run_pcm(sample_subdir, holder_dict, 0, var_s, LOL_track)
+        logger.info(f'Sample {s+1}: PCM simulation complete')
+
+    if not mcs_params.enable_pcm:
+        sample_instance.export_sample_results(sample_subdir, s)
+
+    return(var_s, LOL_track[0])
+
+
+# simulation data of a worker process of run_samples_parallel, built once by _init_worker
+_worker = {}
+
+def _init_worker(input_file, seed, bias_factor):
+    '''Builds the simulation parameters, matrices and utilities in a worker process of run_samples_parallel.'''
+    with open(input_file, 'r') as f:
+        config = yaml.safe_load(f)
+    mcs_params = MCS_utils(config)
+    mcs_params.seed = seed # run seed of the parent process
+    mcs_params.initialize_params()
+    mcs_params.process_renewable_data()
+    mcs_params.setup_importance_sampling(bias_factor) # multipliers of the parent process
+    mcs_params.process_matrices()
+    _worker["mcs_params"] = mcs_params
+
+def _run_worker_sample(s, results_subdir):
+    '''Simulates sample s in a worker process.'''
+    mcs_params = _worker["mcs_params"]
+    var_s, LOL_row = run_sample(s, mcs_params, mcs_params.raut, results_subdir)
+    return(s, var_s, LOL_row)
+
+def run_samples_parallel(input_file, mcs_params, results_subdir, workers, indices_rec, LOL_track, raut, stop_event=None):
+    '''
+    Distributes the Monte Carlo samples over local worker processes. Each sample draws from its own random streams
+    spawned from the run seed, so the results do not depend on the number of workers. The loss of load variables
+    and states of each sample are sent back to this process as soon as the sample is finished and aggregated in
+    the order the samples complete. With a target COV, the remaining samples are cancelled once it is reached.
+
+    Parameters:
+        input_file (str): Configuration file of the MCS.
+        mcs_params (MCS_utils): Simulation parameters (run seed and stopping rule).
+        results_subdir (str): Results folder of the MCS.
+        workers (int): Number of worker processes.
+        indices_rec (dict): Dictionary of indices to be recorded.
+        LOL_track (array): Loss of load states (samples x sim_hours).
+        raut (RAUtilities): Utilities used to aggregate the indices.
+        stop_event (threading.Event): Optional event to cancel the remaining samples.
+
+    Returns:
+        tuple: Updated indices recorder, loss of load tracker, number of screened hours and the finished samples.
+    '''
+    samples, sim_hours = LOL_track.shape
+    logger.info(f'Running {samples} samples on {workers} worker processes')
+
+    screened_total = 0
+    completed = [] # sample indices in the order they finished
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(input_file, mcs_params.seed, mcs_params.bias_factor))
+    try:
+        pending = {executor.submit(_run_worker_sample, s, results_subdir) for s in range(samples)}
+        while pending:
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            if stop_event is not None and stop_event.is_set():
+                raise StopSimulation
+            for future in finished:
+                s, var_s, LOL_track[s] = future.result()
+                screened_total += var_s["screened_hours"]
+                indices_rec = raut.UpdateIndexArrays(indices_rec, var_s, sim_hours, s)
+                completed.append(s)
+
+                # convergence of LOLP and COV over the samples finished so far
+                k = len(completed) - 1
+                indices_rec["mLOLP_rec"][k] = np.mean(indices_rec["LOLP_rec"][completed])
+                var_LOLP = np.var(indices_rec["LOLP_rec"][completed])
+                indices_rec["COV_rec"][k] = np.sqrt(var_LOLP)/indices_rec["mLOLP_rec"][k]
+                logger.info(f'Sample {s+1} finished ({k+1}/{samples})')
+                if mcs_params.target_cov_reached(indices_rec, completed):
+                    pending = set()
+                    break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return(indices_rec, LOL_track, screened_total, completed)
+
+
+def save_config(input_file, results_subdir, seed):
+    '''
+    Saves the configuration file without comments and data path as results_subdir/config.txt, with the run seed
+    actually used, so that any sample of the run can be replayed alone with --replay-sample.
+
+    Parameters:
+        input_file (str): Configuration file of the MCS.
+        results_subdir (str): Results folder of the MCS.
+        seed (int): Run seed.
+    '''
+    config_out = Path(results_subdir) / "config.txt"
+    with open(input_file) as f_in, open(config_out, "w") as f_out:
+        for line in f_in:
+            stripped = line.lstrip()
+            if stripped.startswith("#") or stripped.startswith("data:") or line.startswith("seed:"):
+                continue
+            comment_pos = line.find(" #")
+            if comment_pos != -1:
+                line = line[:comment_pos] + "\n"
+            f_out.write(line)
+        f_out.write(f"seed: {seed}\n")
+
+
+def MCS(input_file, results_subdir, stop_event=None, workers=None, replay_sample=None) :   
     '''This function performs mixed time sequential MCS using methods from the different RA modules'''
  
     # open configuration file
@@ -32,6 +343,10 @@ def MCS(input_file, results_subdir, stop_event=None) :
         config = yaml.safe_load(f)
 
     mcs_params = MCS_utils(config)
+    if replay_sample is not None:
+        # only simulate sample replay_sample (1-based) of the run with the configured seed
+        mcs_params.samples, mcs_params.sample_offset = 1, replay_sample - 1
+    logger.info(f"Run seed: {mcs_params.seed}")
     bus_params, gen_params, line_params, load_all_regions, ess_params = mcs_params.initialize_params()
 
     #Extract some commonly used parameters
@@ -48,158 +363,54 @@ def MCS(input_file, results_subdir, stop_event=None) :
     network_model = mcs_params.network_model
     
     mcs_params.process_renewable_data()
+    mcs_params.setup_importance_sampling()
     gen_mat, ch_mat, A_inc, curt_mat, indices_rec, LOL_track = mcs_params.process_matrices()
 
-    # Instanciate commonly used classes
-    raut = RAUtilities(dispatch_solver=config.get('dispatch_solver', 'glpk'))
+    # utilities shared with the sample/hourly helpers, so that all samplers draw from the streams of the sample
+    raut = mcs_params.raut
 
-    tic = perf_counter()
-        
-    for s in range(samples):
+    # number of worker processes the samples are distributed over
+    workers = min(workers or config.get('workers', 1), samples)
 
-        logger.info(f'Sample: {s+1}/{samples}')
-        
-        sample_instance= MCS_samples(mcs_params)
-        sample_instance.initialize_sample_data()
-        if optimization_period == "multi_period":
-            holder_dict = sample_instance.holder_dict
-            ess_smax_store = np.zeros((ness,sim_hours))
-
-        # initalize sample components that will be modified within the hourly loop
-        current_state = np.ones(ng + nl + ness) # all gens and TLs in up state at the start of the year
-         # temp variables to be used for each sample
-        var_s = {"t_min": 0, "LLD": 0, "curtailment": np.zeros(sim_hours), "label_LOLF": np.zeros(sim_hours), "freq_LOLF": 0, "LOL_days": 0, \
-                 "outage_day": np.zeros(365)}
-        # Initialize ESS SOC and duration which will be updated after dispatch and degradation evaluation in each hour
-        SOC_old = 0.5*(np.multiply(np.multiply(ess_params["ess_pmax"], ess_params["ess_duration"]), ess_params["ess_socmax"]))/BMva
-        ess_duration_temp = ess_params["ess_duration"].astype(float).copy()
-        ESS_initial_capacities = ess_params["ess_pmax"].copy()
-        
-        for n in range(mcs_params.sim_hours):
-            
-            hourly_instance = MCS_hourly(sample_instance)
-            # get current states(up/down) and capacities of all system components
-            next_state, current_cap, var_s["t_min"] = raut.NextState(var_s["t_min"], ng, ness, nl, mcs_params.lambda_tot, mcs_params.mu_tot, \
-                                                                     current_state, mcs_params.cap_max, mcs_params.cap_min, ess_params["ess_units"])
-            current_state = copy.deepcopy(next_state)
-            net_load, tot_ren, w_zones, s_zones = hourly_instance.get_net_load(n)
-            
-            # optimize dipatch and calculate load curtailment
-            if optimization_period == "single_period":
-
-                # calculate upper and lower bounds of gens and tls
-                ess_smax, ess_smin, SOC_old = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
-                sample_instance.ess_smax_store[:, n] = ess_smax
-
-                gt_limits = {"g_lb": np.concatenate((current_cap["min"][0:ng]/BMva, current_cap["min"][ng + nl::]/BMva)), \
-                            "g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
-                            "tl": current_cap["max"][ng:ng + nl]/BMva}
-                
-                def fb_Pg(model, i):
-                    return (0, gt_limits["g_ub"][i])
-                def fb_flow(model,i):
-                    return (-gt_limits["tl"][i], gt_limits["tl"][i])
-                def fb_ess(model, i):
-                    return(-current_cap["max"][ng + nl::][i]/BMva, current_cap["min"][ng + nl::][i]/BMva)
-                def fb_soc(model, i):
-                    return(ess_smin[i]/BMva, ess_smax[i]/BMva)
-            
-                if network_model in ['Zonal', 'Nodal']:
-                    load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, A_inc, gen_mat, curt_mat, ch_mat, \
-                                                        gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], copper_sheet = False)
-                elif network_model == 'Copper Sheet':
-                    load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, A_inc, gen_mat, curt_mat, ch_mat,  \
-                                                                    gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], copper_sheet = True)
-                # Store hourly and outage-specific data
-                hourly_instance.record_hourly_data(load_curt, SOC_old, P_dis, P_ch, Pg, curtbus, w_zones, s_zones, n, flow, None)
-                # track loss of load states
-                var_s, LOL_track = raut.TrackLOLStates(load_curt, BMva, var_s, LOL_track, s, n)
-
-            if optimization_period  == "multi_period" and not mcs_params.enable_pcm:
-                
-                current_day,_ = divmod(n, 24)
-                normalized_hour = n%time_periods
-
-                ess_smax, ess_smin, _ = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
-                sample_instance.ess_smax_store[:, n] = ess_smax
-
-                holder_dict["g_limit"][normalized_hour] = {"g_lb": np.concatenate((current_cap["min"][0:ng]/BMva, current_cap["min"][ng + nl::]/BMva)), \
-                            "g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
-                            "tl": current_cap["max"][ng:ng + nl]/BMva}
-                holder_dict["capacity"][normalized_hour] = current_cap
-                holder_dict["net_load"][:, normalized_hour] = net_load
-                holder_dict["ess_min"][:, normalized_hour] = ess_smin
-                holder_dict["ess_max"][:, normalized_hour] = ess_smax
-                holder_dict["ren_limit"][:, normalized_hour] = tot_ren
-                
-                if (n+1)%time_periods == 0:
-                    
-                    def fb_Pg(model, i, t):
-                        return (0, holder_dict["g_limit"][t]["g_ub"][i])
-                    def fb_flow(model,i, t):
-                        return (-holder_dict["g_limit"][t]["tl"][i], holder_dict["g_limit"][t]["tl"][i])
-                    def fb_ess(model, i, t):
-                        return(-holder_dict["capacity"][t]["max"][ng + nl::][i]/BMva, holder_dict["capacity"][t]["min"][ng + nl::][i]/BMva)
-                    def fb_soc(model, i, t):
-                        return(holder_dict["ess_min"][i,t]/BMva, holder_dict["ess_max"][i,t]/BMva)
-                    def fb_ren(model, i, t):
-                        return(0, holder_dict["ren_limit"][i,t]/BMva)
-                    
-                    if network_model in ['Zonal', 'Nodal']:
-                        
-                        load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, \
-                                                                                                    A_inc, gen_mat, curt_mat, ch_mat, gen_params["gencost"], holder_dict["net_load"], \
-                                                                                                    SOC_old, ESS_initial_capacities, ess_params["ess_pmax"], ess_params["ess_eff"], \
-                                                                                                    ess_params["disch_cost"], ess_params["ch_cost"], time_periods, copper_sheet = False)
-                    elif network_model == 'Copper Sheet':
-                        load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, A_inc, 
-                                                                                                    gen_mat, curt_mat, ch_mat, gen_params["gencost"], holder_dict["net_load"], \
-                                                                                                    SOC_old, ESS_initial_capacities, ess_params["ess_pmax"], ess_params["ess_eff"], \
-                                                                                                    ess_params["disch_cost"], ess_params["ch_cost"], time_periods, copper_sheet = True)
-                    
-                    # record values for initilzing next optimiation period
-                    SOC_old = SOC_profile[:,-1]
-                    ESS_initial_capacities = current_cap["max"][ng + nl::]
-                    sample_instance.initialize_holder_vars(holder_dict)
-                    # Store hourly and outage-specific data
-                    hourly_instance.record_hourly_data(load_curt, SOC_profile, P_dis, P_ch, Pg, curtbus, w_zones, s_zones, n, flow, current_day)
-                    
-                    # track loss of load states
-                    for i in range(time_periods):
-                        start_day = int(current_day+1-time_periods/24)
-                        current_n = start_day * 24 + i
-                        var_s, LOL_track = raut.TrackLOLStates(load_curt[i], BMva, var_s, LOL_track, s, current_n)
-            
-            if mcs_params.enable_pcm:
-                ess_smax, ess_smin, _ = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
-                hourly_instance.populate_pcm_data(n, ng, nl, ness, current_cap, ess_smax, ess_smin, holder_dict)
-
-            if mcs_params.evaluate_degradation == True and not mcs_params.enable_pcm:
-                if (n+1)%time_periods == 0:
-                    SOC_old, ess_duration_temp = hourly_instance.degradation_evaluation(n, ess_duration_temp, SOC_old)
-
-            if (n+1)%100 == 0:
-                logger.info(f'Hour {n + 1}')
+    tic = perf_counter()
+    screened_total = 0 # hours in which the dispatch optimization was skipped by the adequacy screening
         
-        # setting up folder for saving results for each sample
-        sample_subdir = os.path.join(results_subdir, f'Sample_{s + 1}')
-        os.makedirs(sample_subdir, exist_ok=True)
+    if mcs_params.batch_samples > 0:
+        # all samples simulated in blocks of batch_samples with NumPy arrays; only the indices are recorded
+        if workers > 1:
+            logger.warning("Batched sampling runs in a single process; the workers setting is ignored.")
+        batch = MCS_batch(mcs_params, raut, mcs_params.batch_samples)
+        indices_rec, LOL_track, _ = batch.run(indices_rec, LOL_track)
+        done = list(range(batch.samples_done))
+    elif workers > 1:
+        indices_rec, LOL_track, screened_total, done = run_samples_parallel(input_file, mcs_params, results_subdir, workers, indices_rec, LOL_track, raut, stop_event)
+    else:
+        done = []
+        for s in range(samples):
+            if stop_event is not None and stop_event.is_set():
+                raise StopSimulation
 
-        if mcs_params.enable_pcm:
-            logger.info(f'Sample {s+1}: Running PCM simulation...')
-            var_s, LOL_track = sample_instance.run_pcm(sample_subdir, holder_dict, s, var_s, LOL_track)
-            logger.info(f'Sample {s+1}: PCM simulation complete')
+            var_s, LOL_track[s] = run_sample(s, mcs_params, raut, results_subdir)
+            screened_total += var_s["screened_hours"]
 
-        # collect indices for all samples
-        indices_rec = raut.UpdateIndexArrays(indices_rec, var_s, sim_hours, s)
+            # collect indices for all samples
+            indices_rec = raut.UpdateIndexArrays(indices_rec, var_s, sim_hours, s)
         
-        # check for convergence using LOLP and COV
-        indices_rec["mLOLP_rec"][s] = np.mean(indices_rec["LOLP_rec"][0:s+1])
-        var_LOLP = np.var(indices_rec["LOLP_rec"][0:s+1])
-        indices_rec["COV_rec"][s] = np.sqrt(var_LOLP)/indices_rec["mLOLP_rec"][s]
-
-        if not mcs_params.enable_pcm:
-            sample_instance.export_sample_results(sample_subdir, s)
+            # check for convergence using LOLP and COV
+            indices_rec["mLOLP_rec"][s] = np.mean(indices_rec["LOLP_rec"][0:s+1])
+            var_LOLP = np.var(indices_rec["LOLP_rec"][0:s+1])
+            indices_rec["COV_rec"][s] = np.sqrt(var_LOLP)/indices_rec["mLOLP_rec"][s]
+            done.append(s)
+            if mcs_params.target_cov_reached(indices_rec, done):
+                break
+
+    recorded = np.arange(samples) # samples in the order of the recorded indices
+    if len(done) < samples:
+        # stopped early by the target COV: only the simulated samples enter the indices and plots
+        indices_rec, LOL_track = raut.TruncateIndexArrays(indices_rec, LOL_track, done)
+        logger.info(f"Stopped after {len(done)}/{samples} samples")
+        samples = len(done)
+        recorded = np.asarray(done)
 
     # calculate reliability indices for the MCS
     indices = raut.GetReliabilityIndices(indices_rec, sim_hours, samples)
@@ -208,6 +419,13 @@ def MCS(input_file, results_subdir, stop_event=None) :
     df = pd.DataFrame([indices])
     df.to_csv(f"{results_subdir}/indices.csv", index=False)
 
+    if mcs_params.variance_reduction is not None:
+        # variance of the estimates with the sampling design relative to independent samples
+        reduction = raut.VarianceReduction(indices_rec, mcs_params.sample_offset + recorded)
+        logger.info("Effective variance reduction (%s): %s" % (mcs_params.variance_reduction, \
+                    ", ".join(f"{index} {value:.2f}x" for index, value in reduction.items())))
+        pd.DataFrame([reduction]).to_csv(f"{results_subdir}/variance_reduction.csv", index=False)
+
     if sim_hours == 8760:
         raut.OutageHeatMap(LOL_track, 1, samples, results_subdir)
 
@@ -223,19 +441,12 @@ def MCS(input_file, results_subdir, stop_event=None) :
     bus_statistics(results_subdir)
 
     # save config file alongside results for reproducibility
-    config_out = Path(results_subdir) / "config.txt"
-    with open(input_file) as f_in, open(config_out, "w") as f_out:
-        for line in f_in:
-            stripped = line.lstrip()
-            if stripped.startswith("#") or stripped.startswith("data:"):
-                continue
-            comment_pos = line.find(" #")
-            if comment_pos != -1:
-                line = line[:comment_pos] + "\n"
-            f_out.write(line)
+    save_config(input_file, results_subdir, mcs_params.seed)
 
     toc = perf_counter()
     logger.info(f"Codes finished in {toc-tic} seconds")
+    if mcs_params.screen_adequate_hours:
+        logger.info(f"Adequacy screening skipped the dispatch in {screened_total}/{samples*sim_hours} hours ({100*screened_total/(samples*sim_hours):.1f}%)")
 
     # get outage statistics for affected buses
     bus_statistics(results_subdir)
@@ -260,6 +471,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", help="Path to YAML configuration file. Default: input.yaml")
     parser.add_argument("--out", help="Optional: output directory. If not provided, a new Results_<timestamp> folder will be created.")
+    parser.add_argument("--replay-sample", type=int, help="Optional: simulate only this sample (1-based) of the run defined by the seed in the YAML file, e.g. to debug it.")
+    parser.add_argument("--workers", type=int, help="Optional: number of worker processes the samples are distributed over. Default: workers in the YAML file (1).")
     args = parser.parse_args()
 
     # --- Determine input YAML ---
@@ -279,4 +492,4 @@ if __name__ == "__main__":
         os.makedirs(results_subdir, exist_ok=True)
         
     # run MCS
-    indices, sim_hours, samples, mLOLP_rec, COV_rec = MCS(config_file, results_subdir)
+    indices, sim_hours, samples, mLOLP_rec, COV_rec = MCS(config_file, results_subdir, workers=args.workers, replay_sample=args.replay_sample)
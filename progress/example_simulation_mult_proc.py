@@ -1,7 +1,6 @@
 import numpy as np
 from time import perf_counter
 from pyomo.environ import *
-import copy
 import pandas as pd
 import os
 from mpi4py import MPI
@@ -11,7 +10,9 @@ import argparse
 
 from progress.mod_sysdata import RASystemData
 from progress.mod_utilities import RAUtilities
-from progress.mod_mcs_utils import MCS_utils, MCS_samples, MCS_hourly
+from progress.mod_batch import MCS_batch
+from progress.mod_mcs_utils import MCS_utils
+from progress.example_simulation import run_sample, save_config
 from progress.mod_plot import RAPlotTools
 from progress.mod_bus_statistics import bus_statistics
 
@@ -37,170 +38,69 @@ class ProgressMultiProcess:
         bus_params, gen_params, line_params, load_all_regions, ess_params = mcs_params.initialize_params()
 
         #Extract some commonly used parameters
+        if mcs_params.target_cov is not None:
+            # max_samples and min_samples count the samples of all processes
+            mcs_params.samples = int(np.ceil(mcs_params.samples/self.size))
         samples = mcs_params.samples
+        # all processes share the run seed of process 0; process r simulates samples r*samples ... (r+1)*samples - 1 of the run
+        mcs_params.seed = self.comm.bcast(mcs_params.seed, root=0)
+        mcs_params.sample_offset = self.rank*samples
+        if self.rank == 0:
+            print(f'Run seed: {mcs_params.seed}')
+            # the config with the seed of the run, so that any sample can be replayed with example_simulation.py --replay-sample
+            save_config(input_file, main_folder, mcs_params.seed)
         sim_hours = mcs_params.sim_hours
-        ng = gen_params["ng"]
-        nl = line_params["nl"]
-        ness = ess_params["ness"]
-        nz = mcs_params.bus_params["nz"]
-        BMva = mcs_params.BMva
-    
-        optimization_period = mcs_params.optimization_period
-        time_periods = mcs_params.time_periods
-        network_model = mcs_params.network_model
         
         mcs_params.process_renewable_data()
+        # importance sampling multipliers of process 0 (the cross-entropy pilot run is done once)
+        bias_factor = mcs_params.setup_importance_sampling() if self.rank == 0 else None
+        mcs_params.setup_importance_sampling(self.comm.bcast(bias_factor, root=0))
         gen_mat, ch_mat, A_inc, curt_mat, indices_rec, LOL_track = mcs_params.process_matrices()
 
-        # Instanciate commonly used classes
-        raut = RAUtilities(dispatch_solver=config.get('dispatch_solver', 'glpk'))
+        # utilities shared with the sample/hourly helpers, so that all samplers draw from the streams of the sample
+        raut = mcs_params.raut
 
         tic = perf_counter()
+        screened_total = 0 # hours in which the dispatch optimization was skipped by the adequacy screening
             
-        for s in range(samples):
-
-            print(f'Sample: {s+1}, Process No.: {self.rank}')
-            sample_instance= MCS_samples(mcs_params)
-            sample_instance.initialize_sample_data()
-            if optimization_period == "multi_period":
-                holder_dict = sample_instance.holder_dict
-                ess_smax_store = np.zeros((ness,sim_hours))
-
-            # initalize sample components that will be modified within the hourly loop
-            current_state = np.ones(ng + nl + ness) # all gens and TLs in up state at the start of the year
-            # temp variables to be used for each sample
-            var_s = {"t_min": 0, "LLD": 0, "curtailment": np.zeros(sim_hours), "label_LOLF": np.zeros(sim_hours), "freq_LOLF": 0, "LOL_days": 0, \
-                    "outage_day": np.zeros(365)}
-            # Initialize ESS SOC and duration which will be updated after dispatch and degradation evaluation in each hour
-            SOC_old = 0.5*(np.multiply(np.multiply(ess_params["ess_pmax"], ess_params["ess_duration"]), ess_params["ess_socmax"]))/BMva
-            ess_duration_temp = ess_params["ess_duration"].astype(float).copy()
-            ESS_initial_capacities = ess_params["ess_pmax"].copy()
-            
-            for n in range(sim_hours):
-
-                hourly_instance = MCS_hourly(sample_instance)
-                # get current states(up/down) and capacities of all system components
-                next_state, current_cap, var_s["t_min"] = raut.NextState(var_s["t_min"], ng, ness, nl, mcs_params.lambda_tot, mcs_params.mu_tot, \
-                                                                        current_state, mcs_params.cap_max, mcs_params.cap_min, ess_params["ess_units"])
-                current_state = copy.deepcopy(next_state)
-                net_load, tot_ren, w_zones, s_zones = hourly_instance.get_net_load(n)
-            
-                # optimize dipatch and calculate load curtailment
-                if optimization_period == "single_period":
-                    
-                    # calculate upper and lower bounds of gens and tls
-                    ess_smax, ess_smin, SOC_old = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
-                    sample_instance.ess_smax_store[:, n] = ess_smax
-
-                    gt_limits = {"g_lb": np.concatenate((current_cap["min"][0:ng]/BMva, current_cap["min"][ng + nl::]/BMva)), \
-                                "g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
-                                "tl": current_cap["max"][ng:ng + nl]/BMva}
-                    
-                    def fb_Pg(model, i):
-                        return (0, gt_limits["g_ub"][i])
-                    def fb_flow(model,i):
-                        return (-gt_limits["tl"][i], gt_limits["tl"][i])
-                    def fb_ess(model, i):
-                        return(-current_cap["max"][ng + nl::][i]/BMva, current_cap["min"][ng + nl::][i]/BMva)
-                    def fb_soc(model, i):
-                        return(ess_smin[i]/BMva, ess_smax[i]/BMva)
-                
-                    if network_model in ['Zonal', 'Nodal']:
-                        load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, A_inc, gen_mat, curt_mat, ch_mat, \
-                                                            gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], copper_sheet = False)
-                    elif network_model == 'Copper Sheet':
-                        load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, A_inc, gen_mat, curt_mat, ch_mat, \
-                                                                        gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], copper_sheet = True)
-                    # Store hourly and outage-specific data
-                    hourly_instance.record_hourly_data(load_curt, SOC_old, P_dis, P_ch, Pg, curtbus, w_zones, s_zones, n, flow, None)
-                    # track loss of load states
-                    var_s, LOL_track = raut.TrackLOLStates(load_curt, BMva, var_s, LOL_track, s, n)
-
-                    if (n+1)%1000 == 0:
-                        print(f'Hour {n + 1}, Process No.: {self.rank}')
-
-                if optimization_period  == "multi_period" and not mcs_params.enable_pcm:
-                    
-                    current_day,_ = divmod(n, 24)
-                    normalized_hour = n%time_periods
-
-                    ess_smax, ess_smin, _ = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
-                    sample_instance.ess_smax_store[:, n] = ess_smax
-
-                    holder_dict["g_limit"][normalized_hour] = {"g_lb": np.concatenate((current_cap["min"][0:ng]/BMva, current_cap["min"][ng + nl::]/BMva)), \
-                                "g_ub": np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva)), \
-                                "tl": current_cap["max"][ng:ng + nl]/BMva}
-                    holder_dict["capacity"][normalized_hour] = current_cap
-                    holder_dict["net_load"][:, normalized_hour] = net_load
-                    holder_dict["ess_min"][:, normalized_hour] = ess_smin
-                    holder_dict["ess_max"][:, normalized_hour] = ess_smax
-                    holder_dict["ren_limit"][:, normalized_hour] = tot_ren
-                    
-                    if (n+1)%time_periods == 0:
-                        
-                        def fb_Pg(model, i, t):
-                            return (0, holder_dict["g_limit"][t]["g_ub"][i])
-                        def fb_flow(model,i, t):
-                            return (-holder_dict["g_limit"][t]["tl"][i], holder_dict["g_limit"][t]["tl"][i])
-                        def fb_ess(model, i, t):
-                            return(-holder_dict["capacity"][t]["max"][ng + nl::][i]/BMva, holder_dict["capacity"][t]["min"][ng + nl::][i]/BMva)
-                        def fb_soc(model, i, t):
-                            return(holder_dict["ess_min"][i,t]/BMva, holder_dict["ess_max"][i,t]/BMva)
-                        def fb_ren(model, i, t):
-                            return(0, holder_dict["ren_limit"][i,t]/BMva)
-                        
-                        if network_model in ['Zonal', 'Nodal']:
-                            
-                            load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, \
-                                                                                                        A_inc, gen_mat, curt_mat, ch_mat, gen_params["gencost"], holder_dict["net_load"], \
-                                                                                                        SOC_old, ESS_initial_capacities, ess_params["ess_pmax"], ess_params["ess_eff"], \
-                                                                                                        ess_params["disch_cost"], ess_params["ch_cost"], time_periods, copper_sheet = False)
-                        elif network_model == 'Copper Sheet':
-                            load_curt, SOC_profile, P_dis, P_ch, Pg, flow, curtbus = raut.OptDispatchMP(ng, nz, nl, ness, fb_ess, fb_soc, fb_ren, BMva, fb_Pg, fb_flow, A_inc, 
-                                                                                                        gen_mat, curt_mat, ch_mat, gen_params["gencost"], holder_dict["net_load"], \
-                                                                                                        SOC_old, ESS_initial_capacities, ess_params["ess_pmax"], ess_params["ess_eff"], \
-                                                                                                        ess_params["disch_cost"], ess_params["ch_cost"], time_periods, copper_sheet = True)
-                        
-                        # record values for initilzing next optimiation period
-                        SOC_old = SOC_profile[:,-1]
-                        ESS_initial_capacities = current_cap["max"][ng + nl::]
-                        sample_instance.initialize_holder_vars(holder_dict)
-                        # Store hourly and outage-specific data
-                        hourly_instance.record_hourly_data(load_curt, SOC_profile, P_dis, P_ch, Pg, curtbus, w_zones, s_zones, n, flow, current_day)
-                        
-                        # track loss of load states
-                        for i in range(time_periods):
-                            start_day = int(current_day+1-time_periods/24)
-                            current_n = start_day * 24 + i
-                            var_s, LOL_track = raut.TrackLOLStates(load_curt[i], BMva, var_s, LOL_track, s, current_n)
-
-                if mcs_params.enable_pcm:
-                    ess_smax, ess_smin, _ = raut.updateSOC(ng, nl, current_cap, ess_params["ess_pmax"], ess_duration_temp, ess_params["ess_socmax"], ess_params["ess_socmin"], SOC_old)
-                    hourly_instance.populate_pcm_data(n, ng, nl, ness, current_cap, ess_smax, ess_smin, holder_dict)
-
-                if mcs_params.evaluate_degradation == True and not mcs_params.enable_pcm:
-                    if (n+1)%time_periods == 0:
-                        SOC_old, ess_duration_temp = hourly_instance.degradation_evaluation(n, ess_duration_temp, SOC_old)
-
-                if (n+1)%1000 == 0:
-                    print(f'Hour {n + 1}, Process No.: {self.rank}')
-
-            # collect indices for all samples
-            if mcs_params.enable_pcm:
-                sample_subdir = os.path.join(main_folder, f'Process_{self.rank}', f'Sample_{s+1}')
-                os.makedirs(sample_subdir, exist_ok=False)
-                var_s, LOL_track = sample_instance.run_pcm(sample_subdir, holder_dict, s, var_s, LOL_track)
-
-            indices_rec = raut.UpdateIndexArrays(indices_rec, var_s, sim_hours, s)
-
-            mLOLP_rec, COV_rec = raut.CheckConvergence(s, indices_rec["LOLP_rec"], self.comm, self.rank, self.size, \
-                                  indices_rec["mLOLP_rec"], indices_rec["COV_rec"])
-            
-            # plot results for samples for which there is load curtailment
-            if sum(sample_instance.curt_rec) > 0:
-                sample_subdir = os.path.join(main_folder, f'Process_{self.rank}', f'Sample_{s+1}')
-                os.makedirs(sample_subdir, exist_ok=False)
-                sample_instance.export_sample_results(sample_subdir, s)
+        if mcs_params.batch_samples > 0:
+            # all samples of this process simulated in blocks of batch_samples with NumPy arrays; only the indices are recorded
+            batch = MCS_batch(mcs_params, raut, mcs_params.batch_samples, comm = self.comm)
+            indices_rec, LOL_track, _ = batch.run(indices_rec, LOL_track)
+            done = batch.samples_done
+            for s in range(done):
+                mLOLP_rec, COV_rec = raut.CheckConvergence(s, indices_rec["LOLP_rec"], self.comm, self.rank, self.size, \
+                                      indices_rec["mLOLP_rec"], indices_rec["COV_rec"])
+        else:
+            done = samples
+            for s in range(samples):
+
+                # samples are numbered by their index in the run (rank*samples + s + 1), as used by --replay-sample
+                sample_no = mcs_params.sample_offset + s + 1
+                print(f'Sample: {sample_no}, Process No.: {self.rank}')
+                # the hourly loop of a sample is the one of the single-process MCS; the results of the samples of this
+                # process are saved in main_folder/Process_<rank>/Sample_<sample_no>
+                var_s, LOL_track[s] = run_sample(s, mcs_params, raut, os.path.join(main_folder, f'Process_{self.rank}'))
+
+                if mcs_params.screen_adequate_hours:
+                    screened_total += var_s["screened_hours"]
+                    print(f'Sample {sample_no}: {var_s["screened_hours"]}/{sim_hours} hours screened as adequate, Process No.: {self.rank}')
+
+                indices_rec = raut.UpdateIndexArrays(indices_rec, var_s, sim_hours, s)
+
+                mLOLP_rec, COV_rec = raut.CheckConvergence(s, indices_rec["LOLP_rec"], self.comm, self.rank, self.size, \
+                                      indices_rec["mLOLP_rec"], indices_rec["COV_rec"])
+
+                # all processes see the same global moments and stop after the same sample
+                if mcs_params.target_cov_reached(indices_rec, list(range(s + 1)), self.comm):
+                    done = s + 1
+                    break
+
+        if done < samples:
+            # stopped early by the target COV: only the simulated samples enter the indices and plots
+            indices_rec, LOL_track = raut.TruncateIndexArrays(indices_rec, LOL_track, list(range(done)))
+            mLOLP_rec, COV_rec = indices_rec["mLOLP_rec"], indices_rec["COV_rec"]
+            samples = done
 
         # calculate reliability indices for the MCS
         indices = raut.GetReliabilityIndices(indices_rec, sim_hours, samples)
@@ -208,6 +108,8 @@ class ProgressMultiProcess:
         
         toc = perf_counter()
         print(f"Codes finished in {toc-tic} seconds")
+        if mcs_params.screen_adequate_hours:
+            print(f"Adequacy screening skipped the dispatch in {screened_total}/{samples*sim_hours} hours, Process No.: {self.rank}")
 
         return(self.rank, main_folder, sim_hours, mLOLP_rec, COV_rec, samples, self.size)
 
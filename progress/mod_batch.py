@@ -0,0 +1,351 @@
+# import python modules
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SampleStreams:
+    '''
+    Random streams of the samples of a block, one per sample as seeded by RAUtilities.SeedSample. Every draw is
+    made from the own stream of each sample and stacked along the first axis, so that the draws of a sample do not
+    depend on the other samples of its block.
+    '''
+    def __init__(self, streams):
+        """
+        Initializes the streams of a block.
+
+        Parameters:
+            streams (list): Random streams (numpy.random.Generator) of the samples.
+        """
+        self.streams = streams
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        """Returns uniform draws of shape size for every sample (samples x size)."""
+        return(np.stack([rng.uniform(low, high, size) for rng in self.streams]))
+
+    def standard_exponential(self, size=None):
+        """Returns standard exponential draws of shape size for every sample (samples x size)."""
+        return(np.stack([rng.standard_exponential(size) for rng in self.streams]))
+
+    def masked_exponential(self, mask):
+        """Returns standard exponential draws for the True entries of mask (samples x items), in the order of mask indexing."""
+        counts = mask.reshape(len(self.streams), -1).sum(axis = 1)
+        draws = [rng.standard_exponential(n) for rng, n in zip(self.streams, counts) if n > 0]
+        return(np.concatenate(draws) if draws else np.empty(0))
+
+class MCS_batch:
+    '''
+    Batched sampler for the single-period MCS: a block of samples is simulated at once with NumPy arrays.
+
+    Component states, wind speed classes and solar cluster/day picks are generated for all samples of the block
+    together as (samples, hours, components/zones) arrays, one day at a time. Every hour the adequacy screening is
+    vectorized across the samples, and only the samples that fail it are sent to the dispatch optimization.
+    Component states follow the event-driven clocks of StateTimeline, wind classes and solar picks follow
+    RAUtilities.WindPower and RAUtilities.SolarPower. Every sample draws from its own streams (SampleStreams), so
+    its results do not depend on the block it is simulated in and it can be replayed alone.
+    '''
+    def __init__(self, mcs_params, raut, batch_size, comm=None):
+        """
+        Initializes the batched sampler.
+
+        Parameters:
+            mcs_params (MCS_utils): Simulation parameters, after process_renewable_data and process_matrices.
+            raut (RAUtilities): Utilities instance; its random streams and dispatch methods are used.
+            batch_size (int): Number of samples simulated together.
+            comm (MPI.Comm): Optional MPI communicator; the target COV is then checked over the samples of all processes.
+        """
+        self.mcs = mcs_params
+        self.raut = raut
+        self.batch_size = batch_size
+        self.comm = comm
+        self.samples_done = 0
+        self.block_hours = 24 # solar picks are made per day
+
+        self.ng = mcs_params.gen_params["ng"]
+        self.nl = mcs_params.line_params["nl"]
+        self.ness = mcs_params.ess_params["ness"]
+        self.nz = mcs_params.bus_params["nz"]
+        self.BMva = mcs_params.BMva
+        self.copper_sheet = mcs_params.network_model == 'Copper Sheet'
+
+        if mcs_params.wind_dir_exists:
+            wind_params = mcs_params.wind_params
+            self.w_zone_mat = raut.ZoneMatrix(self.nz, wind_params["zone_no"])
+            # power of every site in every wind speed class, and transition rates without zeros
+            self.w_class_power = wind_params["class_power"]
+            self.w_tr_rates = wind_params["tr_mats"]
+            self.w_tr_cdf = wind_params["tr_cdf"]
+
+        if mcs_params.solar_dir_exists:
+            solar_params = mcs_params.solar_params
+            self.s_zone_mat = solar_params["zone_mat"]
+
+    def initialize_block(self, S, s0):
+        """
+        Seeds the streams of a block of samples and initializes their clocks, wind speed classes and loads. All
+        components are up at hour 0.
+
+        Parameters:
+            S (int): Number of samples in the block.
+            s0 (int): Index of the first sample of the block.
+        """
+        mcs, raut = self.mcs, self.raut
+        streams, loads = [], []
+        for s in range(S):
+            raut.SeedSample(mcs.seed, mcs.sample_offset + s0 + s)
+            streams.append((raut.rng, raut.wind_rng, raut.solar_rng))
+            # data center load profiles are picked per sample
+            if mcs.DC_load_present:
+                loads.append(raut.data_center_load(mcs.load_all_regions, mcs.system_directory, mcs.network_model).values)
+        self.rng, self.wind_rng, self.solar_rng = (SampleStreams(list(family)) for family in zip(*streams))
+
+        n_gt = self.ng + self.nl
+        lambda_tot, mu_tot = mcs.lambda_tot, mcs.mu_tot
+        self.up = np.ones((S, n_gt), dtype = bool)
+        self.t_gt = self.rng.standard_exponential(n_gt)/lambda_tot[0:n_gt]
+        self.units_down = np.zeros((S, self.ness), dtype = int)
+        self.t_fail = self.rng.standard_exponential(self.ness)/lambda_tot[n_gt::]
+        self.t_rep = np.full((S, self.ness), np.inf)
+
+        if mcs.wind_dir_exists:
+            self.w_class = np.floor(self.wind_rng.uniform(0, 1, mcs.wind_params["w_sites"])*mcs.wind_params["w_classes"]).astype(int)
+
+        if mcs.DC_load_present:
+            self.loads = np.stack(loads)*mcs.load_factor
+        else:
+            self.loads = self.mcs.load_factor*self.mcs.load_all_regions.values[None, :, :]
+
+    def component_states(self, start, hours):
+        """
+        Advances the failure/repair clocks of all samples and returns the component states hour by hour.
+        The state in an hour includes all transitions that happen before the end of that hour.
+
+        Parameters:
+            start (int): First hour of the block.
+            hours (int): Number of hours.
+
+        Returns:
+            numpy.ndarray: Component states (samples x hours x components).
+        """
+        n_gt = self.ng + self.nl
+        lambda_tot, mu_tot = self.mcs.lambda_tot, self.mcs.mu_tot
+        ess_units = np.asarray(self.mcs.ess_params["ess_units"])
+        states = np.empty((self.up.shape[0], hours, n_gt + self.ness))
+
+        for h in range(hours):
+            end = start + h + 1
+
+            # generators and lines toggle between up and down
+            due = self.t_gt < end
+            while due.any():
+                self.up[due] = ~self.up[due]
+                rates = np.where(self.up, lambda_tot[0:n_gt], mu_tot[0:n_gt])[due]
+                self.t_gt[due] += self.rng.masked_exponential(due)/rates
+                due = self.t_gt < end
+
+            # ESS lose/regain one unit at a time; the earlier of the two clocks fires first
+            due = np.minimum(self.t_fail, self.t_rep) < end
+            while due.any():
+                fail = due & (self.t_fail <= self.t_rep)
+                repair = due & ~fail
+
+                lose = fail & (self.units_down < ess_units)
+                self.units_down[lose] += 1
+                start_rep = lose & (self.units_down == 1)
+                self.t_rep[start_rep] = self.t_fail[start_rep] + self.rng.masked_exponential(start_rep)/np.broadcast_to(mu_tot[n_gt::], start_rep.shape)[start_rep]
+                self.t_fail[fail] += self.rng.masked_exponential(fail)/np.broadcast_to(lambda_tot[n_gt::], fail.shape)[fail]
+
+                self.units_down[repair] -= 1
+                more = repair & (self.units_down > 0)
+                self.t_rep[more] += self.rng.masked_exponential(more)/np.broadcast_to(mu_tot[n_gt::], more.shape)[more]
+                self.t_rep[repair & ~more] = np.inf
+
+                due = np.minimum(self.t_fail, self.t_rep) < end
+
+            states[:, h, 0:n_gt] = self.up
+            states[:, h, n_gt::] = 1 - self.units_down/ess_units
+
+        return(states)
+
+    def wind_power(self, hours):
+        """
+        Advances the wind speed classes of all samples and sites and returns the zonal wind generation.
+
+        Parameters:
+            hours (int): Number of hours.
+
+        Returns:
+            numpy.ndarray: Wind generation (samples x hours x zones).
+        """
+        S, w_sites = self.w_class.shape
+        w_classes = self.w_tr_rates.shape[2]
+        sites = np.arange(w_sites)[None, :]
+        w_zones = np.empty((S, hours, self.nz))
+        for h in range(hours):
+            if self.mcs.wind_trajectories:
+                # next classes from the cumulative transition rows, as in RAUtilities.WindClassTrajectory
+                rows = sites*w_classes + self.w_class
+                self.w_class = np.searchsorted(self.w_tr_cdf, self.wind_rng.uniform(0, 1, w_sites) + 2*rows, side = 'right') - rows*w_classes
+                np.minimum(self.w_class, w_classes - 1, out = self.w_class)
+            else:
+                # competing exponential clocks out of the current class, as in RAUtilities.WindPower
+                rates = self.w_tr_rates[sites, self.w_class, :]
+                self.w_class = np.argmin(self.wind_rng.standard_exponential(rates.shape[1::])/rates, axis = 2)
+            w_zones[:, h, :] = self.w_class_power[sites, self.w_class]@self.w_zone_mat.T
+        return(w_zones)
+
+    def solar_power(self, start, hours):
+        """
+        Picks a solar cluster and a day of that cluster for every sample and returns the zonal solar generation.
+
+        Parameters:
+            start (int): First hour of the block (start of a day).
+            hours (int): Number of hours (at most 24).
+
+        Returns:
+            numpy.ndarray: Solar generation (samples x hours x zones).
+        """
+        solar_params = self.mcs.solar_params
+        S = self.up.shape[0]
+        month = np.floor(start/731).astype(int)
+        order, cdf = solar_params["cluster_cdf"]
+        clusters = order[month, np.minimum(np.searchsorted(cdf[month], self.solar_rng.uniform(0, 1), side = "right"), cdf.shape[1] - 1)]
+        day_draws = self.solar_rng.uniform(0, 1)
+
+        s_zones = np.zeros((S, 24, self.nz))
+        for c in np.unique(clusters):
+            picked = clusters == c
+            profiles = solar_params["s_profiles"][c]
+            days = np.floor(day_draws[picked]*profiles.shape[0]).astype(int)
+            s_zones[picked] = (profiles[days]*solar_params["s_max"])@self.s_zone_mat.T
+        return(s_zones[:, 0:hours, :])
+
+    def dispatch(self, current_cap, net_load, SOC_old, ess_smax, ess_smin, sample=None):
+        """
+        Solves the single-period dispatch of one sample (index sample in the block) in one hour, exactly as the sequential MCS loop does.
+
+        Returns:
+            tuple: Load curtailment and updated state of charge.
+        """
+        mcs, ng, nl, ness, nz, BMva = self.mcs, self.ng, self.nl, self.ness, self.nz, self.BMva
+        ess_params = mcs.ess_params
+        g_ub = np.concatenate((current_cap["max"][0:ng]/BMva, current_cap["max"][ng + nl::]/BMva))
+        tl = current_cap["max"][ng:ng + nl]/BMva
+
+        def fb_Pg(model, i):
+            return (0, g_ub[i])
+        def fb_flow(model,i):
+            return (-tl[i], tl[i])
+        def fb_ess(model, i):
+            return(-current_cap["max"][ng + nl::][i]/BMva, current_cap["min"][ng + nl::][i]/BMva)
+        def fb_soc(model, i):
+            return(ess_smin[i]/BMva, ess_smax[i]/BMva)
+
+        if mcs.persistent_dispatch:
+            load_curt, SOC_old, *_ = mcs.dispatch.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old, sample = sample)
+        else:
+            load_curt, SOC_old, *_ = self.raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, mcs.A_inc, mcs.gen_mat, mcs.curt_mat, \
+                                                           mcs.ch_mat, mcs.gen_params["gencost"], net_load, SOC_old, ess_params["ess_pmax"], \
+                                                           ess_params["ess_eff"], ess_params["disch_cost"], ess_params["ch_cost"], self.copper_sheet)
+        return(load_curt, SOC_old)
+
+    def sample_record(self, curt):
+        """
+        Builds the per-sample record used by RAUtilities.UpdateIndexArrays from the hourly load curtailment,
+        with the same counting rules as RAUtilities.TrackLOLStates.
+
+        Parameters:
+            curt (array): Hourly load curtailment of one sample (p.u.).
+
+        Returns:
+            tuple: Dictionary of sample variables and the loss of load label of every hour.
+        """
+        sim_hours = curt.size
+        label = (curt > 0).astype(float)
+        days = sim_hours//24
+        outage_day = np.zeros(365)
+        outage_day[0:days] = label[0:days*24].reshape(days, 24).sum(axis = 1)
+
+        var_s = {"LLD": label.sum(), "curtailment": np.where(curt > 0, curt*self.BMva, 0), "label_LOLF": label, \
+                 "freq_LOLF": np.sum((label[1::] == 1) & (label[0:-1] == 0)), "LOL_days": np.sum(outage_day > 0), "outage_day": outage_day}
+        return(var_s, label)
+
+    def run(self, indices_rec, LOL_track):
+        """
+        Runs all samples in blocks of batch_size samples.
+
+        Parameters:
+            indices_rec (dict): Dictionary of indices to be recorded.
+            LOL_track (array): Array to track loss of load.
+
+        Returns:
+            tuple: Updated indices recorder, loss of load tracker and the number of hours sent to the dispatch optimization.
+        """
+        mcs, raut = self.mcs, self.raut
+        ng, nl, BMva = self.ng, self.nl, self.BMva
+        ess_params = mcs.ess_params
+        samples, sim_hours = mcs.samples, mcs.sim_hours
+        lp_hours = 0
+
+        for s0 in range(0, samples, self.batch_size):
+            S = min(self.batch_size, samples - s0)
+            logger.info(f'Samples: {s0 + 1}-{s0 + S}/{samples}')
+            self.initialize_block(S, s0)
+            if mcs.dispatch is not None:
+                mcs.dispatch.reset() # the samples of the block are interleaved; each keeps its own last optimal basis
+
+            curt = np.zeros((S, sim_hours))
+            SOC = np.tile(0.5*(ess_params["ess_pmax"]*ess_params["ess_duration"]*ess_params["ess_socmax"])/BMva, (S, 1))
+
+            for start in range(0, sim_hours, self.block_hours):
+                hours = min(self.block_hours, sim_hours - start)
+                states = self.component_states(start, hours)
+                net_load = np.broadcast_to(self.loads[:, start:start + hours, :], (S, hours, self.nz)).copy()
+                if mcs.wind_dir_exists:
+                    net_load -= self.wind_power(hours)
+                if mcs.solar_dir_exists:
+                    net_load -= self.solar_power(start, hours)
+
+                for h in range(hours):
+                    n = start + h
+                    cap_max = states[:, h, :]*mcs.cap_max
+                    ess_cap = cap_max[:, ng + nl::]
+                    # same SOC limits and SOC rescaling as RAUtilities.updateSOC
+                    ess_smax = ess_cap*ess_params["ess_duration"]*ess_params["ess_socmax"]
+                    ess_smin = ess_cap*ess_params["ess_duration"]*ess_params["ess_socmin"]
+                    SOC = ess_cap*SOC/ess_params["ess_pmax"]
+
+                    screened, SOC_screen, _, _ = raut.AdequacyScreenBatch(ng, nl, BMva, cap_max, net_load[:, h, :], SOC, ess_smax, ess_smin, \
+                                                                          mcs.gen_mat, mcs.ch_mat, ess_params["ess_eff"], ess_params["disch_cost"], \
+                                                                          ess_params["ch_cost"], self.copper_sheet)
+                    SOC[screened] = SOC_screen[screened]
+                    pending = np.nonzero(~screened)[0]
+                    if mcs.merit_order_dispatch:
+                        solved, curt_mo, SOC_mo, *_ = raut.MeritOrderDispatchBatch(ng, nl, BMva, cap_max[pending], net_load[pending, h, :], SOC[pending], \
+                                                                                   ess_smax[pending], ess_smin[pending], mcs.gen_params["gencost"], \
+                                                                                   ess_params["ess_pmax"], ess_params["ess_eff"], ess_params["disch_cost"], \
+                                                                                   ess_params["ch_cost"])
+                        curt[pending[solved], n], SOC[pending[solved]] = curt_mo[solved], SOC_mo[solved]
+                        pending = pending[~solved]
+                    for s in pending:
+                        current_cap = {"max": cap_max[s], "min": states[s, h, :]*mcs.cap_min}
+                        maxflow = mcs.maxflow.solve(current_cap, net_load[s, h, :], SOC[s], ess_smax[s], ess_smin[s]) if mcs.maxflow is not None else None
+                        if maxflow is not None:
+                            curt[s, n], SOC[s] = maxflow[0:2]
+                            continue
+                        curt[s, n], SOC[s] = self.dispatch(current_cap, net_load[s, h, :], SOC[s], ess_smax[s], ess_smin[s], sample = s)
+                        lp_hours += 1
+
+            for s in range(S):
+                var_s, LOL_track[s0 + s] = self.sample_record(curt[s])
+                indices_rec = raut.UpdateIndexArrays(indices_rec, var_s, sim_hours, s0 + s)
+                indices_rec["mLOLP_rec"][s0 + s] = np.mean(indices_rec["LOLP_rec"][0:s0 + s + 1])
+                indices_rec["COV_rec"][s0 + s] = np.sqrt(np.var(indices_rec["LOLP_rec"][0:s0 + s + 1]))/indices_rec["mLOLP_rec"][s0 + s]
+            self.samples_done = s0 + S
+
+            # the stopping rule is checked after every block
+            if mcs.target_cov_reached(indices_rec, list(range(self.samples_done)), self.comm):
+                break
+
+        logger.info(f"Batched sampling: {lp_hours}/{samples*sim_hours} sample-hours sent to the dispatch optimization")
+        return(indices_rec, LOL_track, lp_hours)
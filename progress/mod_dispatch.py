@@ -0,0 +1,615 @@
+# import python modules
+import logging
+from pyomo.environ import *
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_BACKENDS = ['pyomo', 'highs']
+
+def make_dispatch(backend, ng, nz, nl, ness, BMva, A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, \
+                  disch_cost, ch_cost, copper_sheet, dispatch_solver='glpk', warm_start=True, time_periods=None):
+    """
+    Creates the dispatch backend. Every backend is built once, has a reset() method called at the start of each
+    sample, and a solve method that returns the same tuple as RAUtilities.OptDispatch (single-period) or
+    RAUtilities.OptDispatchMP (multi-period). Falls back to the Pyomo path if highspy is not installed.
+
+    Parameters:
+        backend (str): 'pyomo' (PersistentDispatch, the reference backend) or 'highs' (HighsDispatch, HighsDispatchMP).
+        warm_start (bool): Start every solve of the highs backend from the last optimal basis of the sample.
+        time_periods (int): Length of the multi-period windows; None for the single-period dispatch.
+        Other parameters: See PersistentDispatch.
+
+    Returns:
+        Dispatch backend, or None for the multi-period Pyomo dispatch (RAUtilities.OptDispatchMP builds its model
+        every window).
+    """
+    if backend not in DISPATCH_BACKENDS:
+        raise ValueError(f"Unknown dispatch backend '{backend}'; use one of {', '.join(DISPATCH_BACKENDS)}")
+    args = (ng, nz, nl, ness, BMva, A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, disch_cost, ch_cost, copper_sheet)
+    if backend == 'highs':
+        try:
+            if time_periods is None:
+                return(HighsDispatch(*args, warm_start = warm_start))
+            return(HighsDispatchMP(*args, time_periods, warm_start = warm_start))
+        except ImportError:
+            logger.warning("highspy is not available, falling back to the Pyomo dispatch")
+    if time_periods is not None:
+        return(None)
+    return(PersistentDispatch(*args, dispatch_solver = dispatch_solver))
+
+def _hourly_matrix(ng, nz, nl, ness, A_inc, gen_mat, curt_mat, ch_mat, ess_eff, copper_sheet, copper_ren_curt):
+    """
+    Constraint matrix of one hour of the dispatch LP, with the same constraints as RAUtilities.OptDispatch.
+
+    Columns: flow (nl), Pg (ng + ness), Pc (ness), SOC (ness), curt (nz), renewable curtailment (nz).
+    Rows: power balance (nz rows, or one row for the copper sheet model), SOC update (ness), charge/discharge (ness).
+
+    Parameters:
+        copper_ren_curt (bool): Whether the renewable curtailment enters the copper sheet balance (multi-period model).
+        Other parameters: See PersistentDispatch.
+
+    Returns:
+        tuple: Dense matrix and the column offsets of flow, Pg, Pc, SOC, curt and renewable curtailment.
+    """
+    offsets = np.cumsum([0, nl, ng + ness, ness, ness, nz])
+    c_flow, c_Pg, c_Pc, c_SOC, c_curt, c_rcurt = offsets
+    n_bal = 1 if copper_sheet else nz
+
+    A = np.zeros((n_bal + 2*ness, c_rcurt + nz))
+    ess = np.arange(ness)
+    if copper_sheet == False:
+        A[0:nz, c_flow:c_Pg] = np.transpose(A_inc)
+        A[0:nz, c_Pg:c_Pc] = gen_mat
+        A[0:nz, c_Pc:c_SOC] = ch_mat
+        A[0:nz, c_curt:c_rcurt] = curt_mat
+        A[0:nz, c_rcurt:] = -np.eye(nz)
+    else:
+        A[0, c_Pg:c_SOC] = 1.0
+        A[0, c_curt:c_rcurt] = 1.0
+        if copper_ren_curt:
+            A[0, c_rcurt:] = -1.0
+    A[n_bal + ess, c_SOC + ess] = 1.0
+    A[n_bal + ess, c_Pc + ess] = ess_eff
+    A[n_bal + ess, c_Pg + ng + ess] = 1.0
+    A[n_bal + ness + ess, c_Pc + ess] = -1.0
+    A[n_bal + ness + ess, c_Pg + ng + ess] = 1.0
+    return(A, offsets)
+
+
+class PersistentDispatch:
+    '''
+    Single-period economic dispatch model that is built once and re-solved every hour.
+
+    The model has the same variables, constraints and objective as RAUtilities.OptDispatch. Only the variable
+    bounds and the mutable net load / previous SOC parameters change between hours, so the Pyomo model
+    construction cost is paid once per simulation instead of once per simulated hour.
+    '''
+    def __init__(self, ng, nz, nl, ness, BMva, A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, \
+                 disch_cost, ch_cost, copper_sheet, dispatch_solver='glpk'):
+        """
+        Builds the persistent dispatch model and the solver used to re-solve it.
+
+        Parameters:
+            ng (int): Number of generators.
+            nz (int): Number of zones.
+            nl (int): Number of lines.
+            ness (int): Number of energy storage systems.
+            BMva (float): Base power in MVA.
+            A_inc (array): Incidence matrix.
+            gen_mat (array): Generation matrix.
+            curt_mat (array): Curtailment matrix.
+            ch_mat (array): Charging matrix.
+            gencost (array): Generation costs.
+            ess_pmax (array): Maximum power outputs of energy storage systems.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+            copper_sheet (bool): Use copper sheet model or not.
+            dispatch_solver (str): Pyomo solver name. Persistent (appsi) solvers are re-used across solves.
+        """
+        self.ng = ng
+        self.nz = nz
+        self.nl = nl
+        self.ness = ness
+        self.BMva = BMva
+        self.copper_sheet = copper_sheet
+
+        self.model = self.build_model(A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, disch_cost, ch_cost)
+        self.opt, self.dispatch_solver = self.get_solver(dispatch_solver)
+        logger.info(f"Persistent dispatch model built; solver: {self.dispatch_solver}")
+
+    def build_model(self, A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, disch_cost, ch_cost):
+        """
+        Declares the dispatch model. Hour-dependent data are mutable parameters or variable bounds.
+
+        Returns:
+            ConcreteModel: Dispatch model.
+        """
+        ng, nz, nl, ness, BMva = self.ng, self.nz, self.nl, self.ness, self.BMva
+
+        model = ConcreteModel() # declaring the model
+
+        # hour-dependent parameters
+        model.net_load = Param(range(nz), initialize = 0.0, mutable = True) # net load in p.u.
+        model.SOC_old = Param(range(ness), initialize = 0.0, mutable = True) # SOC at the end of the previous hour
+
+        # declaring the variables (bounds are set before each solve)
+        model.flow = Var(range(nl)) # line flow variables
+        model.Pg = Var(range(ng + ness)) # power output for conventional generators and ESS discharge
+        model.Pc = Var(range(ness)) # charge variables for ESS
+        model.SOC = Var(range(ness)) # state-of-charge variables for ESS
+        model.curt = Var(range(nz), bounds = (0, None)) # load curtailment variables
+        model.renewable_curt = Var(range(nz), bounds = (0, None)) # renewable load curtailment variables
+        A_inc_t = np.transpose(A_inc) # transposing incedence matrix
+
+        LOL_cost = 10000000 # cost of lost load (set to very high so that system always tries to minimize loss)
+
+        # power balance constraint
+        if self.copper_sheet == False:
+            def con_rule1(model,i):
+                return(sum(A_inc_t[i, j]*model.flow[j] for j in range(nl))\
+                        + sum(gen_mat[i,m]*model.Pg[m] for m in range(ng + ness)) \
+                        + sum(ch_mat[i,m]*model.Pc[m] for m in range(ness)) \
+                        + sum(curt_mat[i,c]*model.curt[c] for c in range(nz)) == model.renewable_curt[i] + model.net_load[i])
+
+            model.equality = Constraint(range(nz), rule = con_rule1)
+        else:
+            def con_rule1(model):
+                return(sum(model.Pg[m] for m in range(ng + ness)) + sum(model.Pc[m] for m in range(ness)) \
+                    + sum(model.curt[c] for c in range(nz)) >= sum(model.net_load[i] for i in range(nz)))
+
+            model.equality = Constraint(rule = con_rule1)
+
+            for i in range(nl):
+                model.flow[i].fix(0.0)
+
+        # soc update constraint
+        def con_rule2(model, i):
+            return(model.SOC[i] == model.SOC_old[i] - ess_eff[i]*model.Pc[i] - model.Pg[ng + i])
+
+        model.soc_constraint = Constraint(range(ness), rule = con_rule2)
+
+        # charge discharge constraint for the soc
+        def con_rule3(model, i):
+            return(-model.Pc[i] + model.Pg[ng + i] <= ess_pmax[i]/BMva)
+
+        model.chdis_constraint = Constraint(range(ness), rule = con_rule3)
+
+        # Objective ----> minimize total cost (cost of gen + cost of storage + cost of lost load)
+        model.objective = Objective(expr = sum(model.curt[i] for i in range(nz))*LOL_cost + \
+                                    sum(gencost[i]*model.Pg[i] for i in range(ng)) + \
+                                    sum(disch_cost[i]*model.Pg[ng + i] for i in range(ness)) + \
+                                    sum(ch_cost[i]*model.Pc[i] for i in range(ness)))
+
+        return(model)
+
+    def get_solver(self, dispatch_solver):
+        """
+        Creates the solver. Persistent (appsi) solvers keep the model loaded between solves, so only the
+        changed bounds and parameters are sent to the solver each hour. Falls back to glpk if the requested
+        solver is not available.
+
+        Parameters:
+            dispatch_solver (str): Pyomo solver name.
+
+        Returns:
+            tuple: Solver object and the name of the solver actually used.
+        """
+        opt = SolverFactory(dispatch_solver)
+        if not opt.available(exception_flag=False):
+            logger.warning(f"Dispatch solver {dispatch_solver} is not available, falling back to glpk")
+            dispatch_solver = 'glpk'
+            opt = SolverFactory(dispatch_solver)
+
+        if dispatch_solver.startswith('appsi_'):
+            # the model structure never changes; only variable bounds and parameter values are updated
+            opt.update_config.check_for_new_or_removed_constraints = False
+            opt.update_config.check_for_new_or_removed_vars = False
+            opt.update_config.check_for_new_or_removed_params = False
+            opt.update_config.check_for_new_objective = False
+            opt.update_config.update_constraints = False
+            opt.update_config.update_named_expressions = False
+            opt.update_config.update_objective = False
+
+        return(opt, dispatch_solver)
+
+    def reset(self):
+        """
+        Called at the start of each sample. Nothing to do: appsi solvers keep their own warm start between solves,
+        and the other Pyomo solvers always start from scratch.
+        """
+
+    def solve(self, fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old, sample=None):
+        """
+        Updates the hour-dependent bounds and parameters and re-solves the dispatch model.
+
+        Parameters:
+            fb_ess (function): Function for bounds of ESS variables.
+            fb_soc (function): Function for bounds of SOC variables.
+            fb_Pg (function): Function for bounds of generation variables.
+            fb_flow (function): Function for bounds of flow variables.
+            net_load (array): Net load.
+            SOC_old (array): Previous state of charge.
+            sample (int): Sample of the hour; only used by the highs backend.
+
+        Returns:
+            tuple: Load curtailment, updated state of charge, flow statistics
+        """
+        model = self.model
+        ng, ness = self.ng, self.ness
+
+        for i in range(ng + ness):
+            model.Pg[i].setlb(fb_Pg(model, i)[0])
+            model.Pg[i].setub(fb_Pg(model, i)[1])
+        if self.copper_sheet == False:
+            for i in range(self.nl):
+                model.flow[i].setlb(fb_flow(model, i)[0])
+                model.flow[i].setub(fb_flow(model, i)[1])
+        for i in range(ness):
+            model.Pc[i].setlb(fb_ess(model, i)[0])
+            model.Pc[i].setub(fb_ess(model, i)[1])
+            model.SOC[i].setlb(fb_soc(model, i)[0])
+            model.SOC[i].setub(fb_soc(model, i)[1])
+            model.SOC_old[i] = SOC_old[i]
+        for i in range(self.nz):
+            model.net_load[i] = net_load[i]/self.BMva
+
+        self.opt.solve(model)
+
+        load_curt = sum(np.array(list(model.curt.get_values().values())))
+        if load_curt > 0:
+            Pg = np.array(list(model.Pg.get_values().values()))[0:ng]
+            flow = np.array(list(model.flow.get_values().values()))
+            curtbus = np.array(list(model.curt.get_values().values()))
+        else:
+            Pg = 0
+            flow = 0
+            curtbus = 0
+
+        SOC_old = np.array(list(model.SOC.get_values().values()))
+        P_dis = np.array(list(model.Pg.get_values().values()))[ng::]
+        P_ch = np.array(list(model.Pc.get_values().values()))
+        return(load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus)
+
+class _HighsBackend:
+    '''
+    HiGHS instance of the highspy dispatch backends and its warm start bookkeeping.
+
+    HiGHS keeps the basis of its last solve, so consecutive solves of a sample start from the last optimal basis
+    after the bounds are updated. When the samples are interleaved (batched sampling), the last optimal basis of
+    every sample is kept in its own slot and restored before that sample is solved again. reset() is called at
+    the start of each sample (or block of samples), so that a sample never starts from the basis of another one
+    and its dispatch does not depend on the order in which the samples are simulated.
+    '''
+    def load_lp(self, cost, col_lower, col_upper, row_lower, row_upper, rows, cols, values, warm_start):
+        """
+        Passes the LP to a new HiGHS instance. The constraint matrix is given by its nonzeros, sorted by row.
+
+        Parameters:
+            cost, col_lower, col_upper (array): Costs and bounds of the columns.
+            row_lower, row_upper (array): Bounds of the rows.
+            rows, cols, values (array): Nonzeros of the constraint matrix.
+            warm_start (bool): Start each solve from the last optimal basis of the sample, or from scratch.
+        """
+        import highspy
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = cost.size
+        lp.num_row_ = row_lower.size
+        lp.col_cost_ = cost
+        lp.col_lower_ = col_lower
+        lp.col_upper_ = col_upper
+        lp.row_lower_ = row_lower
+        lp.row_upper_ = row_upper
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength = row_lower.size)))).astype(np.int32)
+        lp.a_matrix_.index_ = cols.astype(np.int32)
+        lp.a_matrix_.value_ = values
+
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue("output_flag", False)
+        self.highs.passModel(lp)
+        self.inf = highspy.kHighsInf
+        self.optimal = highspy.HighsModelStatus.kOptimal
+        self.warm_start = warm_start
+        self.bases = {} # last optimal basis of the samples that are not being solved
+        self.sample = None # sample whose basis HiGHS holds
+        self.solved = False # whether the last solve was optimal
+        self.iterations = 0
+        self.solves = 0
+
+    def reset(self):
+        """Drops the stored bases and the iteration counts; the next solve starts from scratch."""
+        self.highs.clearSolver()
+        self.bases = {}
+        self.sample = None
+        self.solved = False
+        self.iterations = 0
+        self.solves = 0
+
+    def mean_iterations(self):
+        """Returns the average number of simplex iterations per solve since the last reset."""
+        return(self.iterations/max(self.solves, 1))
+
+    def select_basis(self, sample):
+        """
+        Loads the basis the next solve starts from. Called before the bounds of the solve are changed.
+
+        Parameters:
+            sample (int): Sample of the next solve.
+        """
+        if not self.warm_start:
+            self.highs.clearSolver()
+        elif sample != self.sample:
+            if self.sample is not None and self.solved:
+                self.bases[self.sample] = self.highs.getBasis()
+            basis = self.bases.pop(sample, None)
+            if basis is None:
+                self.highs.clearSolver()
+            else:
+                self.highs.setBasis(basis)
+            self.sample = sample
+
+    def run(self):
+        """
+        Solves the LP.
+
+        Returns:
+            array: Column values.
+        """
+        self.highs.run()
+        x = np.asarray(self.highs.getSolution().col_value)
+        self.iterations += self.highs.getInfo().simplex_iteration_count
+        self.solves += 1
+        self.solved = self.highs.getModelStatus() == self.optimal
+        if not self.solved:
+            logger.warning(f"HiGHS dispatch: {self.highs.modelStatusToString(self.highs.getModelStatus())}")
+            self.highs.clearSolver()
+        return(x)
+
+class HighsDispatch(_HighsBackend):
+    '''
+    Single-period economic dispatch solved with HiGHS through highspy, without Pyomo.
+
+    The LP of RAUtilities.OptDispatch is assembled once from A_inc, gen_mat, curt_mat and ch_mat as a row-wise (CSR)
+    matrix and passed to an in-process HiGHS instance. Every hour only the column bounds (generation, flow, ESS
+    charge and SOC limits) and the row bounds (net load, previous SOC) are changed before the LP is re-solved from
+    the last optimal basis of the sample.
+
+    Columns: flow (nl), Pg (ng + ness), Pc (ness), SOC (ness), curt (nz), renewable_curt (nz).
+    Rows: power balance (nz rows, or one row for the copper sheet model), SOC update (ness), charge/discharge (ness).
+    '''
+    def __init__(self, ng, nz, nl, ness, BMva, A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, \
+                 disch_cost, ch_cost, copper_sheet, warm_start=True):
+        """
+        Assembles the dispatch LP and loads it into HiGHS.
+
+        Parameters:
+            warm_start (bool): Start each solve from the last optimal basis of the sample, or from scratch.
+            Other parameters: See PersistentDispatch (there is no solver choice).
+        """
+        self.ng = ng
+        self.nz = nz
+        self.nl = nl
+        self.ness = ness
+        self.BMva = BMva
+        self.copper_sheet = copper_sheet
+        self.dispatch_solver = 'highspy'
+
+        A, offsets = _hourly_matrix(ng, nz, nl, ness, A_inc, gen_mat, curt_mat, ch_mat, ess_eff, copper_sheet, False)
+        self.c_flow, self.c_Pg, self.c_Pc, self.c_SOC, self.c_curt, self.c_rcurt = offsets
+        self.n_bal = 1 if copper_sheet else nz
+        nrow, ncol = A.shape
+
+        LOL_cost = 10000000 # cost of lost load (set to very high so that system always tries to minimize loss)
+        cost = np.zeros(ncol)
+        cost[self.c_Pg:self.c_Pg + ng] = gencost
+        cost[self.c_Pg + ng:self.c_Pc] = disch_cost
+        cost[self.c_Pc:self.c_SOC] = ch_cost
+        cost[self.c_curt:self.c_rcurt] = LOL_cost
+
+        # the bounds of flow, Pg, Pc and SOC are set before each solve; flows are fixed at 0 in the copper sheet model
+        col_lower = np.zeros(ncol)
+        col_upper = np.full(ncol, np.inf)
+        col_upper[:self.c_curt] = 0.0
+
+        # the right-hand sides of the balance and soc rows are set before each solve
+        row_lower = np.zeros(nrow)
+        row_upper = np.zeros(nrow)
+        row_lower[self.n_bal + ness:] = -np.inf
+        row_upper[self.n_bal + ness:] = np.asarray(ess_pmax, dtype=float)/BMva
+        if copper_sheet:
+            row_upper[0] = np.inf
+
+        rows, cols = np.nonzero(A)
+        self.load_lp(cost, col_lower, col_upper, row_lower, row_upper, rows, cols, A[rows, cols], warm_start)
+
+        # columns and rows whose bounds change every hour
+        first_col = self.c_Pg if copper_sheet else self.c_flow
+        self.var_cols = np.arange(first_col, self.c_curt, dtype=np.int32)
+        self.var_rows = np.arange(self.n_bal + ness, dtype=np.int32)
+        logger.info(f"HiGHS dispatch model built; {nrow} rows, {ncol} columns, {rows.size} nonzeros")
+
+    def solve(self, fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old, sample=None):
+        """
+        Updates the hour-dependent bounds and re-solves the dispatch LP.
+
+        Parameters:
+            sample (int): Sample of the hour; only needed when the samples are interleaved (batched sampling).
+            Other parameters: See PersistentDispatch.solve.
+
+        Returns:
+            tuple: Load curtailment, updated state of charge, flow statistics
+        """
+        ng, ness, nl = self.ng, self.ness, self.nl
+        self.select_basis(sample)
+
+        bounds = [fb_Pg(None, i) for i in range(ng + ness)] + [fb_ess(None, i) for i in range(ness)] + \
+                 [fb_soc(None, i) for i in range(ness)]
+        if self.copper_sheet == False:
+            bounds = [fb_flow(None, i) for i in range(nl)] + bounds
+        bounds = np.array(bounds, dtype=float).reshape(-1, 2)
+        self.highs.changeColsBounds(self.var_cols.size, self.var_cols, bounds[:, 0], bounds[:, 1])
+
+        rhs = np.empty(self.var_rows.size)
+        if self.copper_sheet == False:
+            rhs[0:self.nz] = np.asarray(net_load, dtype=float)/self.BMva
+        else:
+            rhs[0] = np.sum(net_load)/self.BMva
+        rhs[self.n_bal:] = SOC_old
+        row_upper = rhs.copy()
+        if self.copper_sheet:
+            row_upper[0] = np.inf
+        self.highs.changeRowsBounds(self.var_rows.size, self.var_rows, rhs, row_upper)
+
+        x = self.run()
+        curt = x[self.c_curt:self.c_rcurt]
+        load_curt = curt.sum()
+        if load_curt > 0:
+            Pg = x[self.c_Pg:self.c_Pg + ng]
+            flow = x[self.c_flow:self.c_Pg]
+            curtbus = curt
+        else:
+            Pg = 0
+            flow = 0
+            curtbus = 0
+
+        SOC_old = x[self.c_SOC:self.c_curt]
+        P_dis = x[self.c_Pg + ng:self.c_Pc]
+        P_ch = x[self.c_Pc:self.c_SOC]
+        return(load_curt, SOC_old, P_dis, P_ch, Pg, flow, curtbus)
+
+class HighsDispatchMP(_HighsBackend):
+    '''
+    Multi-period economic dispatch of a window of time_periods hours solved with HiGHS through highspy.
+
+    The LP of RAUtilities.OptDispatchMP is assembled once: every hour of the window is a copy of the hourly
+    constraint matrix, and the SOC update rows of consecutive hours are coupled. Every window the column bounds,
+    the net load and initial SOC right-hand sides, and the SOC rescaling coefficients (which follow the available
+    ESS power from hour to hour) are changed before the LP is re-solved from the last optimal basis of the sample.
+    Variables and rows are ordered by variable (or constraint) first and hour second.
+    '''
+    def __init__(self, ng, nz, nl, ness, BMva, A_inc, gen_mat, curt_mat, ch_mat, gencost, ess_pmax, ess_eff, \
+                 disch_cost, ch_cost, copper_sheet, time_periods, warm_start=True):
+        """
+        Assembles the multi-period dispatch LP and loads it into HiGHS.
+
+        Parameters:
+            time_periods (int): Length of the window (hours).
+            warm_start (bool): Start each solve from the last optimal basis of the sample, or from scratch.
+            Other parameters: See PersistentDispatch (there is no solver choice).
+        """
+        self.ng = ng
+        self.nz = nz
+        self.nl = nl
+        self.ness = ness
+        self.BMva = BMva
+        self.T = T = time_periods
+        self.copper_sheet = copper_sheet
+        self.dispatch_solver = 'highspy'
+
+        A, offsets = _hourly_matrix(ng, nz, nl, ness, A_inc, gen_mat, curt_mat, ch_mat, ess_eff, copper_sheet, True)
+        self.c_flow, self.c_Pg, self.c_Pc, self.c_SOC, self.c_curt, self.c_rcurt = offsets*T
+        self.n_bal = (1 if copper_sheet else nz)*T
+        nrow, ncol = A.shape[0]*T, A.shape[1]*T
+
+        # one copy of the hourly matrix per hour, and SOC[i, t - 1] in the SOC update row of hour t
+        r, c = np.nonzero(A)
+        hours = np.arange(T)
+        rows = (r[:, None]*T + hours).ravel()
+        cols = (c[:, None]*T + hours).ravel()
+        values = np.repeat(A[r, c], T)
+        ess_t = (np.arange(ness)[:, None]*T + hours[1:]).ravel()
+        self.soc_rows = (self.n_bal + ess_t).astype(np.int32)
+        self.soc_cols = (self.c_SOC + ess_t - 1).astype(np.int32)
+        self.soc_coefs = -np.ones(self.soc_rows.size)
+        rows = np.concatenate((rows, self.soc_rows))
+        cols = np.concatenate((cols, self.soc_cols))
+        values = np.concatenate((values, self.soc_coefs))
+        order = np.lexsort((cols, rows))
+
+        LOL_cost = 100000000 # cost of lost load (set to very high so that system always tries to minimize loss)
+        cost = np.zeros(ncol)
+        cost[self.c_Pg:self.c_Pg + ng*T] = np.repeat(np.asarray(gencost, dtype=float)*BMva, T)
+        cost[self.c_Pg + ng*T:self.c_Pc] = np.repeat(np.asarray(disch_cost, dtype=float)*BMva, T)
+        cost[self.c_Pc:self.c_SOC] = -np.repeat(np.asarray(ch_cost, dtype=float)*BMva, T)
+        cost[self.c_curt:self.c_rcurt] = LOL_cost
+
+        # all bounds except those of the load curtailment are set before each solve
+        col_lower = np.zeros(ncol)
+        col_upper = np.zeros(ncol)
+        col_upper[self.c_curt:self.c_rcurt] = np.inf
+
+        row_lower = np.zeros(nrow)
+        row_upper = np.zeros(nrow)
+        row_lower[self.n_bal + ness*T:] = -np.inf
+        row_upper[self.n_bal + ness*T:] = np.repeat(np.asarray(ess_pmax, dtype=float)/BMva, T)
+
+        self.load_lp(cost, col_lower, col_upper, row_lower, row_upper, rows[order], cols[order], values[order], warm_start)
+
+        # columns and rows whose bounds change every window
+        first_col = self.c_Pg if copper_sheet else self.c_flow
+        self.var_cols = np.concatenate((np.arange(first_col, self.c_curt), np.arange(self.c_rcurt, ncol))).astype(np.int32)
+        self.var_rows = np.arange(self.n_bal + ness*T, dtype=np.int32)
+        logger.info(f"HiGHS multi-period dispatch model built; {nrow} rows, {ncol} columns, {order.size} nonzeros")
+
+    def solve(self, fb_ess, fb_soc, fb_ren, fb_Pg, fb_flow, net_load, SOC_old, ESS_initial_capacities, sample=None):
+        """
+        Updates the window-dependent data and re-solves the multi-period dispatch LP.
+
+        Parameters:
+            fb_ren (function): Function for bounds of renewable curtailment variables.
+            ESS_initial_capacities (array): Maximum available power capacities at the start of optimizaiton.
+            sample (int): Sample of the window; only needed when the samples are interleaved.
+            Other parameters: See RAUtilities.OptDispatchMP.
+
+        Returns:
+            tuple: Load curtailment, updated state of charge, flow statistics.
+        """
+        ng, nz, nl, ness, T, BMva = self.ng, self.nz, self.nl, self.ness, self.T, self.BMva
+        self.select_basis(sample)
+
+        def window_bounds(fb, n):
+            return([fb(None, i, t) for i in range(n) for t in range(T)])
+
+        ess_bounds = np.array(window_bounds(fb_ess, ness), dtype=float).reshape(ness, T, 2)
+        bounds = window_bounds(fb_Pg, ng + ness) + ess_bounds.reshape(-1, 2).tolist() + window_bounds(fb_soc, ness) + \
+                 window_bounds(fb_ren, nz)
+        if self.copper_sheet == False:
+            bounds = window_bounds(fb_flow, nl) + bounds
+        bounds = np.array(bounds, dtype=float).reshape(-1, 2)
+        self.highs.changeColsBounds(self.var_cols.size, self.var_cols, bounds[:, 0], bounds[:, 1])
+
+        # SOC rescaling with the available ESS power, as in the SOC update constraint of OptDispatchMP
+        current_pmax = -ess_bounds[:, :, 0]
+        last_pmax = np.column_stack((np.asarray(ESS_initial_capacities, dtype=float)/BMva, current_pmax[:, :-1])) + 1e-5
+        scale = current_pmax/last_pmax
+        soc_coefs = -scale[:, 1:].ravel()
+        for k in np.nonzero(soc_coefs != self.soc_coefs)[0]:
+            self.highs.changeCoeff(int(self.soc_rows[k]), int(self.soc_cols[k]), float(soc_coefs[k]))
+        self.soc_coefs = soc_coefs
+
+        rhs = np.zeros(self.var_rows.size)
+        if self.copper_sheet == False:
+            rhs[0:self.n_bal] = np.asarray(net_load, dtype=float).ravel()/BMva
+        else:
+            rhs[0:self.n_bal] = np.sum(net_load, axis=0)/BMva
+        rhs[self.n_bal + np.arange(ness)*T] = np.asarray(SOC_old, dtype=float)*scale[:, 0]
+        self.highs.changeRowsBounds(self.var_rows.size, self.var_rows, rhs, rhs)
+
+        x = self.run()
+        load_curt = x[self.c_curt:self.c_rcurt].reshape(nz, T).sum(axis=0)
+        soc_profile = x[self.c_SOC:self.c_curt].reshape(ness, T)
+        p_discharge = x[self.c_Pg + ng*T:self.c_Pc].reshape(ness, T)
+        p_charge = x[self.c_Pc:self.c_SOC].reshape(ness, T)
+        if np.any(load_curt):
+            p_g = x[self.c_Pg:self.c_Pg + ng*T].reshape(ng, T)
+            flow = x[self.c_flow:self.c_Pg].reshape(nl, T)
+            curtbus = x[self.c_curt:self.c_rcurt].reshape(nz, T)
+        else:
+            p_g = np.zeros((ng, T))
+            flow = np.zeros((nl, T))
+            curtbus = np.zeros((nz, T))
+
+        return load_curt, soc_profile, p_discharge, p_charge, p_g, flow, curtbus
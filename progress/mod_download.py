@@ -0,0 +1,226 @@
+# import python modules
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ERA5_DATASET = "reanalysis-era5-single-levels-timeseries"
+
+# short names of the ERA5 variables in the downloaded CSV files
+ERA5_SHORT_NAMES = {
+    "100m_u_component_of_wind": "u100",
+    "100m_v_component_of_wind": "v100",
+    "10m_u_component_of_wind": "u10",
+    "10m_v_component_of_wind": "v10",
+    "2m_temperature": "t2m",
+    "surface_solar_radiation_downwards": "ssrd",
+}
+
+class CDSClient:
+    '''
+    Client of the Copernicus Climate Data Store (cdsapi). A cdsapi.Client is created for every request, so that
+    requests can be submitted from several threads.
+    '''
+    def __init__(self, timeout=60, retry_max=2, sleep_max=10):
+        self.kwargs = {"timeout": timeout, "retry_max": retry_max, "sleep_max": sleep_max}
+
+    def retrieve(self, dataset, request, target):
+        """
+        Submits a request, waits for it in the CDS queue and downloads the result.
+
+        Parameters:
+            dataset (str): Name of the dataset.
+            request (dict): Request (variables, dates, location, format).
+            target (str): Path of the downloaded ZIP file.
+        """
+        import cdsapi
+        cdsapi.Client(**self.kwargs).retrieve(dataset, request).download(target=str(target))
+
+class LocalClient:
+    '''
+    Local stand-in for the CDS, used to test downloads without network access. It answers a request with a ZIP
+    file holding an ERA5-like CSV (valid_time plus the short names of the requested variables) of hourly synthetic
+    data over the requested dates, seeded by the location, after an optional delay that mimics the CDS queue.
+    '''
+    def __init__(self, delay=0.0, fail_sites=()):
+        """
+        Initializes the client.
+
+        Parameters:
+            delay (float): Seconds every request waits before it is answered.
+            fail_sites (iterable): (latitude, longitude) of the requests that fail, to test resuming.
+        """
+        self.delay = delay
+        self.fail_sites = set(fail_sites)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def retrieve(self, dataset, request, target):
+        """Writes the synthetic ZIP file of a request to target (see CDSClient.retrieve)."""
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.delay)
+        lat, lon = request["location"]["latitude"], request["location"]["longitude"]
+        if (lat, lon) in self.fail_sites:
+            raise RuntimeError(f"request for ({lat}, {lon}) failed")
+
+        start, end = request["date"][0].split("/")
+        times = pd.date_range(start, pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+        rng = np.random.default_rng([int(abs(lat)*1e4), int(abs(lon)*1e4)])
+        df = pd.DataFrame({"valid_time": times.strftime("%Y-%m-%d %H:%M:%S")})
+        for var in request["variable"]:
+            df[ERA5_SHORT_NAMES.get(var, var)] = rng.normal(0, 5, times.size).round(4)
+        df["latitude"], df["longitude"] = lat, lon
+        with zipfile.ZipFile(target, "w") as z:
+            z.writestr(f"reanalysis-era5-single-levels-timeseries-{lat}_{lon}.csv", df.to_csv(index=False))
+
+class DownloadManager:
+    '''
+    Downloads ERA5 time series of several sites concurrently. The requests are submitted by a bounded pool of
+    threads, since each one mostly waits in the CDS queue. The state of every site (queued, downloaded, extracted)
+    is saved in download_state.json in the download directory, so that an interrupted run resumes: extracted sites
+    are skipped, and downloaded ZIP files are only extracted. Queued sites (requests that were interrupted or failed)
+    are submitted to the CDS again; a request that was waiting in the CDS queue is not resumed. Sites whose CSV file
+    already covers the requested years are skipped as well. The result of a site is saved as <site name>.csv.
+    '''
+    def __init__(self, directory, variables, start_year, end_year, client=None, workers=4, dataset=ERA5_DATASET):
+        """
+        Initializes the download manager.
+
+        Parameters:
+            directory (str): Directory of the downloaded CSV files and of the state file.
+            variables (list): ERA5 variables to download.
+            start_year (int): First year to download.
+            end_year (int): Last year to download.
+            client: Client with a retrieve(dataset, request, target) method; CDSClient if None.
+            workers (int): Maximum number of concurrent requests.
+            dataset (str): Name of the dataset.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.variables = list(variables)
+        self.start_year = int(start_year)
+        self.end_year = int(end_year)
+        self.client = CDSClient() if client is None else client
+        self.workers = max(int(workers), 1)
+        self.dataset = dataset
+        self.state_file = self.directory / "download_state.json"
+        self._lock = threading.Lock()
+        self.state = {}
+        if self.state_file.exists():
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+
+    def _set_state(self, name, status):
+        """Saves the status of a site; the state file is replaced atomically."""
+        with self._lock:
+            self.state[name] = {"status": status, "years": [self.start_year, self.end_year], "variables": self.variables}
+            tmp = self.directory / "download_state.json.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.state, f, indent=1)
+            os.replace(tmp, self.state_file)
+
+    def covers(self, csv_path):
+        """
+        Checks whether a downloaded CSV file covers the requested years.
+
+        Parameters:
+            csv_path (Path): Path of the CSV file of a site.
+
+        Returns:
+            bool: True if the file holds the requested variables from the first to the last requested day.
+        """
+        if not csv_path.exists():
+            return(False)
+        try:
+            header = pd.read_csv(csv_path, nrows=0).columns
+            if any(ERA5_SHORT_NAMES.get(v, v) not in header for v in self.variables):
+                return(False)
+            times = pd.to_datetime(pd.read_csv(csv_path, usecols=["valid_time"])["valid_time"])
+        except (ValueError, KeyError, pd.errors.ParserError):
+            return(False)
+        return(times.min() <= pd.Timestamp(self.start_year, 1, 1) and times.max() >= pd.Timestamp(self.end_year, 12, 31))
+
+    def _extract(self, name, zip_path):
+        """Extracts the CSV file of a site from its ZIP file and deletes the ZIP file."""
+        final_csv_path = self.directory / f"{name}.csv"
+        with zipfile.ZipFile(zip_path, 'r') as z:
+            csv_files = [f for f in z.namelist() if f.endswith(".csv")]
+            if not csv_files:
+                raise RuntimeError(f"No CSV found in ZIP for {name}")
+            extracted_path = Path(z.extract(csv_files[0], self.directory / f".{name}"))
+        os.replace(extracted_path, final_csv_path) # rename csv file for convenience
+        shutil.rmtree(self.directory / f".{name}", ignore_errors=True)
+        zip_path.unlink()
+        self._set_state(name, "extracted")
+
+    def _download(self, name, lat, lon):
+        """Requests, downloads and extracts the data of a site."""
+        request = {"variable": self.variables, "date": [f"{self.start_year}-01-01/{self.end_year}-12-31"], "data_format": "csv", \
+                   "location": {"longitude": lon, "latitude": lat}}
+        zip_path = self.directory / f"{name}.zip"
+        logger.info(f"Downloading {name} (lat={lat}, lon={lon})...")
+        part_path = self.directory / f"{name}.zip.part"
+        self.client.retrieve(self.dataset, request, part_path)
+        os.replace(part_path, zip_path)
+        self._set_state(name, "downloaded")
+        self._extract(name, zip_path)
+
+    def run(self, sites_df, progress_callback=None):
+        """
+        Downloads the data of all sites that are not available yet.
+
+        Parameters:
+            sites_df (DataFrame): Sites with the columns Site Name, Latitude and Longitude.
+            progress_callback (callable): Called once for every site that is done (downloaded or skipped).
+
+        Returns:
+            list: Names of the sites downloaded in this run.
+        """
+        pending, downloaded = [], []
+        for _, row in sites_df.iterrows():
+            name = row["Site Name"]
+            zip_path = self.directory / f"{name}.zip"
+            same_request = self.state.get(name, {}).get("years") == [self.start_year, self.end_year] and \
+                           self.state.get(name, {}).get("variables") == self.variables
+            if self.covers(self.directory / f"{name}.csv"):
+                logger.info(f"{name}: data of {self.start_year}-{self.end_year} already downloaded")
+                if self.state.get(name, {}).get("status") != "extracted":
+                    self._set_state(name, "extracted")
+                if progress_callback:
+                    progress_callback()
+            elif same_request and self.state[name]["status"] == "downloaded" and zip_path.exists():
+                logger.info(f"{name}: extracting the data downloaded by a previous run")
+                self._extract(name, zip_path)
+                if progress_callback:
+                    progress_callback()
+            else:
+                self._set_state(name, "queued")
+                pending.append((name, float(row["Latitude"]), float(row["Longitude"])))
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._download, *site): site[0] for site in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    downloaded.append(name)
+                except Exception as exc:
+                    logger.error(f"{name}: download failed ({exc}); it is resumed by the next run")
+                    failed.append(name)
+                if progress_callback:
+                    progress_callback()
+
+        if failed:
+            raise RuntimeError(f"Download failed for {len(failed)} site(s): {', '.join(failed)}")
+        return(downloaded)
@@ -0,0 +1,105 @@
+# import python modules
+import logging
+import numpy as np
+
+from progress.mod_timeline import StateTimeline
+
+logger = logging.getLogger(__name__)
+
+def risk_hours(load, share, lead=0):
+    '''
+    Flags the hours in which outages can lead to loss of load: the share of hours with the highest load, extended
+    backwards by lead hours so that outages starting shortly before a peak are also biased.
+
+    Parameters:
+        load (array): Hourly system load (sim_hours,).
+        share (float): Share of the hours with the highest load that are flagged (0-1]; 1 flags all hours.
+        lead (int): Hours before each flagged hour that are flagged as well, e.g. the mean repair time.
+
+    Returns:
+        numpy.ndarray: Boolean flags of the risk hours (sim_hours,).
+    '''
+    load = np.asarray(load, dtype = float)
+    if share >= 1:
+        return(np.ones(load.size, dtype = bool))
+    flags = load >= np.quantile(load, 1 - share)
+    flagged = np.flatnonzero(flags)
+    for l in range(1, int(lead) + 1):
+        flags[np.clip(flagged - l, 0, None)] = True
+    return(flags)
+
+def capacity_margin(timeline, pmax, load):
+    '''
+    Returns the hourly margin of the available generating capacity over a load profile in the timeline of one
+    sample (copper-sheet proxy without renewables, storage and network limits).
+
+    Parameters:
+        timeline (StateTimeline): Timeline with the events of the sample generated.
+        pmax (array): Generator capacities (ng,).
+        load (array): Hourly system load (sim_hours,).
+
+    Returns:
+        numpy.ndarray: Available capacity minus load (sim_hours,); negative means loss of load.
+    '''
+    ev = timeline.events[timeline.events["component"] < pmax.size]
+    delta = np.zeros(load.size + 1)
+    # events of a generator alternate between down (0) and up (1)
+    np.add.at(delta, ev["hour"], np.where(ev["state"] > 0, 1, -1)*pmax[ev["component"]])
+    return(pmax.sum() + np.cumsum(delta)[0:load.size] - load)
+
+def cross_entropy_factors(ng, nl, ness, lambda_tot, mu_tot, ess_units, pmax, load, bias_hours, rng, pilot_samples=200, \
+                          rho=0.1, iterations=5, smoothing=0.7, max_factor=20.0):
+    '''
+    Optimizes the failure rate multipliers of the generators for importance sampling with the cross-entropy method.
+    Pilot timelines are scored with the capacity_margin proxy. The multipliers are tied over generators of the same
+    capacity and failure rate, and each one is set to the weighted failure count of its generators over their
+    failure exposure in the risk hours, with the per-sample weights likelihood ratio * LOLP of the proxy. While
+    fewer than rho*pilot_samples samples have loss of load, the samples with the largest capacity shortfall are
+    used instead (multilevel cross-entropy). Lines are not biased, since the proxy has no network.
+
+    Parameters:
+        ng (int): Number of generators.
+        nl (int): Number of lines.
+        ness (int): Number of energy storage systems.
+        lambda_tot (array): Failure rates.
+        mu_tot (array): Repair rates.
+        ess_units (array): Units of energy storage systems.
+        pmax (array): Generator capacities (ng,).
+        load (array): Hourly system load (sim_hours,).
+        bias_hours (array): Boolean flags of the biased hours.
+        rng (numpy.random.Generator): Random number generator of the pilot samples.
+        pilot_samples (int): Pilot samples per iteration.
+        rho (float): Share of the pilot samples used in a multilevel iteration.
+        iterations (int): Number of iterations.
+        smoothing (float): Weight of the new multipliers against the previous ones in each iteration.
+        max_factor (float): Upper bound of the multipliers.
+
+    Returns:
+        numpy.ndarray: Failure rate multipliers of generators and lines (ng + nl,).
+    '''
+    pmax = np.asarray(pmax, dtype = float)
+    groups = np.unique(np.column_stack((pmax, lambda_tot[0:ng])), axis = 0, return_inverse = True)[1].ravel()
+    factors = np.ones(ng + nl)
+    n_elite = max(int(np.ceil(rho*pilot_samples)), 2)
+    for it in range(iterations):
+        timeline = StateTimeline(ng, nl, ness, lambda_tot, mu_tot, ess_units, rng = rng, bias_factor = factors, bias_hours = bias_hours)
+        lolp, shortfall, weights = np.zeros(pilot_samples), np.zeros(pilot_samples), np.zeros(pilot_samples)
+        failures, exposure = np.zeros((pilot_samples, ng)), np.zeros((pilot_samples, ng))
+        for i in range(pilot_samples):
+            timeline.generate(load.size)
+            margin = capacity_margin(timeline, pmax, load)
+            lolp[i], shortfall[i] = np.mean(margin < 0), -margin.min()
+            weights[i] = timeline.weight
+            failures[i], exposure[i] = timeline.biased_failures[0:ng], timeline.biased_exposure[0:ng]
+
+        if np.count_nonzero(lolp) >= n_elite:
+            v = weights*lolp
+        else:
+            v = weights*(shortfall >= np.sort(shortfall)[-n_elite])
+        num = np.bincount(groups, v @ failures)
+        den = np.bincount(groups, v @ exposure)
+        update = np.divide(num, den, out = np.ones(num.size), where = den > 0)[groups]
+        factors[0:ng] = np.clip(smoothing*update + (1 - smoothing)*factors[0:ng], 1.0, max_factor)
+        logger.info(f"Cross-entropy iteration {it+1}: {np.count_nonzero(lolp)}/{pilot_samples} pilot samples with loss of load, " \
+                    f"multipliers {factors[0:ng].min():.2f}-{factors[0:ng].max():.2f}")
+    return(factors)
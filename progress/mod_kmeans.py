@@ -66,6 +66,8 @@ from sklearn.preprocessing import StandardScaler, MinMaxScaler
 
 from kneed import KneeLocator
 
+from progress.mod_storage import table_path, read_table
+
 class KMeans_Pipeline:
     """
     A pipeline class for running KMeans clustering on solar generation data.
@@ -101,9 +103,10 @@ class KMeans_Pipeline:
             **kwargs (dict): Optional arguments that the function takes.
         """
         self.directory = directory
-        self.sgen_file_path = f'{self.directory}/gen_all_sites.csv'
+        # combined generation in the format written last by Solar.combine_site_generation (CSV, Parquet or Feather)
+        self.sgen_file_path = table_path(f'{self.directory}/gen_all_sites') or f'{self.directory}/gen_all_sites.csv'
 
-        self.solar_gen_df = pd.read_csv(self.sgen_file_path)
+        self.solar_gen_df = read_table(self.sgen_file_path)
         self.site_info_df = pd.read_csv(site_data)
 
         # Select sites based on optional argument or use all sites
@@ -0,0 +1,209 @@
+# import python modules
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class MaxFlowCurtailment:
+    '''
+    Load curtailment of the single-period transportation model (Zonal/Nodal) as a maximum flow, without a solver.
+
+    Since the cost of lost load dominates all other costs of OptDispatch, the curtailment of an hour is the positive
+    net load that cannot be delivered from the available generation through the line ratings. This is a maximum
+    flow from a source node to a sink node through the zones:
+        source -> zone: available generation of the zone plus any negative net load (surplus renewables),
+        zone <-> zone: one arc pair per line, with the line rating in both directions,
+        zone -> sink: positive net load of the zone.
+
+    The residual graph is built once. Every hour only the capacities of the generators and lines that changed since
+    the previous call (i.e. the NextState events) are written to it, together with the net load. The flow is then
+    augmented along shortest paths of the residual graph (Dinic). The max flow only covers the hours in which the
+    LP keeps the ESS idle: if an ESS could charge without a net cost, could discharge in place of a
+    more expensive generator, or could discharge to serve load that the generation leaves unserved, the hour is
+    left to the LP. The curtailment and the SOC of the hours solved here are then those of the LP, and the split
+    of the curtailment among zones and the line flows are one of the optimal ones.
+    '''
+    def __init__(self, ng, nz, nl, ness, BMva, A_inc, gen_mat, gencost, ess_pmax, ess_eff, disch_cost, ch_cost):
+        """
+        Builds the residual graph.
+
+        Parameters:
+            ng (int): Number of generators.
+            nz (int): Number of zones.
+            nl (int): Number of lines.
+            ness (int): Number of energy storage systems.
+            BMva (float): Base power in MVA.
+            A_inc (array): Incidence matrix.
+            gen_mat (array): Generation matrix.
+            gencost (array): Generation costs.
+            ess_pmax (array): Maximum power outputs of energy storage systems.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+        """
+        self.ng, self.nz, self.nl, self.ness, self.BMva = ng, nz, nl, ness, BMva
+        self.ess_pmax = np.asarray(ess_pmax, dtype = float)/BMva
+        self.ess_eff = np.asarray(ess_eff, dtype = float)
+        self.gen_zone = np.argmax(gen_mat[:, 0:ng], axis = 0)
+        # ESS that the LP may charge whenever it can (a charge cost of zero leaves the SOC to the solver), or discharge
+        # in place of generation (or for a negative cost)
+        self.ch_incentive = np.asarray(ch_cost, dtype = float) >= 0
+        self.dis_replaces_gen = np.asarray(disch_cost, dtype = float) < np.max(gencost, initial = 0)
+        # generators of every zone in merit order, to split the supply of a zone among them
+        self.zone_gens = [[g for g in np.argsort(gencost, kind = 'stable') if self.gen_zone[g] == z] for z in range(nz)]
+
+        # nodes: zones 0..nz-1, source nz, sink nz+1; arc a and its reverse a^1 are stored next to each other
+        self.source, self.sink = nz, nz + 1
+        self.head, self.base, self.adj = [], [], [[] for _ in range(nz + 2)]
+        self.supply_arcs = [self._add_arc(self.source, z) for z in range(nz)]
+        # positive flow on a line enters the zone with +1 in the incidence matrix (see OptDispatch)
+        to_zone, from_zone = np.argmax(A_inc == 1, axis = 1), np.argmax(A_inc == -1, axis = 1)
+        self.line_arcs = [self._add_arc(from_zone[j], to_zone[j]) for j in range(nl)]
+        self.load_arcs = [self._add_arc(z, self.sink) for z in range(nz)]
+
+        self.zone_gen = np.zeros(nz)
+        self.last_cap = None
+
+    def _add_arc(self, u, v):
+        """Adds arc u->v and its reverse, both with zero capacity; returns the index of the arc."""
+        a = len(self.head)
+        self.head += [v, u]
+        self.base += [0.0, 0.0]
+        self.adj[u].append(a)
+        self.adj[v].append(a + 1)
+        return(a)
+
+    def _update_network(self, cap_max):
+        """Writes the capacities of the generators and lines that changed since the previous call."""
+        ng, nl, BMva = self.ng, self.nl, self.BMva
+        if self.last_cap is None:
+            changed = np.arange(ng + nl)
+        else:
+            changed = np.flatnonzero(cap_max[0:ng + nl] != self.last_cap[0:ng + nl])
+        gens, lines = changed[changed < ng], changed[changed >= ng] - ng
+        if gens.size:
+            self.zone_gen = np.bincount(self.gen_zone, weights = cap_max[0:ng]/BMva, minlength = self.nz)
+        for j in lines:
+            a = self.line_arcs[j]
+            self.base[a] = self.base[a + 1] = cap_max[ng + j]/BMva
+        self.last_cap = cap_max.copy()
+
+    def _augment(self):
+        """Augments the flow in self.res to a maximum flow (Dinic); returns the flow added."""
+        head, res, adj, source, sink = self.head, self.res, self.adj, self.source, self.sink
+        tol = 1e-12
+        total = 0.0
+        while True:
+            # levels of the nodes in the residual graph
+            level = [-1]*(self.nz + 2)
+            level[source] = 0
+            queue = [source]
+            for u in queue:
+                for a in adj[u]:
+                    if res[a] > tol and level[head[a]] < 0:
+                        level[head[a]] = level[u] + 1
+                        queue.append(head[a])
+            if level[sink] < 0:
+                return(total)
+
+            # blocking flow along the shortest paths
+            ptr = [0]*(self.nz + 2)
+            path, u = [], source
+            while True:
+                if u == sink:
+                    push = min(res[a] for a in path)
+                    for a in path:
+                        res[a] -= push
+                        res[a ^ 1] += push
+                    total += push
+                    path, u = [], source
+                    continue
+                arcs, i, next_level = adj[u], ptr[u], level[u] + 1
+                n_arcs = len(arcs)
+                while i < n_arcs:
+                    a = arcs[i]
+                    if res[a] > tol and level[head[a]] == next_level:
+                        break
+                    i += 1
+                ptr[u] = i
+                if i < n_arcs:
+                    path.append(a)
+                    u = head[a]
+                elif u == source:
+                    break
+                else:
+                    # dead end: remove the node from the level graph and step back
+                    level[u] = -1
+                    u = head[path.pop() ^ 1]
+                    ptr[u] += 1
+
+    def _flow(self, arcs):
+        """Flow on arcs (forward direction)."""
+        return(np.array([self.res[a ^ 1] - self.base[a ^ 1] for a in arcs]))
+
+    def solve(self, current_cap, net_load, SOC_old, ess_smax, ess_smin):
+        """
+        Dispatches one hour.
+
+        Parameters:
+            current_cap (dict): Current capacities of components.
+            net_load (array): Net load.
+            SOC_old (array): Previous state of charge.
+            ess_smax (array): Maximum allowable SOC (as energy).
+            ess_smin (array): Minimum allowable SOC (as energy).
+
+        Returns:
+            tuple: Same outputs as OptDispatch, or None if the LP has to be solved (the SOC is outside its limits or an ESS would be dispatched).
+        """
+        tol = 1e-9
+        ng, nl, BMva = self.ng, self.nl, self.BMva
+        smax, smin = ess_smax/BMva, ess_smin/BMva
+        if np.any(SOC_old < smin - tol) or np.any(SOC_old > smax + tol):
+            return(None)
+
+        cap_max = current_cap["max"]
+        ess_p = np.minimum(cap_max[ng + nl::]/BMva, self.ess_pmax)
+        dis_avail = np.minimum(ess_p, SOC_old - smin) > tol
+        ch_avail = np.minimum(ess_p, (smax - SOC_old)/self.ess_eff) > tol
+        if np.any(ch_avail & self.ch_incentive) or np.any(dis_avail & self.dis_replaces_gen):
+            return(None)
+
+        self._update_network(cap_max)
+        load = net_load/BMva
+        demand = np.clip(load, 0, None)
+        surplus = np.clip(-load, 0, None)
+        for z in range(self.nz):
+            self.base[self.supply_arcs[z]] = self.zone_gen[z] + surplus[z]
+            self.base[self.load_arcs[z]] = demand[z]
+
+        self.res = res = list(self.base)
+        # the load of every zone is served from its own generation before any path through the network is searched
+        for z in range(self.nz):
+            a, b = self.supply_arcs[z], self.load_arcs[z]
+            local = min(res[a], res[b])
+            res[a] -= local
+            res[a ^ 1] += local
+            res[b] -= local
+            res[b ^ 1] += local
+        self._augment()
+
+        load_curt = np.sum(demand) - np.sum(self._flow(self.load_arcs))
+        # the ESS stay idle
+        SOC_new, P_dis, P_ch = np.array(SOC_old, dtype = float), np.zeros(self.ness), np.zeros(self.ness)
+        if load_curt <= tol:
+            return(0, SOC_new, P_dis, P_ch, 0, 0, 0)
+        if np.any(dis_avail):
+            # the LP discharges the ESS to serve the remaining load
+            return(None)
+
+        curtbus = demand - self._flow(self.load_arcs)
+        flow = self._flow(self.line_arcs)
+        # the supply of a zone comes from its surplus first, then from its generators in merit order
+        gen_flow = np.clip(self._flow(self.supply_arcs) - surplus, 0, None)
+        g_ub = cap_max[0:ng]/BMva
+        Pg = np.zeros(ng)
+        for z in range(self.nz):
+            for g in self.zone_gens[z]:
+                Pg[g] = min(g_ub[g], gen_flow[z])
+                gen_flow[z] -= Pg[g]
+        return(load_curt, SOC_new, P_dis, P_ch, Pg, flow, curtbus)
@@ -6,6 +6,7 @@ optional PCM and degradation workflows used by the reliability assessment
 simulation.
 """
 
+import logging
 import numpy as np
 from time import perf_counter
 from pyomo.environ import *
@@ -19,12 +20,17 @@ from progress.mod_sysdata import RASystemData
 from progress.mod_solar import Solar
 from progress.mod_wind import Wind
 from progress.mod_utilities import RAUtilities
+from progress.mod_dispatch import make_dispatch
+from progress.mod_maxflow import MaxFlowCurtailment
 from progress.mod_matrices import RAMatrices
 from progress.mod_plot import RAPlotTools
 from progress.mod_degradation import BESS_Degradation
 from datetime import datetime, timedelta
 from progress.mod_bus_statistics import bus_statistics
 from progress.mod_pcm import PCM
+from progress.mod_importance import risk_hours, cross_entropy_factors
+
+logger = logging.getLogger(__name__)
 
 class MCS_utils:
     """Collects and prepares system, renewable, and simulation parameters.
@@ -62,6 +68,16 @@ class MCS_utils:
         self.time_periods = config['optimization_period']
         self.load_factor = config['load_factor']
         self.dispatch_solver = config.get('dispatch_solver', 'glpk')
+        self.dispatch_backend = config.get('dispatch_backend', 'pyomo')
+        # the highs backend always keeps its model between hours
+        self.persistent_dispatch = config.get('persistent_dispatch', False) or self.dispatch_backend == 'highs'
+        self.dispatch_warm_start = config.get('dispatch_warm_start', True)
+        self.merit_order_dispatch = config.get('merit_order_dispatch', True)
+        self.maxflow_curtailment = config.get('maxflow_curtailment', False)
+        self.sparse_assembly = config.get('sparse_assembly', False)
+        self.screen_adequate_hours = config.get('screen_adequate_hours', False)
+        self.event_timeline = config.get('event_timeline', False)
+        self.wind_trajectories = config.get('wind_trajectories', False)
         if self.time_periods == 1:
             self.optimization_period = "single_period"
         else:
@@ -88,6 +104,44 @@ class MCS_utils:
         
         self.pcm_parameters =  config.get('pcm_parameters', {})
 
+        # convergence-driven stopping: at most max_samples samples, stopped once the coefficient of variation of the
+        # estimate of convergence_index (LOLP or EUE) is below target_cov
+        self.target_cov = config.get('target_cov')
+        self.convergence_index = config.get('convergence_index', 'LOLP')
+        if self.convergence_index not in ['LOLP', 'EUE']:
+            raise ValueError("The convergence_index should be 'LOLP' or 'EUE'.")
+        self.min_samples = config.get('min_samples', 10)
+        if self.target_cov is not None:
+            self.samples = config.get('max_samples', self.samples)
+
+        # run seed of the random streams (RAUtilities.SeedSample); drawn from fresh entropy if not given
+        self.seed = config.get('seed')
+        if self.seed is None:
+            self.seed = np.random.SeedSequence().entropy
+        self.sample_offset = 0 # index in the run of the first sample simulated here
+
+        self.batch_samples = config.get('batch_samples', 0)
+        if self.batch_samples > 0 and (self.optimization_period != "single_period" or self.enable_pcm or self.evaluate_degradation == True):
+            raise ValueError("Currently, batched sampling only supports the single-period dispatch without PCM and degradation.")
+
+        # importance sampling of gen/TL outages: failure rates multiplied by importance_sampling (or by multipliers
+        # optimized with the cross-entropy method if 'ce') in the importance_hours share of the highest-load hours
+        self.importance_sampling = config.get('importance_sampling')
+        self.importance_hours = config.get('importance_hours', 0.02)
+        self.bias_factor = None
+        self.bias_hours = None
+        if self.importance_sampling is not None and (not self.event_timeline or self.batch_samples > 0):
+            raise ValueError("Importance sampling requires event_timeline and is not supported with batched sampling.")
+
+        # sampling design across samples (RAUtilities.SeedSample): antithetic pairs or Latin hypercube designs of
+        # lhs_samples samples
+        self.variance_reduction = config.get('variance_reduction')
+        self.lhs_samples = config.get('lhs_samples', 10)
+        if self.variance_reduction not in [None, 'antithetic', 'lhs']:
+            raise ValueError("The variance_reduction should be 'antithetic', 'lhs' or null.")
+        if self.variance_reduction is not None and self.batch_samples > 0:
+            raise ValueError("Variance reduction designs are not supported with batched sampling.")
+
 
     def initialize_params(self) :   
         """Load system details and reliability data.
@@ -129,9 +183,19 @@ class MCS_utils:
             self.ess_params["ess_units"], self.ess_params["ess_chemistry"] = rasd.storage(data_storage)
         self.ess_params["ess_sbase"] = self.ess_params["ess_pmax"]*self.ess_params["ess_duration"]
         
-        self.raut = RAUtilities(dispatch_solver=self.dispatch_solver)
+        self.raut = RAUtilities(dispatch_solver=self.dispatch_solver, sparse_assembly=self.sparse_assembly, \
+                                variance_reduction=self.variance_reduction, block_size=self.lhs_samples)
         self.cap_max, self.cap_min = self.raut.capacities(self.line_params["nl"], self.gen_params["pmax"], self.gen_params["pmin"], self.ess_params["ess_pmax"], self.ess_params["ess_pmin"], self.line_params["cap_trans"]) # calling this function to get values of cap_max and cap_min
         self.mu_tot, self.lambda_tot = self.raut.reltrates(self.gen_params["MTTF_gen"], self.line_params["MTTF_trans"], self.gen_params["MTTR_gen"], self.line_params["MTTR_trans"], self.ess_params["MTTF_ess"], self.ess_params["MTTR_ess"])
+
+        # the single-period copper sheet dispatch is a merit order when the costs allow it; the LP is solved otherwise
+        if self.merit_order_dispatch and self.network_model == 'Copper Sheet' and self.optimization_period == "single_period":
+            self.merit_order_dispatch = self.raut.MeritOrderApplicable(self.gen_params["gencost"], self.ess_params["ess_pmin"], self.ess_params["ess_eff"], \
+                                                                       self.ess_params["disch_cost"], self.ess_params["ch_cost"])
+            if not self.merit_order_dispatch:
+                logger.info("Copper Sheet dispatch is not a merit order for these costs (e.g. charge cost above efficiency x discharge cost); the LP is solved")
+        else:
+            self.merit_order_dispatch = False
         
         if self.DC_load_present == True and self.network_model == "Zonal":
             self.raut.DC_zonal(self.system_directory)
@@ -151,7 +215,6 @@ class MCS_utils:
             wind_sites = self.wind_directory + '/wind_sites.csv'
             wind_power_curves = self.wind_directory + '/w_power_curves.csv'
             windspeed_data = self.wind_directory + '/windspeed_data.csv'
-            wind_tr_rate = self.wind_directory + '/t_rate.xlsx'
             
             self.wind_params = {}
             wind = Wind(self.wind_directory)
@@ -159,12 +222,13 @@ class MCS_utils:
                 self.wind_params["w_turbines"], self.wind_params["r_cap"], self.wind_params["p_class"], self.wind_params["out_curve2"], \
                 self.wind_params["out_curve3"], self.wind_params["start_speed"] = wind.WindFarmsData(wind_sites, wind_power_curves, self.network_model)
 
-            # calculate transition rates 
-            if not os.path.exists(wind_tr_rate):
-                wind.CalWindTrRates(self.wind_directory, windspeed_data, wind_sites, wind_power_curves)
-
-            tr_mats = pd.read_excel(wind_tr_rate, sheet_name=None)
-            self.wind_params["tr_mats"] = np.array([tr_mats[sheet_name].to_numpy() for sheet_name in tr_mats])
+            # transition rates from the binary cache, calculated again when the wind data change
+            tr_mats = np.array(wind.GetTrRates(windspeed_data, wind_power_curves), dtype = float)
+            tr_mats[tr_mats == 0] = 1e-10 # zero transition rates changed to very low values once
+            self.wind_params["tr_mats"] = tr_mats
+            self.wind_params["tr_cdf"] = self.raut.WindClassCDF(tr_mats)
+            self.wind_params["class_power"] = self.raut.WindClassPower(self.wind_params["p_class"], self.wind_params["w_turbines"], self.wind_params["r_cap"], \
+                                                                       self.wind_params["out_curve2"], self.wind_params["out_curve3"])
 
         # download and process solar data
         if self.solar_dir_exists:
@@ -176,6 +240,45 @@ class MCS_utils:
             self.solar_params["farm_name"] = solar.names
             self.solar_params["s_sites"], self.solar_params["s_zone_no"], self.solar_params["s_max"], self.solar_params["s_profiles"], \
                 self.solar_params["solar_prob"] = solar.GetSolarProfiles(solar_prob_data)
+            # the site capacities come as a pandas Series, which does not broadcast over the profile arrays of SolarYear
+            self.solar_params["s_max"] = np.asarray(self.solar_params["s_max"], dtype=float)
+            self.solar_params["cluster_cdf"] = self.raut.SolarClusterCDF(self.solar_params["solar_prob"])
+            self.solar_params["zone_mat"] = self.raut.ZoneMatrix(self.bus_params["nz"], self.solar_params["s_zone_no"])
+
+    def setup_importance_sampling(self, bias_factor=None):
+        """Set the failure rate multipliers and biased hours of importance sampling.
+
+        The biased hours are the importance_hours share of the hours with the
+        highest system load. With importance_sampling set to 'ce', the
+        multipliers are optimized with the cross-entropy method on pilot
+        samples drawn from a stream of the run seed that is separate from the
+        streams of the samples.
+
+        Args:
+            bias_factor (array, optional): Multipliers computed before, e.g.
+                by the parent process; skips the cross-entropy pilot run.
+
+        Returns:
+            numpy.ndarray: Failure rate multipliers of generators and lines,
+            or None if importance sampling is off.
+        """
+        if self.importance_sampling is None:
+            return None
+        ng, nl = self.gen_params["ng"], self.line_params["nl"]
+        load = self.load_factor*np.asarray(self.load_all_regions.values, dtype = float).sum(axis = 1)
+        load = np.resize(load, self.sim_hours)
+        self.bias_hours = risk_hours(load, self.importance_hours)
+        if bias_factor is not None:
+            self.bias_factor = np.asarray(bias_factor, dtype = float)
+        elif self.importance_sampling == 'ce':
+            tic = perf_counter()
+            rng = np.random.default_rng(np.random.SeedSequence([self.seed, 1]))
+            self.bias_factor = cross_entropy_factors(ng, nl, self.ess_params["ness"], self.lambda_tot, self.mu_tot, self.ess_params["ess_units"], \
+                                                     self.gen_params["pmax"], load, self.bias_hours, rng)
+            logger.info(f"Cross-entropy failure rate multipliers optimized in {perf_counter() - tic:.1f} seconds")
+        else:
+            self.bias_factor = np.full(ng + nl, float(self.importance_sampling))
+        return self.bias_factor
 
     def process_matrices(self):
         """Build power system matrices and initialize sample index buffers.
@@ -183,7 +286,8 @@ class MCS_utils:
         This method creates the generator dispatch matrix, ESS charge/discharge
         matrix, incidence matrix for network connectivity, and curtailment
         matrix. It also initializes arrays used to record reliability indices
-        across the Monte Carlo samples.
+        across the Monte Carlo samples and, if enabled, builds the persistent
+        single-period dispatch model.
 
         Returns:
             tuple: gen_mat, ch_mat, A_inc, curt_mat, indices_rec, LOL_track
@@ -198,12 +302,62 @@ class MCS_utils:
         # dictionary for storing temp. index values
         self.indices_rec = {"LOLP_rec": np.zeros(self.samples), "EUE_rec": np.zeros(self.samples), "MDT_rec": np.zeros(self.samples), \
                         "LOLF_rec": np.zeros(self.samples), "EPNS_rec": np.zeros(self.samples), "LOLP_hr": np.zeros(self.sim_hours), \
-                            "LOLE_rec": np.zeros(self.samples),"mLOLP_rec":np.zeros(self.samples), "COV_rec": np.zeros(self.samples)}
+                            "LOLE_rec": np.zeros(self.samples),"mLOLP_rec":np.zeros(self.samples), "COV_rec": np.zeros(self.samples), \
+                                "weight_rec": np.ones(self.samples)}
         
         self.LOL_track = np.zeros((self.samples, self.sim_hours))
 
+        # dispatch model that is built once and re-solved every hour (single-period) or window (multi-period, highs backend)
+        self.dispatch = None
+        if self.persistent_dispatch and (self.optimization_period == "single_period" or self.dispatch_backend == 'highs'):
+            self.dispatch = make_dispatch(self.dispatch_backend, self.gen_params["ng"], self.bus_params["nz"], self.line_params["nl"], self.ess_params["ness"], \
+                                          self.BMva, self.A_inc, self.gen_mat, self.curt_mat, self.ch_mat, self.gen_params["gencost"], self.ess_params["ess_pmax"], \
+                                          self.ess_params["ess_eff"], self.ess_params["disch_cost"], self.ess_params["ch_cost"], \
+                                          copper_sheet = self.network_model == 'Copper Sheet', dispatch_solver = self.dispatch_solver, \
+                                          warm_start = self.dispatch_warm_start, \
+                                          time_periods = self.time_periods if self.optimization_period == "multi_period" else None)
+
+        # max-flow curtailment engine in place of the single-period Zonal/Nodal dispatch LP
+        self.maxflow = None
+        if self.maxflow_curtailment and self.network_model in ['Zonal', 'Nodal'] and self.optimization_period == "single_period":
+            if self.evaluate_degradation:
+                logger.info("maxflow_curtailment is not used with battery degradation, which needs the ESS dispatch of the LP")
+            else:
+                self.maxflow = MaxFlowCurtailment(self.gen_params["ng"], self.bus_params["nz"], self.line_params["nl"], self.ess_params["ness"], self.BMva, \
+                                                  self.A_inc, self.gen_mat, self.gen_params["gencost"], self.ess_params["ess_pmax"], \
+                                                  self.ess_params["ess_eff"], self.ess_params["disch_cost"], self.ess_params["ch_cost"])
+
         return self.gen_mat, self.ch_mat, self.A_inc, self.curt_mat, self.indices_rec, self.LOL_track
 
+    def target_cov_reached(self, indices_rec, done, comm=None):
+        """Check the convergence-driven stopping rule after a sample.
+
+        Args:
+            indices_rec (dict): Recorded index values of the samples.
+            done (list): Indices of the samples simulated so far.
+            comm (MPI.Comm, optional): MPI communicator; the running moments
+                of all processes are combined when given.
+
+        Returns:
+            bool: True if target_cov is set and the coefficient of variation
+            of the estimate of convergence_index is below it. With a
+            variance reduction design, it is computed from the means of the
+            complete blocks of samples.
+        """
+        if self.target_cov is None:
+            return False
+        values = indices_rec[f"{self.convergence_index}_rec"][done]
+        min_samples = self.min_samples
+        if self.variance_reduction is not None:
+            values = self.raut.BlockMeans(values, self.sample_offset + np.asarray(done))
+            min_samples = int(np.ceil(self.min_samples/self.raut.block_size))
+        moments = self.raut.RunningMoments(values, comm)
+        cov, reached = self.raut.TargetCOVReached(moments, self.target_cov, min_samples)
+        if reached:
+            unit = "blocks of samples" if self.variance_reduction is not None else "samples"
+            logger.info(f"COV of the {self.convergence_index} estimate {cov:.4f} below the target {self.target_cov} after {int(moments[0])} {unit}")
+        return reached
+
 class MCS_samples():
     """Stores sample-level data and provides utilities for each Monte Carlo sample.
 
@@ -262,6 +416,19 @@ class MCS_samples():
 
         if self.wind_dir_exists:
             self.current_w_class = self.raut.InitializeWindClasses(self.wind_params["w_sites"], self.wind_params["w_classes"])
+            if self.wind_trajectories:
+                # wind speed classes of all sites for the whole sample (hours x sites)
+                self.w_class_traj = self.raut.WindClassTrajectory(self.wind_params["tr_cdf"], self.current_w_class, self.sim_hours)
+
+        if self.solar_dir_exists:
+            # solar generation of the zones and sites for the whole days of the sample (24*ceil(hours/24) x zones/sites)
+            solar_year = self.raut.SolarYear(self.sim_hours, self.bus_params["nz"], self.solar_params["s_zone_no"], self.solar_params["solar_prob"], 
+                                             self.solar_params["s_profiles"], self.solar_params["s_max"], return_site_gen = self.enable_pcm, 
+                                             cluster_cdf = self.solar_params["cluster_cdf"], zone_mat = self.solar_params["zone_mat"])
+            if self.enable_pcm: # site outputs are recorded for the PCM
+                self.s_year, self.s_year_sites = solar_year
+            else:
+                self.s_year = solar_year
 
         # record data for plotting and exporting (optional)
         self.renewable_rec = {"wind_rec": np.zeros((self.bus_params["nz"], self.sim_hours)), "solar_rec": np.zeros((self.bus_params["nz"], self.sim_hours)), "congen_temp": 0, \
@@ -420,15 +587,19 @@ class MCS_hourly(MCS_samples):
             tuple: net_load, total_renewable, wind_output, solar_output
         """
         # get wind power output for all zones/areas
-        if self.wind_dir_exists:
-            w_zones, self.current_w_class = self.raut.WindPower(self.bus_params["nz"], self.wind_params["w_sites"], self.wind_params["zone_no"], 
+        if self.wind_dir_exists and self.wind_trajectories:
+            w_zones = self.raut.WindTrajectoryPower(self.bus_params["nz"], self.wind_params["zone_no"], self.w_class_traj[hour], self.wind_params["class_power"])
+        elif self.wind_dir_exists:
+            # the classes are kept by the sample, so that the chain continues from them in the next hour
+            w_zones, self._mcs.current_w_class = self.raut.WindPower(self.bus_params["nz"], self.wind_params["w_sites"], self.wind_params["zone_no"], 
                                             self.wind_params["w_classes"], self.wind_params["r_cap"], self.current_w_class, self.wind_params["tr_mats"], self.wind_params["p_class"], 
-                                            self.wind_params["w_turbines"], self.wind_params["out_curve2"], self.wind_params["out_curve3"])
+                                            self.wind_params["w_turbines"], self.wind_params["out_curve2"], self.wind_params["out_curve3"], \
+                                            class_power = self.wind_params["class_power"])
 
         # get solar power output for all zones/areas
         if self.solar_dir_exists:
-            s_zones = self.raut.SolarPower(hour, self.bus_params["nz"], self.solar_params["s_zone_no"], self.solar_params["solar_prob"], self.solar_params["s_profiles"], 
-                                      self.solar_params["s_sites"], self.solar_params["s_max"])
+            day_start = hour - hour%24
+            s_zones = self.s_year[day_start:day_start + 24] # hours of the current day x zones
 
         # record wind and solar profiles for plotting (optional)
         if self.wind_dir_exists:
@@ -544,16 +715,17 @@ class MCS_hourly(MCS_samples):
                 holder_dict["ess_smax_limit"][ess_name].append(ess_smax[i-ng-nl])
                 holder_dict["ess_smin_limit"][ess_name].append(ess_smin[i-ng-nl])
         if self.wind_dir_exists:
-            w_zones, current_w_class = self.raut.WindPower(self.bus_params["nz"], self.wind_params["w_sites"], self.wind_params["zone_no"], 
-                                            self.wind_params["w_classes"], self.wind_params["r_cap"], self.current_w_class, self.wind_params["tr_mats"], self.wind_params["p_class"], 
-                                            self.wind_params["w_turbines"], self.wind_params["out_curve2"], self.wind_params["out_curve3"])
+            if not self.wind_trajectories: # with trajectories, the site outputs of get_net_load in this hour are used
+                w_zones, current_w_class = self.raut.WindPower(self.bus_params["nz"], self.wind_params["w_sites"], self.wind_params["zone_no"], 
+                                                self.wind_params["w_classes"], self.wind_params["r_cap"], self.current_w_class, self.wind_params["tr_mats"], self.wind_params["p_class"], 
+                                                self.wind_params["w_turbines"], self.wind_params["out_curve2"], self.wind_params["out_curve3"], \
+                                                class_power = self.wind_params["class_power"])
             for i in range(self.wind_params["w_sites"]):
                 site_name = self.wind_params["farm_name"].loc[i]
                 holder_dict["wind_limit"][site_name].append(self.raut.w_power[i])
         if self.solar_dir_exists:
-            if hour%24 == 0:
-                s_zones, s_gen_sites = self.raut.SolarPower(hour, self.bus_params["nz"], self.solar_params["s_zone_no"], self.solar_params["solar_prob"], self.solar_params["s_profiles"], 
-                                      self.solar_params["s_sites"], self.solar_params["s_max"], return_site_gen = True)
+            if hour%24 == 0: # site outputs of the day simulated by get_net_load
+                s_gen_sites = self.s_year_sites[hour:hour + 24].T
                 for i in range(self.solar_params["s_sites"]):
                     site_name = self.solar_params["farm_name"].loc[i]
                     holder_dict["solar_limit"][site_name].extend(list(s_gen_sites[i, :]))
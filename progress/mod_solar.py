@@ -1,11 +1,11 @@
-import cdsapi
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import yaml
-import zipfile
 import os
 import glob
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pvlib
 from pvlib.location import Location
 from pvlib.pvsystem import PVSystem
@@ -13,6 +13,8 @@ import pvlib.modelchain as mc
 from timezonefinder import TimezoneFinder
 import logging
 
+from progress.mod_download import DownloadManager
+from progress.mod_storage import TABLE_FORMATS, check_format, write_table, read_table
 from progress.utils.data_validator import validate_file_columns, SOLAR_SCHEMAS
 
 logger = logging.getLogger(__name__)
@@ -31,13 +33,17 @@ class Solar:
     and processing the data for Monte Carlo Simulation (MCS).
     """
 
-    def __init__(self, solar_directory, model):
+    def __init__(self, solar_directory, model, storage_format="csv"):
         """
         Initializes the Solar class with directory.
 
         Parameters:
             directory (str): Directory to save the data.
+            storage_format (str): Format of the weather, site generation and combined generation tables: 'csv',
+                'parquet' or 'feather' (the last two need pyarrow and keep the datetime columns typed).
         """
+        check_format(storage_format)
+        self.storage_format = storage_format
         self.solar_directory = solar_directory
         self.solar_site_data = solar_directory + "/solar_sites.csv"
         self.sites_df = pd.read_csv(self.solar_site_data)
@@ -61,75 +67,64 @@ class Solar:
         self.gen_data_directory = Path(solar_directory + "/solar_gen_data")
         self.gen_data_directory.mkdir(exist_ok=True)
 
-        pass
-
-    def download_solar_data(self, start_year, end_year, progress_callback=None):
-        # --- DATA DESCRIPTION FOR ERA5 ---
-        dataset = "reanalysis-era5-single-levels-timeseries"
-        base_request = {
-            "variable": [
-                "surface_solar_radiation_downwards",
-                "2m_temperature",
-                "10m_u_component_of_wind",
-                "10m_v_component_of_wind",
-            ],
-            "date": [f"{start_year}-01-01/{end_year}-12-31"],
-            "data_format": "csv"
-        }
-
-        client = cdsapi.Client(
-            timeout=60,
-            retry_max=2,
-            sleep_max=10
-        )
-
-        # --- DOWNLOAD LOOP ---
-        for idx, row in self.sites_df.iterrows():
-
-            lat = float(row["Latitude"])
-            lon = float(row["Longitude"])
-            name = row["Site Name"]
-
-            request = base_request.copy()
-            request["location"] = {"longitude": lon, "latitude": lat}
+        self.tz_finder = None # built at the first site, then reused
 
-            logger.info(f"Downloading {name} (lat={lat}, lon={lon})...")
-
-            result = client.retrieve(dataset, request)
-            zip_path = self.weather_data_directory / f"{name}.zip"
-            result.download(target=zip_path)
-
-            final_csv_path = self.weather_data_directory / f"{name}.csv"
-
-            # --- EXTRACT FROM DOWNLOADED ZIP ---
-            with zipfile.ZipFile(zip_path, 'r') as z:
-                csv_files = [f for f in z.namelist() if f.endswith(".csv")]
-
-                if not csv_files:
-                    raise RuntimeError(f"No CSV found in ZIP for {name}")
-
-                extracted_name = csv_files[0]
-                z.extract(extracted_name, self.weather_data_directory)
+        pass
 
-                extracted_path = self.weather_data_directory / extracted_name
+    def download_solar_data(self, start_year, end_year, progress_callback=None, client=None, workers=4):
+        """
+        Downloads the ERA5 irradiance, temperature and wind components of all sites. The sites are requested
+        concurrently by a DownloadManager, which resumes interrupted downloads and skips sites whose data already
+        cover the requested years.
 
-                os.replace(extracted_path, final_csv_path) # rename csv file for convenience
+        Parameters:
+            start_year (int): First year to download.
+            end_year (int): Last year to download.
+            progress_callback (callable): Called once for every site that is done.
+            client: Client with a retrieve(dataset, request, target) method (e.g. LocalClient); CDSClient if None.
+            workers (int): Maximum number of concurrent requests.
+        """
+        variables = [
+            "surface_solar_radiation_downwards",
+            "2m_temperature",
+            "10m_u_component_of_wind",
+            "10m_v_component_of_wind",
+        ]
+        manager = DownloadManager(self.weather_data_directory, variables, start_year, end_year, client=client, workers=workers)
+        manager.run(self.sites_df, progress_callback=progress_callback)
+
+    def read_weather(self, file_path):
+        """
+        Reads the downloaded weather CSV of a site. With a columnar storage format, the table is saved next to the
+        CSV with a typed valid_time column at the first read, and read from there while it is newer than the CSV.
 
-            # --- CLEANUP ---
-            zip_path.unlink()
+        Parameters:
+            file_path (Path): Weather data CSV of the site.
 
-            if progress_callback:
-                progress_callback()
+        Returns:
+            DataFrame: Weather data of the site.
+        """
+        if self.storage_format == "csv":
+            return(pd.read_csv(file_path))
+        base = str(file_path)[:-len(".csv")]
+        stored = base + TABLE_FORMATS[self.storage_format]
+        if os.path.exists(stored) and os.path.getmtime(stored) >= os.path.getmtime(file_path):
+            return(read_table(stored))
+        df_weather = pd.read_csv(file_path)
+        df_weather['valid_time'] = pd.to_datetime(df_weather['valid_time'], utc=True)
+        write_table(df_weather, base, self.storage_format, index=False)
+        return(df_weather)
 
     def process_solar_data(self, file_path, site):
-        logger.info("  read_csv...")
-        df_weather = pd.read_csv(file_path)
+        logger.info("  read weather data...")
+        df_weather = self.read_weather(file_path)
 
-        logger.info("  TimezoneFinder()...")
-        tf = TimezoneFinder()
+        if self.tz_finder is None:
+            logger.info("  TimezoneFinder()...")
+            self.tz_finder = TimezoneFinder()
 
         logger.info("  timezone_at...")
-        tz = tf.timezone_at(lat=site.Latitude, lng=site.Longitude)
+        tz = self.tz_finder.timezone_at(lat=site.Latitude, lng=site.Longitude)
 
         logger.info("  parse time...")
         df_weather['valid_time'] = pd.to_datetime(df_weather['valid_time'], utc=True)
@@ -192,7 +187,7 @@ class Solar:
         # run mchain model for satellite data
         mchain.run_model(weather_sat)
         ac_power_sat = pd.DataFrame(mchain.results.ac)*site.MW_Capacity
-        ac_power_sat.to_csv(f'{self.gen_data_directory}/{site_id}_gen.csv')
+        write_table(ac_power_sat, f'{self.gen_data_directory}/{site_id}_gen', self.storage_format)
 
     def combine_site_generation(self, file_pattern):
         """
@@ -214,6 +209,9 @@ class Solar:
         """
 
         input_folder = Path(self.gen_data_directory)
+        # site files written in the storage format
+        if file_pattern.endswith(".csv"):
+            file_pattern = file_pattern[:-len(".csv")] + TABLE_FORMATS[self.storage_format]
 
         all_site_series = []
 
@@ -223,7 +221,7 @@ class Solar:
             site_id = file_path.stem.replace("_gen", "")
 
             # Read file
-            df = pd.read_csv(file_path)
+            df = read_table(file_path)
 
             # Basic validation
             required_cols = {"time", "p_mp"}
@@ -253,19 +251,61 @@ class Solar:
         combined_df = combined_df.sort_index()
 
         # Save
-        output_file = self.solar_directory + "/gen_all_sites.csv"
-        combined_df.to_csv(output_file)
+        output_file = write_table(combined_df, self.solar_directory + "/gen_all_sites", self.storage_format)
 
         logger.info(f"Saved combined data to: {output_file}")
         logger.info(f"Shape: {combined_df.shape}")
 
-        _validate_csv(output_file, "gen_all_sites.csv", SOLAR_SCHEMAS)
+        if self.storage_format == "csv":
+            _validate_csv(output_file, "gen_all_sites.csv", SOLAR_SCHEMAS)
 
         return combined_df
     
+    def _cluster_files_signature(self, n_clust):
+        '''
+        Fingerprint of the cluster CSVs (site order, path, size and modification time of every file), used to
+        detect when the solar profile store is stale.
+        '''
+        sig = hashlib.sha1()
+        for i in range(1, n_clust + 1):
+            for site in self.names:
+                f = self.solar_directory + "/Clusters/" + str(i) + "/" + site + ".csv"
+                st = os.stat(f)
+                sig.update(f"{i}/{site}:{st.st_size}:{st.st_mtime_ns};".encode())
+        return(sig.hexdigest())
+
+    def BuildProfileStore(self, n_clust, signature):
+        '''
+        Compiles the cluster CSVs into the solar profile store: a padded float32 array [cluster, day, hour, site]
+        saved as solar_profiles.npy, and the number of days of every cluster with the fingerprint of the CSVs saved
+        as solar_profiles_index.npz. Both are written to temporary files first, so that processes starting
+        together never read a partial store.
+
+        Parameters:
+            n_clust (int): Number of clusters.
+            signature (str): Fingerprint of the cluster CSVs from _cluster_files_signature.
+        '''
+        clusters = []
+        for i in range(1, n_clust + 1):
+            clusters.append(np.stack([pd.read_csv(self.solar_directory + "/Clusters/" + str(i) + "/" + site + ".csv").to_numpy(dtype = np.float32) \
+                                      for site in self.names], -1))
+        days = np.array([c.shape[0] for c in clusters])
+        profiles = np.zeros((n_clust, days.max(), 24, self.n_sites), dtype = np.float32)
+        for i, c in enumerate(clusters):
+            profiles[i, 0:days[i]] = c
+
+        store, index = self.solar_directory + "/solar_profiles.npy", self.solar_directory + "/solar_profiles_index.npz"
+        np.save(store + f".{os.getpid()}.tmp.npy", profiles)
+        os.replace(store + f".{os.getpid()}.tmp.npy", store)
+        np.savez(index + f".{os.getpid()}.tmp.npz", days = days, signature = signature)
+        os.replace(index + f".{os.getpid()}.tmp.npz", index)
+        logger.info(f"Solar profile store built from {n_clust*self.n_sites} cluster files: {profiles.shape}")
+
     def GetSolarProfiles(self, solar_prob_data):
         '''
         This function extracts the solar data from clusters and modifies it for the MCS. The solar data is stored in a 4D ndarray where the dimensions are: [cluster, day, hour, site]. The clusters are created using the K-means clustering algorithm. Similar days of solar generation are put in the same cluster.
+        The cluster CSVs are compiled once into a profile store (BuildProfileStore), which is memory-mapped at later
+        runs and rebuilt only when the CSVs change.
 
         Parameters:
             solar_prob_data (str): Path to the CSV file containing solar probability data.
@@ -277,63 +317,99 @@ class Solar:
         clusters = glob.glob(os.path.join(self.solar_directory + "/Clusters/", '*/'))
         n_clust = len(clusters) # no. of clusters created (depends on user and data)
 
-        self.s_profiles = [] # this array will contain solar data for all clusters, sites, and days
-        for i in range(1, n_clust + 1):
-            self.cluster_list = []
-            for site in self.names:
-                matrix=pd.read_csv(self.solar_directory + "/Clusters/" + str(i) + "/"+site+".csv")
-                self.cluster_list.append(matrix)
-            self.s_profiles.append(np.stack(self.cluster_list,-1))
+        store, index = self.solar_directory + "/solar_profiles.npy", self.solar_directory + "/solar_profiles_index.npz"
+        signature = self._cluster_files_signature(n_clust)
+        stale = True
+        if os.path.exists(store) and os.path.exists(index):
+            with np.load(index) as idx:
+                stale = str(idx["signature"]) != signature
+        if stale:
+            self.BuildProfileStore(n_clust, signature)
+
+        with np.load(index) as idx:
+            days = idx["days"]
+        profiles = np.load(store, mmap_mode = 'r')
+        # profiles of every cluster without the padded days (views of the memory-mapped store)
+        self.s_profiles = [profiles[i, 0:days[i]] for i in range(n_clust)]
 
         self.solar_prob = pd.read_csv(solar_prob_data).values
 
         return(self.n_sites, self.s_zone_no, self.MW, self.s_profiles, self.solar_prob)
 
-    def run_pipeline(self, start_year, end_year):
+    def model_site(self, file):
+        """
+        Calculates the solar generation of a site from its weather data and saves it in <site>_gen.csv.
 
-        # download solar data
-        self.download_solar_data(start_year, end_year)
+        Parameters:
+            file (Path): Weather data CSV of the site (<site name>.csv).
+        """
+        logger.info(f"Processing {file.name}")
+        site_id = file.stem
+        site_row = self.sites_df[self.sites_df['Site Name'] == site_id]
+        site = site_row.iloc[0]
+        logger.info("  Reading weather data...")
+        df, tz = self.process_solar_data(file, site)
+        logger.info("  Computing irradiance...")
+        df = self.add_irradiance_components(df, site.Latitude, site.Longitude)
+        logger.info("  Running PV model...")
+        self.run_pv_model(df, site, site_id, tz)
+        logger.info("  Done")
+
+    def model_sites(self, processes=1, progress_callback=None):
+        """
+        Calculates the solar generation of all sites with weather data. The sites are independent, so with
+        processes > 1 they are distributed over a pool of worker processes, each with its own Solar instance and
+        TimezoneFinder.
 
+        Parameters:
+            processes (int): Number of worker processes; the sites are modeled in this process if 1.
+            progress_callback (callable): Called once for every site that is done, in the order they finish.
+        """
         all_files = sorted(Path(self.weather_data_directory).glob('*.csv'))
 
-        for file in all_files:
+        if processes <= 1 or len(all_files) <= 1:
+            for file in all_files:
+                self.model_site(file)
+                if progress_callback:
+                    progress_callback()
+            return
 
-            logger.info(f"Processing {file.name}")
-            
-            # Extract site_id from filename
-            site_id = file.stem
-            site_row = self.sites_df[self.sites_df['Site Name'] == site_id]
-            site = site_row.iloc[0]
+        logger.info(f"Modeling {len(all_files)} sites on {processes} worker processes")
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_pv_worker, initargs=(self.solar_directory, self.model, self.storage_format)) as executor:
+            futures = [executor.submit(_model_worker_site, file) for file in all_files]
+            for future in as_completed(futures):
+                logger.info(f"  {future.result()} done")
+                if progress_callback:
+                    progress_callback()
 
-            # convert observations into required indices
-            df, tz = self.process_solar_data(file, site)
+    def run_pipeline(self, start_year, end_year, download_workers=4, processes=1, progress_callback=None):
 
-            # add irradiance components 
-            df = self.add_irradiance_components(df, site.Latitude, site.Longitude)
+        # download solar data
+        self.download_solar_data(start_year, end_year, workers=download_workers)
 
-            # run PV model
-            self.run_pv_model(df, site, site_id, tz)
+        # calculate solar generation of every site
+        self.model_sites(processes=processes, progress_callback=progress_callback)
 
         # combine all generation data
         self.combine_site_generation(file_pattern="*_gen.csv")
 
-    def run_pipeline_gui(self):
-        all_files = sorted(Path(self.weather_data_directory).glob('*.csv'))
-        for file in all_files:
-                logger.info(f"Processing {file.name}")
-                site_id = file.stem
-                site_row = self.sites_df[self.sites_df['Site Name'] == site_id]
-                site = site_row.iloc[0]
-                logger.info("  Reading weather data...")
-                df, tz = self.process_solar_data(file, site)
-                logger.info("  Computing irradiance...")
-                df = self.add_irradiance_components(df, site.Latitude, site.Longitude)
-                logger.info("  Running PV model...")
-                self.run_pv_model(df, site, site_id, tz)
-                logger.info("  Done")
+    def run_pipeline_gui(self, processes=1, progress_callback=None):
+        self.model_sites(processes=processes, progress_callback=progress_callback)
         logger.info("Combining site generation...")
         self.combine_site_generation(file_pattern="*_gen.csv")
 
+# solar model of a worker process of Solar.model_sites, built once by _init_pv_worker
+_pv_worker = {}
+
+def _init_pv_worker(solar_directory, model, storage_format):
+    '''Builds the solar model in a worker process of Solar.model_sites.'''
+    _pv_worker["solar"] = Solar(solar_directory, model, storage_format)
+
+def _model_worker_site(file):
+    '''Calculates the solar generation of a site in a worker process.'''
+    _pv_worker["solar"].model_site(file)
+    return(file.stem)
+
 if __name__ == "__main__":
 
     # --- CONFIG ---
@@ -0,0 +1,83 @@
+# import python modules
+import os
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# file extensions of the supported table formats; Parquet and Feather need pyarrow
+TABLE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+def check_format(fmt):
+    '''
+    Checks that a table format is supported and usable in this environment.
+
+    Parameters:
+        fmt (str): 'csv', 'parquet' or 'feather'.
+    '''
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unknown storage format '{fmt}'; use one of {', '.join(TABLE_FORMATS)}")
+    if fmt != "csv":
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(f"The '{fmt}' storage format requires pyarrow (pip install pyarrow)") from None
+
+def write_table(df, base, fmt="csv", index=True):
+    '''
+    Writes a table in the given format. The columnar formats keep the column types (e.g. timezone-aware
+    datetimes), so the table is read back without parsing.
+
+    Parameters:
+        df (DataFrame): Table to write.
+        base (str): Path of the file without extension.
+        fmt (str): 'csv', 'parquet' or 'feather'.
+        index (bool): Whether the index is written, as a column named after it.
+
+    Returns:
+        str: Path of the written file.
+    '''
+    path = str(base) + TABLE_FORMATS[fmt]
+    if fmt == "csv":
+        df.to_csv(path, index=index)
+        return(path)
+    if index:
+        df = df.reset_index()
+    else:
+        df = df.reset_index(drop=True)
+    df.columns = [str(c) for c in df.columns]
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+    return(path)
+
+def table_path(base):
+    '''
+    Returns the most recently written file of a table among its formats, or None if there is none.
+
+    Parameters:
+        base (str): Path of the file without extension.
+    '''
+    paths = [str(base) + ext for ext in TABLE_FORMATS.values() if os.path.exists(str(base) + ext)]
+    if not paths:
+        return(None)
+    return(max(paths, key=os.path.getmtime))
+
+def read_table(path, parse_dates=None):
+    '''
+    Reads a table written by write_table (or any CSV file), choosing the reader from the file extension.
+
+    Parameters:
+        path (str): Path of the file.
+        parse_dates (list): Columns parsed as datetimes when reading a CSV file; typed in the other formats.
+
+    Returns:
+        DataFrame: The table.
+    '''
+    path = str(path)
+    if path.endswith(".parquet"):
+        return(pd.read_parquet(path))
+    if path.endswith(".feather"):
+        return(pd.read_feather(path))
+    return(pd.read_csv(path, parse_dates=parse_dates))
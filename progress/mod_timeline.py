@@ -0,0 +1,232 @@
+# import python modules
+import heapq
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# event record of the component-state timeline
+EVENT_DTYPE = np.dtype([("hour", np.int32), ("component", np.int32), ("state", np.float64)])
+
+class StateTimeline:
+    '''
+    Event-driven sampler of the component states (generators, transmission lines and ESS) for one Monte Carlo sample.
+
+    Every component keeps its own exponential failure/repair clock in a heap of next-transition times. The heap is
+    advanced once per sample to generate the whole component-state timeline as a compact array of
+    (hour, component, new_state) events. Component states and capacities are then materialized lazily hour by hour
+    (also to fill a multi-period optimization window), instead of sampling and decrementing a clock every hour.
+
+    Component ordering follows RAUtilities.NextState: generators, lines, ESS. Generators and lines are up (1) or
+    down (0). The state of an ESS is the fraction of its units in service. An ESS loses one unit at its failure
+    rate while at least one unit is in service, and regains one unit at its repair rate while a unit is out.
+
+    For importance sampling, the failure rate of every generator and line c can be multiplied by a factor k_c in the
+    hours flagged by bias_hours (all hours if None). The likelihood ratio of the generated timeline with respect
+    to the unbiased rates is then
+
+        weight = prod_c k_c**(-N_c) * exp((k_c - 1)*lambda_c*T_c)
+
+    where N_c is the number of failures of component c in biased hours and T_c the time it was up during biased
+    hours. Weighting the sample indices with it keeps their expected values unbiased.
+    '''
+    def __init__(self, ng, nl, ness, lambda_tot, mu_tot, ess_units, rng=None, bias_factor=None, bias_hours=None):
+        """
+        Initializes the timeline sampler.
+
+        Parameters:
+            ng (int): Number of generators.
+            nl (int): Number of lines.
+            ness (int): Number of energy storage systems.
+            lambda_tot (array): Failure rates.
+            mu_tot (array): Repair rates.
+            ess_units (array): Units of energy storage systems.
+            rng (numpy.random.Generator): Random number generator. A new unseeded generator is used if None.
+            bias_factor (float or array): Failure rate multipliers of generators and lines for importance sampling, one
+                per gen/TL or a single value for all. None disables importance sampling.
+            bias_hours (array): Boolean flags of the hours in which the failure rates are biased; all hours if None.
+        """
+        self.ng = ng
+        self.nl = nl
+        self.ness = ness
+        self.lambda_tot = np.asarray(lambda_tot, dtype = float)
+        self.mu_tot = np.asarray(mu_tot, dtype = float)
+        self.ess_units = np.asarray(ess_units, dtype = int)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.bias_factor = None if bias_factor is None else np.broadcast_to(np.asarray(bias_factor, dtype = float), (ng + nl,)).copy()
+        self.bias_hours = bias_hours
+
+        # likelihood ratio of the last generated timeline, and the per-gen/TL statistics it is computed from
+        self.weight = 1.0
+        self.biased_failures = np.zeros(ng + nl)
+        self.biased_exposure = np.zeros(ng + nl)
+        self._hazard_grids = {}
+
+        self.events = np.zeros(0, dtype = EVENT_DTYPE)
+        self._event_hours = self.events["hour"]
+        self.sim_hours = 0
+        self._state = np.ones(ng + nl + ness)
+        self._next = 0 # index of the first event not yet applied to self._state
+        self._hour = -1 # last hour materialized by state_at
+        self._current_state = None
+        self._cap = None
+
+    def _clock(self, now, rate):
+        """Returns the time of the next transition of a clock started at time now."""
+        return(now + self.rng.standard_exponential()/rate if rate > 0 else np.inf)
+
+    def _biased_clock(self, now, rate, k):
+        """
+        Returns the time of the next transition of a clock started at time now that runs at rate*k in biased hours,
+        i.e. the transition happens when rate*(elapsed time + (k - 1)*elapsed biased time) reaches a standard
+        exponential draw.
+        """
+        if rate <= 0:
+            return(np.inf)
+        if k == 1:
+            return(now + self.rng.standard_exponential()/rate)
+        return(float(self._real_time(now + (k - 1)*self._biased_time(now) + self.rng.standard_exponential()/rate, k)))
+
+    def _real_time(self, clock, k):
+        """Returns the time at which the clock biased by k reaches clock; the clock runs unbiased after the last hour."""
+        hazard_grid = self._hazard_grids.get(k)
+        if hazard_grid is None:
+            hazard_grid = self._hazard_grids[k] = self._grid + (k - 1)*self._biased_grid
+        return(np.where(clock >= hazard_grid[-1], self._grid[-1] + clock - hazard_grid[-1], np.interp(clock, hazard_grid, self._grid)))
+
+    def _biased_time(self, t):
+        """Returns the time spent in biased hours between hour 0 and time t."""
+        return(np.interp(t, self._grid, self._biased_grid))
+
+    def _set_bias_grid(self, sim_hours):
+        """Tabulates the time spent in biased hours at the hours of the sample."""
+        flags = np.ones(sim_hours, dtype = bool) if self.bias_hours is None else np.asarray(self.bias_hours[0:sim_hours], dtype = bool)
+        self._flags = np.zeros(sim_hours, dtype = bool)
+        self._flags[0:flags.size] = flags
+        self._grid = np.arange(sim_hours + 1, dtype = float)
+        self._biased_grid = np.concatenate(([0.0], np.cumsum(self._flags)))
+        self._hazard_grids = {}
+
+    def generate(self, sim_hours):
+        """
+        Generates the component-state timeline of the whole sample. All components are in the up state at hour 0.
+
+        Parameters:
+            sim_hours (int): Number of simulation hours.
+
+        Returns:
+            numpy.ndarray: Events (hour, component, new_state) sorted by hour.
+        """
+        n_gt = self.ng + self.nl
+        up = np.ones(n_gt, dtype = bool)
+        units_down = np.zeros(self.ness, dtype = int)
+        biased = self.bias_factor is not None
+        if biased:
+            self._set_bias_grid(sim_hours)
+            up_since = np.zeros(n_gt) # start of the current up period of gens/TLs
+        self.biased_failures = np.zeros(n_gt)
+        self.biased_exposure = np.zeros(n_gt)
+
+        # heap entries: (transition time, component, kind); kind 0 = gen/TL toggle, 1 = ESS unit failure, 2 = ESS unit repair
+        times = self.rng.standard_exponential(n_gt + self.ness)/self.lambda_tot
+        if biased:
+            for k in np.unique(self.bias_factor[self.bias_factor != 1]):
+                scaled = np.flatnonzero(self.bias_factor == k)
+                times[scaled] = self._real_time(times[scaled], k)
+        heap = [(times[c], c, 0) for c in range(n_gt)] + [(times[n_gt + e], n_gt + e, 1) for e in range(self.ness)]
+        heapq.heapify(heap)
+
+        events = []
+        while heap and heap[0][0] < sim_hours:
+            t, c, kind = heapq.heappop(heap)
+            if kind == 0:
+                up[c] = not up[c]
+                events.append((int(t), c, float(up[c])))
+                if not biased:
+                    heapq.heappush(heap, (self._clock(t, self.lambda_tot[c] if up[c] else self.mu_tot[c]), c, 0))
+                elif up[c]:
+                    up_since[c] = t
+                    heapq.heappush(heap, (self._biased_clock(t, self.lambda_tot[c], self.bias_factor[c]), c, 0))
+                else:
+                    # likelihood ratio terms of the up period that ended with this failure
+                    self.biased_failures[c] += self._flags[int(t)]
+                    self.biased_exposure[c] += self.lambda_tot[c]*(self._biased_time(t) - self._biased_time(up_since[c]))
+                    heapq.heappush(heap, (self._clock(t, self.mu_tot[c]), c, 0))
+                continue
+
+            e = c - n_gt
+            if kind == 1:
+                if units_down[e] < self.ess_units[e]:
+                    units_down[e] += 1
+                    events.append((int(t), c, 1 - units_down[e]/self.ess_units[e]))
+                    if units_down[e] == 1: # start the repair clock
+                        heapq.heappush(heap, (self._clock(t, self.mu_tot[c]), c, 2))
+                heapq.heappush(heap, (self._clock(t, self.lambda_tot[c]), c, 1))
+            else:
+                units_down[e] -= 1
+                events.append((int(t), c, 1 - units_down[e]/self.ess_units[e]))
+                if units_down[e] > 0:
+                    heapq.heappush(heap, (self._clock(t, self.mu_tot[c]), c, 2))
+
+        if biased:
+            # up periods still running at the end of the sample
+            self.biased_exposure[up] += self.lambda_tot[0:n_gt][up]*(self._biased_grid[-1] - self._biased_time(up_since[up]))
+            self.weight = float(np.exp(np.sum((self.bias_factor - 1)*self.biased_exposure - self.biased_failures*np.log(self.bias_factor))))
+        else:
+            self.weight = 1.0
+
+        self.events = np.array(events, dtype = EVENT_DTYPE)
+        self._event_hours = self.events["hour"]
+        logger.debug(f"{self.events.size} component state events in {sim_hours} hours")
+        self.sim_hours = sim_hours
+        self.reset()
+        return(self.events)
+
+    def reset(self):
+        """Rewinds the lazy state materialization to the start of the sample."""
+        self._state = np.ones(self.ng + self.nl + self.ness)
+        self._next = 0
+        self._hour = -1
+        self._current_state = None
+        self._cap = None
+
+    def state_at(self, hour, cap_max, cap_min):
+        """
+        Materializes the component states and capacities in an hour. Hours are expected in increasing order, as in
+        the hourly MCS loop; only the events since the previous call are applied.
+
+        Parameters:
+            hour (int): Simulation hour.
+            cap_max (array): Maximum capacities of components.
+            cap_min (array): Minimum capacities of components.
+
+        Returns:
+            tuple: Current state and current capacity of all components.
+        """
+        if hour < self._hour:
+            self.reset()
+        if self._cap is None or (self._next < self.events.size and self._event_hours[self._next] <= hour):
+            stop = np.searchsorted(self._event_hours, hour, side = "right")
+            applied = self.events[self._next:stop]
+            self._state[applied["component"]] = applied["state"] # later events of a component overwrite earlier ones
+            self._next = stop
+            # states and capacities are only rebuilt when a component changed state; treat them as read-only
+            self._current_state = self._state.copy()
+            self._cap = {"max": np.multiply(self._current_state, cap_max), "min": np.multiply(self._current_state, cap_min)}
+        self._hour = hour
+
+        return(self._current_state, self._cap)
+
+    def export(self, path, names=None):
+        """
+        Saves the timeline as a csv file so it can be reused outside of the simulation.
+
+        Parameters:
+            path (str): Output file.
+            names (list): Optional component names in the order generators, lines, ESS.
+        """
+        df = pd.DataFrame(self.events)
+        if names is not None:
+            df.insert(2, "name", np.asarray(names)[self.events["component"]])
+        df.to_csv(path, index=False)
@@ -1,29 +1,77 @@
 # import python modules
 import logging
 from pyomo.environ import *
+from pyomo.core.expr.numeric_expr import LinearExpression
 import numpy as np
 import pandas as pd
 import calendar
 import os
 from datetime import datetime
 import glob
-import random
 
-#np.random.seed(42)  
+from progress.mod_variance import StratifiedStream
 
 logger = logging.getLogger(__name__)
 
+def _var_array(var, rows, cols):
+    '''Values of a Pyomo variable indexed by range(rows) x range(cols), read in one pass into a (rows, cols) array.'''
+    return(np.fromiter(var.extract_values().values(), dtype = float, count = rows*cols).reshape(rows, cols))
+
+def _zone_sum(nz, zone_no, values):
+    '''Sums site values into zones 1..nz; sites with a zone number outside 1..nz are ignored, as in ZoneMatrix.'''
+    zone_no = np.asarray(zone_no).astype(int)
+    valid = (zone_no >= 1) & (zone_no <= nz)
+    return(np.bincount(zone_no[valid] - 1, weights = np.asarray(values)[valid], minlength = nz))
+
 class RAUtilities:
     '''
     This class contains the different methods required for performing mixed time sequential Monte Carlo simulation and evaluate the reliability indices of a power system.
     '''
-    def __init__(self, dispatch_solver='glpk'):
+    def __init__(self, dispatch_solver='glpk', sparse_assembly=False, rng=None, variance_reduction=None, block_size=2):
         """
         Initializes the RAUtilities class.
+
+        Parameters:
+            dispatch_solver (str): Pyomo solver used for the dispatch optimization.
+            sparse_assembly (bool): Build the multi-period power balance from the nonzeros of the system matrices only.
+            rng (numpy.random.Generator): Random number generator of all samplers until SeedSample is called. A new unseeded generator is used if None.
+            variance_reduction (str): Sampling design of SeedSample across samples: None, 'antithetic' or 'lhs'.
+            block_size (int): Samples per Latin hypercube design with 'lhs'.
         """
         self.dispatch_solver = dispatch_solver
+        self.sparse_assembly = sparse_assembly
+        self.rng = rng if rng is not None else np.random.default_rng() # component states
+        self.wind_rng = self.solar_rng = self.load_rng = self.rng
+        self.variance_reduction = variance_reduction
+        self.block_size = 2 if variance_reduction == 'antithetic' else block_size
+        self._rates = None # scratch buffers of NextState
+        self._times = None
         logger.info(f"Dispatch solver: {self.dispatch_solver}")
 
+    def SeedSample(self, seed, s):
+        """
+        Seeds the random streams of a sample. The run seed spawns one seed sequence per sample, and each sample
+        sequence spawns one stream per component family: component states (self.rng), wind speed classes
+        (self.wind_rng), solar cluster/day picks (self.solar_rng) and data center load profiles (self.load_rng).
+        A sample can therefore be replayed alone from the run seed and the sample index.
+
+        With a variance reduction design, the samples s = b*block_size ... (b+1)*block_size - 1 form block b, and
+        each stream is a StratifiedStream that also draws from a stream of the block, spawned from the run seed
+        separately from the sample streams.
+
+        Parameters:
+            seed (int): Run seed.
+            s (int): Sample index in the run.
+        """
+        sample_seq = np.random.SeedSequence(seed, spawn_key = (s,))
+        streams = [np.random.default_rng(seq) for seq in sample_seq.spawn(4)]
+        if self.variance_reduction is not None:
+            block, position = divmod(s, self.block_size)
+            block_seq = np.random.SeedSequence([seed, 2], spawn_key = (block,))
+            streams = [StratifiedStream(self.variance_reduction, position, self.block_size, np.random.default_rng(seq), stream) \
+                       for seq, stream in zip(block_seq.spawn(4), streams)]
+        self.rng, self.wind_rng, self.solar_rng, self.load_rng = streams
+
     def reltrates(self, MTTF_gen, MTTF_trans, MTTR_gen, MTTR_trans, MTTF_ess, MTTR_ess):
         """
         Calculates failure and repair rates for all conventional generators and transmission lines.
@@ -89,52 +137,40 @@ class RAUtilities:
         """
         self.t_min = t_min
         if self.t_min <= 0:
-            self.U = np.random.uniform(0, 1, ng + nl) # this should be for gt only
-            self.time_gt = np.zeros(ng + nl)
-            for u in range(ng + nl):
-                if current_state[u] == 1:
-                    self.time_gt[u] = -np.log(self.U[u])/lambda_tot[u]
-                else:
-                    self.time_gt[u] = -np.log(self.U[u])/mu_tot[u]
-
-            # calculate time for ess states here (for all ess): 2 numbers for each ess, choose minimum
-            self.V_fail = np.random.uniform(0, 1, ness)
-            self.V_repair = np.random.uniform(0, 1, ness)
-            self.time_ess_fail = np.zeros(ness)
-            self.time_ess_repair = np.ones(ness)*1e7
-            for v in range(ness):
-                self.time_ess_fail[v] = -np.log(self.V_fail[v])/lambda_tot[ng + nl + v]
-                if current_state[ng + nl + v] < 1:
-                    self.time_ess_repair[v] = -np.log(self.V_repair[v])/mu_tot[ng + nl + v]
-
-            self.time_ess = np.vstack((self.time_ess_fail, self.time_ess_repair))
-            self.t_min_ess = self.time_ess.min()
-            self.t_min_ess_index = np.unravel_index(np.argmin(self.time_ess), self.time_ess.shape)
-
-            # augment with t_min of gt
-            self.time_all = np.append(self.time_gt, self.t_min_ess)
-            self.t_min = min(self.time_all) # calculate shortest time; the component with the shortest time will fail first
-            self.index_min = np.argmin(self.time_all) # component with the shortest time
-
-            self.temp_ess_ind = self.time_all.size - 1
+            n_gt = ng + nl
+            n_all = n_gt + 2*ness
+            if self._times is None or self._times.size != n_all:
+                # scratch buffers reused across calls: [gens and TLs, ESS failures, ESS repairs]
+                self._rates = np.empty(n_all)
+                self._times = np.empty(n_all)
+
+            # failure rate for components in the up state, repair rate otherwise
+            np.copyto(self._rates[0:n_gt], np.where(current_state[0:n_gt] == 1, lambda_tot[0:n_gt], mu_tot[0:n_gt]))
+            self._rates[n_gt:n_gt + ness] = lambda_tot[n_gt::]
+            self._rates[n_gt + ness::] = mu_tot[n_gt::]
+
+            # one exponential draw for all components, time = E/rate
+            self.rng.standard_exponential(out = self._times)
+            np.divide(self._times, self._rates, out = self._times)
+            # an ESS can only be repaired if at least one of its units is out
+            self._times[n_gt + ness::] = np.where(current_state[n_gt::] < 1, self._times[n_gt + ness::], 1e7)
+
+            self.index_min = np.argmin(self._times) # component with the shortest time will fail/be repaired first
+            self.t_min = self._times[self.index_min]
 
         self.t_min -= 1
 
         # change component states based on time to next event
-        if self.t_min <= 0 and self.index_min != self.temp_ess_ind: # if failure/repair is for gen/TLs
-            if current_state[self.index_min] == 1:
-                current_state[self.index_min] = 0
-            elif current_state[self.index_min] == 0:
-                current_state[self.index_min] = 1
-        elif self.t_min <= 0 and self.index_min == self.temp_ess_ind: # if failure/repair is for ESS
-            if self.t_min_ess_index[0] == 0: # if ESS failure
-                self.ess_failed = self.t_min_ess_index[1]
-                if current_state[ng + nl + self.ess_failed] >= 1/ess_units[self.ess_failed]:
-                    current_state[ng + nl + self.ess_failed] = current_state[ng + nl + self.ess_failed] - 1/ess_units[self.ess_failed]
-            else: # if ESS repair
-                 self.ess_repaired = self.t_min_ess_index[1]
-                 if current_state[ng + nl + self.ess_repaired] < 1:
-                    current_state[ng + nl + self.ess_repaired] = current_state[ng + nl + self.ess_repaired] + 1/ess_units[self.ess_repaired]
+        if self.t_min <= 0 and self.index_min < ng + nl: # if failure/repair is for gen/TLs
+            current_state[self.index_min] = 1 - current_state[self.index_min]
+        elif self.t_min <= 0 and self.index_min < ng + nl + ness: # if ESS failure
+            self.ess_failed = self.index_min - (ng + nl)
+            if current_state[ng + nl + self.ess_failed] >= 1/ess_units[self.ess_failed]:
+                current_state[ng + nl + self.ess_failed] = current_state[ng + nl + self.ess_failed] - 1/ess_units[self.ess_failed]
+        elif self.t_min <= 0: # if ESS repair
+            self.ess_repaired = self.index_min - (ng + nl + ness)
+            if current_state[ng + nl + self.ess_repaired] < 1:
+                current_state[ng + nl + self.ess_repaired] = current_state[ng + nl + self.ess_repaired] + 1/ess_units[self.ess_repaired]
 
         current_cap = {"max": np.multiply(current_state, cap_max), "min": np.multiply(current_state, cap_min)} # calculate current capacity of all components
         return(current_state, current_cap, self.t_min)
@@ -165,7 +201,24 @@ class RAUtilities:
         return(self.ess_smax, self.ess_smin, SOC_old)
 
 
-    def WindPower(self, nz, w_sites, zone_no, w_classes, r_cap, current_w_class, tr_mats, p_class, w_turbines, out_curve2, out_curve3):
+    def WindClassPower(self, p_class, w_turbines, r_cap, out_curve2, out_curve3):
+        """
+        Tabulates the power of every wind site in every wind speed class, used by WindPower.
+
+        Parameters:
+            p_class (array): Power classes.
+            w_turbines (array): Number of wind turbines.
+            r_cap (array): Rated capacities of wind turbines.
+            out_curve2 (array): Output curve for class 2 turbines.
+            out_curve3 (array): Output curve for class 3 turbines.
+
+        Returns:
+            numpy.ndarray: Wind power of every site in every wind speed class (w_sites x w_classes).
+        """
+        curves = np.where(np.asarray(p_class)[:, None] == 2, np.asarray(out_curve2)[None, :], np.asarray(out_curve3)[None, :])
+        return(curves*(np.asarray(w_turbines)*np.asarray(r_cap))[:, None])
+
+    def WindPower(self, nz, w_sites, zone_no, w_classes, r_cap, current_w_class, tr_mats, p_class, w_turbines, out_curve2, out_curve3, class_power=None):
         """
         Calculates the wind power generation for each hour at each site.
 
@@ -176,52 +229,95 @@ class RAUtilities:
             w_classes (int): Number of wind speed classes.
             r_cap (array): Rated capacities of wind turbines.
             current_w_class (array): Current wind speed classes.
-            tr_mats (array): Transition matrices.
+            tr_mats (array): Transition matrices, with zero rates replaced by a very low value when they are loaded.
             p_class (array): Power classes.
             w_turbines (array): Number of wind turbines.
             out_curve2 (array): Output curve for class 2 turbines.
             out_curve3 (array): Output curve for class 3 turbines.
+            class_power (array): Power of every site in every class from WindClassPower; computed here if None.
 
         Returns:
             tuple: Wind power generation at each zone and updated wind speed classes.
         """
 
         # generate random numbers for each class in each site
-        self.W = np.random.uniform(0, 1, (w_sites, w_classes))
-
-        # change zeroes in tr_mats to very low values
-        tr_mats[tr_mats == 0] = 1e-10
-
-        # calculate minimum time to next state for each site
-        self.time_wind = np.zeros((w_sites, w_classes))
-        for w in range(w_sites):
-            for c in range(w_classes):
-                if current_w_class[w] == c:
-                    self.time_wind[w, :] = -np.log(self.W[w, :])/tr_mats[w, c, :]
-                    break
-
-        temp = np.matrix(self.time_wind)
-        tmin_wind = temp.argmin(1)
-        current_w_class = tmin_wind # change wind speed class depending on minimum time calculation
-
-        # calculate wind power generation at each site
-        self.w_power = np.zeros(w_sites)
-        for w in range(w_sites):
-            if p_class[w] == 2:
-                self.w_power[w] = out_curve2[tmin_wind[w]]*w_turbines[w]*r_cap[w]
-            else:
-                self.w_power[w] = out_curve3[tmin_wind[w]]*w_turbines[w]*r_cap[w]
-
-        # aggregate wind power generation from different sites at each zone
-        self.w_zones = np.zeros(nz)
-
-        for b in range(nz):
-            for z in range(len(zone_no)):
-                if b == zone_no[z] - 1:
-                    self.w_zones[b] += self.w_power[z]
+        self.W = self.wind_rng.uniform(0, 1, (w_sites, w_classes))
+        if class_power is None:
+            class_power = self.WindClassPower(p_class, w_turbines, r_cap, out_curve2, out_curve3)
+
+        # time to the next state of each site from the transition rates out of its current class
+        sites = np.arange(w_sites)
+        with np.errstate(divide = 'ignore'):
+            self.time_wind = -np.log(self.W)/tr_mats[sites, np.asarray(current_w_class).ravel()]
+        current_w_class = np.argmin(self.time_wind, axis = 1) # change wind speed class depending on minimum time calculation
+
+        # calculate wind power generation at each site and aggregate it at each zone
+        self.w_power = class_power[sites, current_w_class]
+        self.w_zones = _zone_sum(nz, zone_no, self.w_power)
 
         return(self.w_zones, current_w_class)
 
+    def WindClassCDF(self, tr_mats):
+        """
+        Tabulates the distribution of the next wind speed class of every site and current class, for
+        WindClassTrajectory. Racing the exponential clocks of a transition row, as in WindPower, picks class j with
+        probability rate_j/sum(rates), so the next class can be drawn from the normalized cumulative row instead.
+        The rows are stored one after the other, shifted by 2 per row, so that one searchsorted call finds the next
+        class of all sites.
+
+        Parameters:
+            tr_mats (array): Transition matrices (w_sites x w_classes x w_classes) without zero rates.
+
+        Returns:
+            numpy.ndarray: Shifted cumulative transition rows, flattened (w_sites*w_classes*w_classes,).
+        """
+        cdf = np.cumsum(tr_mats, axis = 2)
+        cdf = cdf/cdf[:, :, -1:]
+        rows = np.arange(cdf.shape[0]*cdf.shape[1]).reshape(cdf.shape[0:2])
+        return((cdf + 2*rows[:, :, None]).ravel())
+
+    def WindClassTrajectory(self, tr_cdf, current_w_class, hours):
+        """
+        Generates the wind speed classes of all sites for all hours of a sample with one batch of uniform draws.
+
+        Parameters:
+            tr_cdf (array): Shifted cumulative transition rows from WindClassCDF.
+            current_w_class (array): Wind speed classes of the sites before the first hour.
+            hours (int): Number of hours.
+
+        Returns:
+            numpy.ndarray: Wind speed classes (hours x w_sites), int8.
+        """
+        w_sites = np.size(current_w_class)
+        w_classes = int(round(np.sqrt(tr_cdf.size/w_sites)))
+        site_rows = np.arange(w_sites)*w_classes
+        U = self.wind_rng.uniform(0, 1, (hours, w_sites))
+        w_class = np.asarray(current_w_class).ravel()
+        trajectory = np.empty((hours, w_sites), dtype = np.int8)
+        for h in range(hours):
+            rows = site_rows + w_class
+            w_class = np.searchsorted(tr_cdf, U[h] + 2*rows, side = 'right') - rows*w_classes
+            np.minimum(w_class, w_classes - 1, out = w_class)
+            trajectory[h] = w_class
+        return(trajectory)
+
+    def WindTrajectoryPower(self, nz, zone_no, w_class, class_power):
+        """
+        Calculates the wind power generation of an hour from the wind speed classes of the sites in that hour.
+
+        Parameters:
+            nz (int): Number of zones.
+            zone_no (array): Zone numbers.
+            w_class (array): Wind speed classes of the sites, e.g. a row of WindClassTrajectory.
+            class_power (array): Power of every site in every class from WindClassPower.
+
+        Returns:
+            numpy.ndarray: Wind power generation at each zone.
+        """
+        self.w_power = class_power[np.arange(w_class.size), w_class]
+        self.w_zones = _zone_sum(nz, zone_no, self.w_power)
+        return(self.w_zones)
+
     def InitializeWindClasses(self, w_sites, w_classes):
         """
         Initializes the wind speed classes for each site.
@@ -232,12 +328,48 @@ class RAUtilities:
         Returns:
             numpy.ndarray: Initial wind speed classes for each site.
         """
-        current_w_class = np.floor(np.random.uniform(0, 1, w_sites)*w_classes).astype(int)
+        current_w_class = np.floor(self.wind_rng.uniform(0, 1, w_sites)*w_classes).astype(int)
         return current_w_class
     
-    def SolarPower(self, n, nz, s_zone_no, solar_prob, s_profiles, s_sites, s_max, return_site_gen = False):
+    def SolarClusterCDF(self, solar_prob):
+        """
+        Tabulates the distribution of the solar cluster picked for a day in every month, used by SolarPower and
+        SolarYear. The clusters of a month are sorted by probability and the cumulative probabilities are normalized,
+        so that a uniform draw u picks the first sorted cluster whose cumulative probability exceeds u.
+
+        Parameters:
+            solar_prob (array): Probability of every cluster in every month (clusters x months).
+
+        Returns:
+            tuple: Sorted cluster indices and their cumulative probabilities, both (months x clusters).
+        """
+        probs = np.asarray(solar_prob, dtype = float).T
+        order = np.argsort(probs, axis = 1, kind = 'stable')
+        cdf = np.cumsum(np.take_along_axis(probs, order, axis = 1), axis = 1)
+        cdf = np.divide(cdf, cdf[:, -1:], out = np.zeros_like(cdf), where = cdf[:, -1:] > 0)
+        return(order, cdf)
+
+    def ZoneMatrix(self, nz, zone_no):
+        """
+        Builds the matrix that aggregates site outputs into zones.
+
+        Parameters:
+            nz (int): Number of zones.
+            zone_no (array): Zone number of every site.
+
+        Returns:
+            numpy.ndarray: Zone aggregation matrix (nz x sites).
+        """
+        zone_no = np.asarray(zone_no).astype(int)
+        zone_mat = np.zeros((nz, zone_no.size))
+        valid = (zone_no >= 1) & (zone_no <= nz)
+        zone_mat[zone_no[valid] - 1, np.nonzero(valid)[0]] = 1
+        return(zone_mat)
+
+    def SolarPower(self, n, nz, s_zone_no, solar_prob, s_profiles, s_sites, s_max, return_site_gen = False, cluster_cdf = None, zone_mat = None):
         """
-        Calculates solar power generation for each hour at each site.
+        Calculates solar power generation for each hour at each site. A cluster and a day of that cluster are drawn
+        at the first hour of every day.
 
         Parameters:
             n (int): Current hour.
@@ -247,50 +379,84 @@ class RAUtilities:
             s_profiles (array): Solar profiles.
             s_sites (int): Number of solar sites.
             s_max (array): Maximum capacities of solar sites.
-            reutn_site_gen (bool): If True, return site-wise solar generation
+            return_site_gen (bool): If True, return site-wise solar generation
+            cluster_cdf (tuple): Cluster distribution from SolarClusterCDF; computed here if None.
+            zone_mat (array): Zone aggregation matrix from ZoneMatrix; computed here if None.
         Returns:
             numpy.ndarray: Solar power generation at each zone.
         """
 
         if n%24 == 0:
+            if cluster_cdf is None:
+                cluster_cdf = self.SolarClusterCDF(solar_prob)
+            if zone_mat is None:
+                zone_mat = self.ZoneMatrix(nz, s_zone_no)
+            order, cdf = cluster_cdf
 
             self.month = np.floor(n/731).astype(int) # which month are we in?
-            self.prob_col = solar_prob[:, self.month]
-            self.prob_index = np.array(list(zip(self.prob_col, range(len(self.prob_col))))) # create a tuple with the each element and its index
-            self.sorted_prob = self.prob_index[self.prob_index[:, 0].argsort()] # sort the tuples
-            self.sorted_prob[:, 0] = np.cumsum(self.sorted_prob[:, 0])
-            self.rand_clust = np.random.uniform(0, 1)
-
-            for i in range(len(self.sorted_prob)):
-                if i == 0 and self.rand_clust < self.sorted_prob[i, 0]:
-                    self.clust = int(self.sorted_prob[i, 1])
-                    break
-                elif i > 0 and self.sorted_prob[i - 1, 0] < self.rand_clust < self.sorted_prob[i, 0]:
-                    self.clust = int(self.sorted_prob[i, 1])
-                    break
-
-            self.solar_dim = s_profiles[self.clust].shape
-            self.days = self.solar_dim[0]
-
+            self.rand_clust = self.solar_rng.uniform(0, 1)
+            pos = min(np.searchsorted(cdf[self.month], self.rand_clust, side = 'right'), cdf.shape[1] - 1)
+            self.clust = int(order[self.month, pos])
 
-            self.rand_day = np.floor(np.random.uniform(0, 1)*self.days).astype(int)
-            sgen_sites = np.zeros((s_sites, 24))
+            self.days = s_profiles[self.clust].shape[0]
+            self.rand_day = np.floor(self.solar_rng.uniform(0, 1)*self.days).astype(int)
+            self.sgen_sites = (s_profiles[self.clust][self.rand_day]*np.asarray(s_max, dtype = float)).T # sites x 24
+            self.s_zones = zone_mat@self.sgen_sites
 
-            for sg in range(s_sites):
-
-                sgen_sites[sg] = s_profiles[self.clust][self.rand_day, :, sg]*s_max[sg]
+        if return_site_gen == True:
+            return(np.transpose(self.s_zones), self.sgen_sites)
+        else:
+            return(np.transpose(self.s_zones))
 
-            self.s_zones = np.zeros((nz, 24))
+    def SolarYear(self, hours, nz, s_zone_no, solar_prob, s_profiles, s_max, return_site_gen = False, cluster_cdf = None, zone_mat = None):
+        """
+        Calculates the solar power generation of all hours of a sample at once. The cluster and day draws are the
+        same as those of SolarPower called hour by hour, so both give the same profiles from the same stream.
 
-            for b in range(nz):
-                for z in range(len(s_zone_no)):
-                    if b == s_zone_no[z] - 1:
-                        self.s_zones[b] += sgen_sites[z]
+        Parameters:
+            hours (int): Number of hours, e.g. 8760.
+            nz (int): Number of zones.
+            s_zone_no (array): Zone numbers for solar sites.
+            solar_prob (array): Solar probability data.
+            s_profiles (array): Solar profiles.
+            s_max (array): Maximum capacities of solar sites.
+            return_site_gen (bool): If True, also return site-wise solar generation (whole days x sites).
+            cluster_cdf (tuple): Cluster distribution from SolarClusterCDF; computed here if None.
+            zone_mat (array): Zone aggregation matrix from ZoneMatrix; computed here if None.
+        Returns:
+            numpy.ndarray: Solar power generation at each zone for the whole days covering the hours (24*ceil(hours/24) x nz).
+        """
+        if cluster_cdf is None:
+            cluster_cdf = self.SolarClusterCDF(solar_prob)
+        if zone_mat is None:
+            zone_mat = self.ZoneMatrix(nz, s_zone_no)
+        order, cdf = cluster_cdf
+
+        # cluster and day draws of every day, in the order of SolarPower
+        days = -(-hours//24)
+        U = self.solar_rng.uniform(0, 1, (days, 2))
+        months = np.floor(24*np.arange(days)/731).astype(int)
+        pos = np.minimum((cdf[months] <= U[:, [0]]).sum(axis = 1), cdf.shape[1] - 1)
+        clusters = order[months, pos]
+
+        # site capacities are folded into the zone matrix unless the site outputs are needed
+        s_max = np.asarray(s_max, dtype = float)
+        site_to_zone = (zone_mat*s_max).T
+        s_zones = np.zeros((days, 24, nz))
+        site_gen = np.zeros((days, 24, np.size(s_max))) if return_site_gen else None
+        for c in np.unique(clusters):
+            picked = clusters == c
+            profiles = s_profiles[c][np.floor(U[picked, 1]*s_profiles[c].shape[0]).astype(int)]
+            s_zones[picked] = profiles@site_to_zone
+            if return_site_gen:
+                site_gen[picked] = profiles*s_max
+        # whole days are kept, as SolarPower always gives the 24 hours of a day
+        s_zones = s_zones.reshape(days*24, nz)
 
         if return_site_gen == True:
-            return(np.transpose(self.s_zones), sgen_sites)
+            return(s_zones, site_gen.reshape(days*24, -1))
         else:
-            return(np.transpose(self.s_zones))
+            return(s_zones)
 
     def data_center_load(self, load_df, system_directory, network_model):
         # input folder
@@ -299,10 +465,10 @@ class RAUtilities:
         else:
             DC_folder = system_directory + '/data_center_load'
 
-        DC_profiles = glob.glob(os.path.join(DC_folder, "profile_*.csv"))
+        DC_profiles = sorted(glob.glob(os.path.join(DC_folder, "profile_*.csv")))
 
         # choose a profile randomly
-        chosen_profile = random.choice(DC_profiles)
+        chosen_profile = DC_profiles[self.load_rng.integers(len(DC_profiles))]
         chosen_profile_df = pd.read_csv(chosen_profile)
 
         # identify the load columns
@@ -512,7 +678,23 @@ class RAUtilities:
         LOL_cost = 100000000 # cost of lost load (set to very high so that system always tries to minimize loss)
 
         # power balance constraint
-        if copper_sheet == False:
+        if copper_sheet == False and self.sparse_assembly == True:
+            # only the nonzero entries of each bus row are emitted as linear terms
+            flow_nz = [np.nonzero(A_inc_t[i, :])[0] for i in range(nz)]
+            gen_nz = [np.nonzero(gen_mat[i, :])[0] for i in range(nz)]
+            ch_nz = [np.nonzero(ch_mat[i, :])[0] for i in range(nz)]
+            curt_nz = [np.nonzero(curt_mat[i, :])[0] for i in range(nz)]
+            row_coefs = [np.concatenate((A_inc_t[i, flow_nz[i]], gen_mat[i, gen_nz[i]], ch_mat[i, ch_nz[i]], curt_mat[i, curt_nz[i]], [-1.0])).tolist() \
+                         for i in range(nz)]
+
+            def con_rule1(model,i,t):
+                row_vars = [model.flow[j,t] for j in flow_nz[i]] + [model.Pg[m,t] for m in gen_nz[i]] + [model.Pc[m,t] for m in ch_nz[i]] \
+                         + [model.curt[c,t] for c in curt_nz[i]] + [model.ren_curt[i,t]]
+                return(LinearExpression(constant = 0, linear_coefs = row_coefs[i], linear_vars = row_vars) == net_load[i,t]/BMva)
+
+            model.equality = Constraint(range(nz), T, rule = con_rule1)
+
+        elif copper_sheet == False:
             def con_rule1(model,i,t):
                 return(sum(A_inc_t[i, j]*model.flow[j,t] for j in range(nl))\
                         + sum(gen_mat[i,m]*model.Pg[m,t] for m in range(ng + ness)) \
@@ -561,38 +743,314 @@ class RAUtilities:
         opt = SolverFactory(self.dispatch_solver)
         res = opt.solve(model, tee = False)
         
-        load_curt = np.zeros(len(T))
-        for t in T:
-            current_curtail = 0
-            for z in range(nz):
-                current_curtail += model.curt[z, t].value
-            load_curt[t] = current_curtail
-        soc_profile = np.zeros((ness, len(T)))
-        p_discharge = np.zeros((ness, len(T)))
-        p_charge = np.zeros((ness, len(T)))
-        p_g = np.zeros((ng, len(T)))
-        flow = np.zeros((nl, len(T)))
-        curtbus = np.zeros((nz, len(T)))
-        
-        for t in T:
-            for i in range(ness):
-                soc_profile[i, t] = model.SOC[i, t].value
-                p_discharge[i, t] = model.Pg[ng + i, t].value
-                p_charge[i, t] = model.Pc[i, t].value
-            if np.any(load_curt):
-                for j in range(ng):
-                    p_g[j, t] = model.Pg[j, t].value
-                for k in range(nl):
-                    flow[k, t] = model.flow[k, t].value
-                for l in range(nz):
-                    curtbus[l, t] = model.curt[l, t].value
+        # the solution is read one variable component at a time; the generation, flow and curtailment details are
+        # only needed when load is curtailed
+        curt = _var_array(model.curt, nz, time_period)
+        load_curt = np.sum(curt, axis = 0)
+        soc_profile = _var_array(model.SOC, ness, time_period)
+        Pg = _var_array(model.Pg, ng + ness, time_period)
+        p_discharge = Pg[ng::]
+        p_charge = _var_array(model.Pc, ness, time_period)
+        if np.any(load_curt):
+            p_g = Pg[0:ng]
+            flow = _var_array(model.flow, nl, time_period)
+            curtbus = curt
+        else:
+            p_g = np.zeros((ng, time_period))
+            flow = np.zeros((nl, time_period))
+            curtbus = np.zeros((nz, time_period))
 
-        
         return load_curt, soc_profile, p_discharge, p_charge, p_g, flow, curtbus
 
+    def AdequacyScreen(self, ng, nl, ness, BMva, current_cap, net_load, SOC_old, ess_smax, ess_smin, gen_mat, ch_mat, \
+                       ess_eff, disch_cost, ch_cost, copper_sheet):
+        """
+        Fast screening in front of OptDispatch. If the available generation plus ESS discharge in every area
+        covers the net load of that area, there is no load curtailment and the dispatch LP does not need to be
+        solved. The whole system is one area in the copper sheet model (no lines can bind); in the Zonal/Nodal
+        models every zone has to be self-sufficient with zero line flows, which is sufficient but not necessary.
+        In a screened hour the ESS follow a greedy rule: any deficit is covered by discharging the cheapest ESS
+        first, and ESS with a positive charge incentive charge from the remaining surplus.
+
+        Parameters:
+            ng (int): Number of generators.
+            nl (int): Number of lines.
+            ness (int): Number of energy storage systems.
+            BMva (float): Base power in MVA.
+            current_cap (dict): Current capacities of components.
+            net_load (array): Net load.
+            SOC_old (array): Previous state of charge.
+            ess_smax (array): Maximum allowable SOC (as energy).
+            ess_smin (array): Minimum allowable SOC (as energy).
+            gen_mat (array): Generation matrix.
+            ch_mat (array): Charging matrix.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+            copper_sheet (bool): Use copper sheet model or not.
+
+        Returns:
+            tuple: Same outputs as OptDispatch if the hour is adequate, None if the dispatch has to be solved.
+        """
+        screened, SOC_new, P_dis, P_ch = self.AdequacyScreenBatch(ng, nl, BMva, current_cap["max"][None, :], net_load[None, :], SOC_old[None, :], \
+                                                                  ess_smax[None, :], ess_smin[None, :], gen_mat, ch_mat, ess_eff, disch_cost, \
+                                                                  ch_cost, copper_sheet)
+        if not screened[0]:
+            return(None)
+
+        return(0, SOC_new[0], P_dis[0], P_ch[0], 0, 0, 0)
+
+    def AdequacyScreenBatch(self, ng, nl, BMva, cap_max, net_load, SOC_old, ess_smax, ess_smin, gen_mat, ch_mat, \
+                            ess_eff, disch_cost, ch_cost, copper_sheet):
+        """
+        Capacity margin check and greedy ESS rule of AdequacyScreen, vectorized across samples. The first axis
+        of all hour-dependent arrays is the sample.
+
+        Parameters:
+            ng (int): Number of generators.
+            nl (int): Number of lines.
+            BMva (float): Base power in MVA.
+            cap_max (array): Current maximum capacities of components (samples x components).
+            net_load (array): Net load (samples x zones).
+            SOC_old (array): Previous state of charge (samples x ESS).
+            ess_smax (array): Maximum allowable SOC as energy (samples x ESS).
+            ess_smin (array): Minimum allowable SOC as energy (samples x ESS).
+            gen_mat (array): Generation matrix.
+            ch_mat (array): Charging matrix.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+            copper_sheet (bool): Use copper sheet model or not.
+
+        Returns:
+            tuple: Screened samples (bool array), and SOC, discharge and charge of the greedy rule (samples x ESS).
+        """
+        tol = 1e-9
+        g_ub = cap_max[:, 0:ng]/BMva
+        ess_p = cap_max[:, ng + nl::]/BMva
+        smax = ess_smax/BMva
+        smin = ess_smin/BMva
+
+        if copper_sheet == True:
+            area_gen = np.sum(g_ub, axis = 1, keepdims = True)
+            area_load = np.sum(net_load, axis = 1, keepdims = True)/BMva
+            ess_area = np.zeros(ess_p.shape[1], dtype = int)
+        else:
+            area_gen = g_ub@gen_mat[:, 0:ng].T
+            area_load = net_load/BMva
+            ess_area = np.argmax(ch_mat, axis = 0)
+
+        # vectorized capacity margin check
+        dis_avail = np.clip(np.minimum(ess_p, SOC_old - smin), 0, None)
+        margin = area_gen - area_load
+        dis_area = np.zeros_like(margin)
+        np.add.at(dis_area, (slice(None), ess_area), dis_avail)
+        screened = np.all(margin + dis_area >= -tol, axis = 1) & np.all(SOC_old >= smin - tol, axis = 1) & np.all(SOC_old <= smax + tol, axis = 1)
+
+        # greedy ESS rule: cover deficits with the cheapest discharge, charge from the surplus otherwise
+        deficit = np.clip(-margin, 0, None)
+        surplus = np.clip(margin, 0, None)
+        P_dis = np.zeros_like(ess_p)
+        P_ch = np.zeros_like(ess_p)
+        for i in np.argsort(disch_cost):
+            P_dis[:, i] = np.minimum(dis_avail[:, i], deficit[:, ess_area[i]])
+            deficit[:, ess_area[i]] -= P_dis[:, i]
+        for i in np.argsort(-ch_cost):
+            if ch_cost[i] <= 0:
+                continue
+            charge = np.clip(np.minimum(np.minimum(ess_p[:, i], (smax[:, i] - SOC_old[:, i])/ess_eff[i]), surplus[:, ess_area[i]]), 0, None)
+            charge[P_dis[:, i] > 0] = 0
+            P_ch[:, i] = -charge
+            surplus[:, ess_area[i]] -= charge
+
+        SOC_new = SOC_old - ess_eff*P_ch - P_dis
+        return(screened, SOC_new, P_dis, P_ch)
+
+    def MeritOrderApplicable(self, gencost, ess_pmin, ess_eff, disch_cost, ch_cost):
+        """
+        Checks whether the single-period copper sheet LP of OptDispatch reduces to a merit order (MeritOrderDispatch).
+        This holds when no ESS can profit from charging and discharging at the same time (charge cost at most
+        efficiency times discharge cost), the ESS cannot discharge through the charge variable (zero minimum power),
+        and all costs are below the cost of lost load.
+
+        Parameters:
+            gencost (array): Generation costs.
+            ess_pmin (array): Minimum power outputs of energy storage systems.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+
+        Returns:
+            bool: True if MeritOrderDispatch gives the LP optimum.
+        """
+        LOL_cost = 10000000 # cost of lost load, as in OptDispatch
+        costs = np.concatenate((gencost, disch_cost, ch_cost))
+        return(bool(np.all(np.asarray(ess_pmin) == 0) and np.all((ess_eff > 0) & (ess_eff <= 1)) and \
+                    np.all(ch_cost <= ess_eff*disch_cost) and np.all(costs < LOL_cost)))
+
+    def MeritOrderDispatch(self, ng, nl, BMva, current_cap, net_load, SOC_old, ess_smax, ess_smin, gencost, ess_pmax, \
+                           ess_eff, disch_cost, ch_cost):
+        """
+        Single-period copper sheet dispatch without a solver (see MeritOrderDispatchBatch). Only valid if
+        MeritOrderApplicable holds for the system.
+
+        Parameters:
+            ng (int): Number of generators.
+            nl (int): Number of lines.
+            BMva (float): Base power in MVA.
+            current_cap (dict): Current capacities of components.
+            net_load (array): Net load.
+            SOC_old (array): Previous state of charge.
+            ess_smax (array): Maximum allowable SOC (as energy).
+            ess_smin (array): Minimum allowable SOC (as energy).
+            gencost (array): Generation costs.
+            ess_pmax (array): Maximum power outputs of energy storage systems.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+
+        Returns:
+            tuple: Same outputs as OptDispatch, or None if the SOC is outside its limits and the LP has to be solved.
+        """
+        solved, load_curt, SOC_new, P_dis, P_ch, Pg = self.MeritOrderDispatchBatch(ng, nl, BMva, current_cap["max"][None, :], net_load[None, :], \
+                                                                                  SOC_old[None, :], ess_smax[None, :], ess_smin[None, :], gencost, \
+                                                                                  ess_pmax, ess_eff, disch_cost, ch_cost)
+        if not solved[0]:
+            return(None)
+        if load_curt[0] > 0:
+            # any split of the curtailment among zones is optimal in the copper sheet LP; it follows the zonal net load here
+            zone_load = np.clip(net_load, 0, None)
+            curtbus = load_curt[0]*zone_load/np.sum(zone_load)
+            return(load_curt[0], SOC_new[0], P_dis[0], P_ch[0], Pg[0], np.zeros(nl), curtbus)
+        return(load_curt[0], SOC_new[0], P_dis[0], P_ch[0], 0, 0, 0)
+
+    def MeritOrderDispatchBatch(self, ng, nl, BMva, cap_max, net_load, SOC_old, ess_smax, ess_smin, gencost, ess_pmax, \
+                                ess_eff, disch_cost, ch_cost):
+        """
+        Single-period copper sheet dispatch as a merit order, vectorized across samples. The first axis of all
+        hour-dependent arrays is the sample.
+
+        The copper sheet LP has a single balance row, so its optimum loads the cheapest offers first until the net
+        load is covered. The offers are the generators at gencost, the ESS discharge at disch_cost, the reduction of
+        ESS charging at ch_cost (every ESS starts from its largest charge, and charging stops only when the offers
+        cheaper than its charge cost do not cover the load), and the load curtailment at the cost of lost load.
+        Under MeritOrderApplicable an ESS never charges and discharges at the same time, so its charge and
+        discharge limits follow from its power rating and SOC separately. Offers with negative costs are always
+        fully loaded, and an ESS without a charge incentive does not charge. Offers with equal costs are loaded in
+        the order generators, charge reduction, discharge, by index; the LP optimum is not unique in that case.
+
+        Parameters:
+            ng (int): Number of generators.
+            nl (int): Number of lines.
+            BMva (float): Base power in MVA.
+            cap_max (array): Current maximum capacities of components (samples x components).
+            net_load (array): Net load (samples x zones).
+            SOC_old (array): Previous state of charge (samples x ESS).
+            ess_smax (array): Maximum allowable SOC as energy (samples x ESS).
+            ess_smin (array): Minimum allowable SOC as energy (samples x ESS).
+            gencost (array): Generation costs.
+            ess_pmax (array): Maximum power outputs of energy storage systems.
+            ess_eff (array): Efficiencies of energy storage systems.
+            disch_cost (array): Discharge costs.
+            ch_cost (array): Charge costs.
+
+        Returns:
+            tuple: Solved samples (bool array; False if the SOC is outside its limits), load curtailment (samples),
+            and SOC, discharge, charge (samples x ESS) and generation (samples x generators).
+        """
+        tol = 1e-9
+        g_ub = cap_max[:, 0:ng]/BMva
+        ess_p = cap_max[:, ng + nl::]/BMva
+        smax = ess_smax/BMva
+        smin = ess_smin/BMva
+        solved = np.all(SOC_old >= smin - tol, axis = 1) & np.all(SOC_old <= smax + tol, axis = 1)
+
+        # charge and discharge limits from the power bounds, the charge/discharge constraint and the SOC limits
+        ch_cap = np.clip(np.minimum(np.minimum(ess_p, ess_pmax/BMva), (smax - SOC_old)/ess_eff), 0, None)
+        dis_cap = np.clip(np.minimum(np.minimum(ess_p, ess_pmax/BMva), SOC_old - smin), 0, None)
+
+        # offers: generators, charge reduction, discharge
+        costs = np.concatenate((gencost, ch_cost, disch_cost))
+        caps = np.concatenate((g_ub, ch_cap, dis_cap), axis = 1)
+        prefilled = np.concatenate((gencost < 0, ch_cost <= 0, disch_cost < 0))
+        order = np.argsort(costs, kind = 'stable')
+        order = order[~prefilled[order]]
+
+        loaded = np.zeros_like(caps)
+        loaded[:, prefilled] = caps[:, prefilled]
+        residual = np.sum(net_load, axis = 1)/BMva + np.sum(ch_cap, axis = 1) - np.sum(loaded, axis = 1)
+        cum_caps = np.cumsum(caps[:, order], axis = 1)
+        loaded[:, order] = np.clip(residual[:, None] - cum_caps + caps[:, order], 0, caps[:, order])
+        load_curt = np.clip(residual - np.sum(caps[:, order], axis = 1), 0, None)
+
+        Pg = loaded[:, 0:ng]
+        ness = ess_p.shape[1]
+        P_ch = loaded[:, ng:ng + ness] - ch_cap
+        P_dis = loaded[:, ng + ness:]
+        SOC_new = SOC_old - ess_eff*P_ch - P_dis
+        return(solved, load_curt, SOC_new, P_dis, P_ch, Pg)
+
+    def AdequacyScreenMP(self, ng, nl, nz, ness, BMva, holder_dict, SOC_old, ESS_initial_capacities, gen_mat, time_period, copper_sheet):
+        """
+        Fast screening in front of OptDispatchMP. The window is skipped when, in every hour and area, the available
+        generation covers the net load and the renewable curtailment limit can absorb any negative net load, so that
+        the dispatch with zero line flows has no load curtailment. In a screened window the ESS stay idle (charging
+        and discharging are both penalized in the multi-period objective) and the SOC only follows the capacity
+        changes of the ESS, exactly as in the SOC update constraint of OptDispatchMP.
+
+        Parameters:
+            ng (int): Number of generators.
+            nl (int): Number of lines.
+            nz (int): Number of zones.
+            ness (int): Number of energy storage systems.
+            BMva (float): Base power in MVA.
+            holder_dict (dict): Capacities, net loads, renewable limits and SOC limits of the window.
+            SOC_old (array): Previous state of charge.
+            ESS_initial_capacities (array): Maximum available power capacities at the start of optimizaiton.
+            gen_mat (array): Generation matrix.
+            time_period (int): Total optimization horizon (hours).
+            copper_sheet (bool): Use copper sheet model or not.
+
+        Returns:
+            tuple: Same outputs as OptDispatchMP if the window is adequate, None if the dispatch has to be solved.
+        """
+        tol = 1e-9
+        T = range(time_period)
+        cap_max = np.array([holder_dict["capacity"][t]["max"] for t in T]).T # components x time
+        g_ub = cap_max[0:ng, :]/BMva
+        ess_p = cap_max[ng + nl::, :]/BMva
+
+        if copper_sheet == True:
+            area_gen = np.sum(g_ub, axis = 0)
+            area_load = np.sum(holder_dict["net_load"], axis = 0)/BMva
+            area_ren = np.sum(holder_dict["ren_limit"], axis = 0)/BMva
+        else:
+            area_gen = gen_mat[:, 0:ng]@g_ub
+            area_load = holder_dict["net_load"]/BMva
+            area_ren = holder_dict["ren_limit"]/BMva
+
+        if np.any(area_gen < area_load - tol) or np.any(area_load + area_ren < -tol):
+            return(None)
+
+        # idle ESS, SOC only rescaled with the available ESS capacity
+        soc_profile = np.zeros((ness, time_period))
+        last_pmax = ESS_initial_capacities/BMva + 1e-5
+        soc = SOC_old
+        for t in T:
+            soc = soc*ess_p[:, t]/last_pmax
+            soc_profile[:, t] = soc
+            last_pmax = ess_p[:, t] + 1e-5
+
+        if np.any(soc_profile < holder_dict["ess_min"]/BMva - tol) or np.any(soc_profile > holder_dict["ess_max"]/BMva + tol):
+            return(None)
+
+        return(np.zeros(time_period), soc_profile, np.zeros((ness, time_period)), np.zeros((ness, time_period)), np.zeros((ng, time_period)), \
+               np.zeros((nl, time_period)), np.zeros((nz, time_period)))
+
     def TrackLOLStates(self, load_curt, BMva, var_s, LOL_track, s, n):
         """
-        Tracks the loss of load states.
+        Tracks the loss of load states. With importance sampling, the loss of load hours are recorded in LOL_track
+        with the likelihood-ratio weight of the sample (var_s["weight"]), so that averages over samples stay unbiased.
 
         Parameters:
             load_curt (float): Load curtailment.
@@ -609,7 +1067,7 @@ class RAUtilities:
             var_s["LLD"] += 1 # starts at 0 for each year, adds 1 whenever there is a loss of load hour
             var_s["curtailment"][n] = load_curt*BMva # starts at 0 for each year, tracks total load curtailed over a year
             var_s["label_LOLF"][n] = 1 # binary array, = 1 if load curtailed, 0 otherwise
-            LOL_track[s][n] = 1
+            LOL_track[s][n] = var_s.get("weight", 1)
         if n > 0 and var_s["label_LOLF"][n] == 1 and var_s["label_LOLF"][n-1] == 0:
             var_s["freq_LOLF"] += 1
         if (n+1)%24 == 0:
@@ -621,29 +1079,134 @@ class RAUtilities:
         return(var_s, LOL_track)
     
     def CheckConvergence(self, s, LOLP_rec, comm, rank, size, mLOLP_rec, COV_rec):
+        """
+        Updates the mean LOLP and its COV over the first s+1 samples of all processes. The running moments of the
+        processes are added with one Allreduce instead of gathering the LOLP of every sample on process 0.
+
+        Parameters:
+            s (int): Current sample.
+            LOLP_rec (array): LOLP of the samples of this process.
+            comm (MPI.Comm): MPI communicator.
+            rank (int): Rank of the current process.
+            size (int): Total number of processes.
+            mLOLP_rec (array): Mean LOLP after each sample.
+            COV_rec (array): COV of the LOLP after each sample.
 
-        self.LOLP_len = np.size(LOLP_rec)
+        Returns:
+            tuple: Updated mean LOLP and COV recorders.
+        """
+        n, total, total_sq = self.RunningMoments(LOLP_rec[0:s+1], comm)
+        mLOLP_rec[s] = total/n
+        var_LOLP = max(total_sq/n - mLOLP_rec[s]**2, 0)
+        COV_rec[s] = np.sqrt(var_LOLP)/mLOLP_rec[s]
 
-        self.sendbuf_LOLP = LOLP_rec
-        self.recvbuf_LOLP = None
+        return(mLOLP_rec, COV_rec)
 
-        if rank==0:
-            self.recvbuf_LOLP = np.empty([size, self.LOLP_len])
-        
-        comm.Gather(self.sendbuf_LOLP, self.recvbuf_LOLP, root=0)
+    def RunningMoments(self, values, comm=None):
+        """
+        Calculates the running moments of the sample values of an index. With an MPI communicator, the moments of
+        all processes are added with one Allreduce, so every process gets the moments of all samples.
 
-        if rank==0:
-            self.temp_mat = self.recvbuf_LOLP[:, 0:s+1]
-            mLOLP_rec[s] = np.mean(self.temp_mat)
-            var_LOLP = np.var(self.temp_mat)
-            COV_rec[s] = np.sqrt(var_LOLP)/mLOLP_rec[s]
+        Parameters:
+            values (array): Index values of the samples simulated so far.
+            comm (MPI.Comm): Optional MPI communicator.
 
-        return(mLOLP_rec, COV_rec)
+        Returns:
+            numpy.ndarray: Number of samples, sum and sum of squares of the values.
+        """
+        moments = np.array([np.size(values), np.sum(values), np.sum(np.square(values))], dtype = float)
+        if comm is not None:
+            total = np.empty(3)
+            comm.Allreduce(moments, total)
+            moments = total
+        return(moments)
+
+    def TargetCOVReached(self, moments, target_cov, min_samples):
+        """
+        Checks the convergence-driven stopping rule. The coefficient of variation of the Monte Carlo estimate of an
+        index, sqrt(Var/n)/mean, is compared with the target once at least min_samples samples are simulated. The
+        rule is never met while the mean is zero.
+
+        Parameters:
+            moments (array): Running moments from RunningMoments.
+            target_cov (float): Target coefficient of variation.
+            min_samples (int): Minimum number of samples.
+
+        Returns:
+            tuple: Coefficient of variation of the estimate and whether the simulation can stop.
+        """
+        n, total, total_sq = moments
+        mean = total/n
+        if mean <= 0:
+            return(np.inf, False)
+        cov = np.sqrt(max(total_sq/n - mean**2, 0)/n)/mean
+
+        return(cov, n >= min_samples and cov < target_cov)
+
+    def BlockMeans(self, values, samples):
+        """
+        Averages the sample values of an index over the complete blocks of a variance reduction design
+        (SeedSample). The block means are independent, so the variance of the estimate is computed from them.
+
+        Parameters:
+            values (array): Index values of the samples.
+            samples (array): Indices in the run of the samples.
+
+        Returns:
+            numpy.ndarray: Means of the blocks of which all samples are given.
+        """
+        blocks = np.asarray(samples)//self.block_size
+        counts = np.bincount(blocks)
+        sums = np.bincount(blocks, weights = values)
+        complete = counts == self.block_size
+        return(sums[complete]/self.block_size)
+
+    def VarianceReduction(self, indices_rec, samples):
+        """
+        Estimates the effective variance reduction of the sampling design for each index: the variance of the
+        mean estimated as if the samples were independent over the variance estimated from the block means.
+        Values above 1 mean that independent sampling would need that many times more samples for the same COV.
+
+        Parameters:
+            indices_rec (dict): Dictionary of indices to be recorded.
+            samples (array): Indices in the run of the recorded samples, in the order of indices_rec.
+
+        Returns:
+            dict: Variance reduction factor of each index (nan if it cannot be estimated).
+        """
+        reduction = {}
+        for index in ["LOLP", "EUE", "EPNS", "LOLF", "MDT", "LOLE"]:
+            values = indices_rec[f"{index}_rec"]
+            means = self.BlockMeans(values, samples)
+            var_block = np.var(means, ddof = 1)/means.size if means.size > 1 else np.nan
+            var_iid = np.var(values, ddof = 1)/values.size if values.size > 1 else np.nan
+            reduction[index] = var_iid/var_block if var_block > 0 else np.nan
+        return(reduction)
+
+    def TruncateIndexArrays(self, indices_rec, LOL_track, done):
+        """
+        Keeps only the samples that were simulated when the simulation stopped before the last sample.
+
+        Parameters:
+            indices_rec (dict): Dictionary of indices to be recorded.
+            LOL_track (array): Array to track loss of load.
+            done (list): Indices of the simulated samples, in the order they finished.
+
+        Returns:
+            tuple: Indices recorder and loss of load tracker of the simulated samples.
+        """
+        for key in ["LOLP_rec", "EUE_rec", "MDT_rec", "LOLF_rec", "EPNS_rec", "LOLE_rec", "weight_rec"]:
+            indices_rec[key] = indices_rec[key][done]
+        # running mean and COV are recorded in the order the samples finished
+        indices_rec["mLOLP_rec"] = indices_rec["mLOLP_rec"][0:len(done)]
+        indices_rec["COV_rec"] = indices_rec["COV_rec"][0:len(done)]
 
+        return(indices_rec, LOL_track[done])
 
     def UpdateIndexArrays(self, indices_rec, var_s, sim_hours, s):
         """
-        Stores the index values for all samples.
+        Stores the index values for all samples. With importance sampling, the values of a sample are multiplied by
+        its likelihood-ratio weight (var_s["weight"]), which is recorded in weight_rec.
 
         Parameters:
             indices_rec (dict): Dictionary of indices to be recorded.
@@ -654,15 +1217,17 @@ class RAUtilities:
         Returns:
             dict: Updated indices recorder.
         """
-        indices_rec["LOLP_rec"][s] = var_s["LLD"]/sim_hours
-        indices_rec["EUE_rec"][s] = sum(var_s["curtailment"])
+        weight = var_s.get("weight", 1)
+        indices_rec["LOLP_rec"][s] = weight*var_s["LLD"]/sim_hours
+        indices_rec["EUE_rec"][s] = weight*sum(var_s["curtailment"])
         if var_s["LLD"] > 0:
-            indices_rec["EPNS_rec"][s] = sum(var_s["curtailment"])/var_s["LLD"]
-        indices_rec["LOLF_rec"][s] = var_s["freq_LOLF"]
-        if  indices_rec["LOLF_rec"][s] > 0:
-           indices_rec["MDT_rec"][s] = var_s["LLD"]/indices_rec["LOLF_rec"][s]
-        indices_rec["LOLE_rec"][s] = var_s["LOL_days"]
-        indices_rec["LOLP_hr"] += var_s["label_LOLF"] # hourly LOLP
+            indices_rec["EPNS_rec"][s] = weight*sum(var_s["curtailment"])/var_s["LLD"]
+        indices_rec["LOLF_rec"][s] = weight*var_s["freq_LOLF"]
+        if  var_s["freq_LOLF"] > 0:
+           indices_rec["MDT_rec"][s] = weight*var_s["LLD"]/var_s["freq_LOLF"]
+        indices_rec["LOLE_rec"][s] = weight*var_s["LOL_days"]
+        indices_rec["LOLP_hr"] += weight*var_s["label_LOLF"] # hourly LOLP
+        indices_rec["weight_rec"][s] = weight
 
         return(indices_rec)
 
@@ -684,7 +1249,8 @@ class RAUtilities:
 
     def GetReliabilityIndices(self, indices_rec, sim_hours, samples):
         """
-        Calculates the reliability indices.
+        Calculates the reliability indices. The per-sample values are already weighted by UpdateIndexArrays, so
+        their plain means are unbiased estimates also with importance sampling.
 
         Parameters:
             indices_rec (dict): Dictionary of indices to be recorded.
@@ -0,0 +1,69 @@
+# import python modules
+import numpy as np
+
+# bounds of the uniform draws, so that the exponential draws of mirrored/stratified samples stay finite
+U_MIN = np.finfo(float).tiny
+U_MAX = 1 - np.finfo(float).epsneg
+
+class StratifiedStream:
+    '''
+    Random stream of one sample in a block of samples drawn with a variance reduction design. It provides the
+    numpy.random.Generator methods used by the samplers (random, uniform, integers, standard_exponential), all
+    derived from uniform draws:
+
+    - 'antithetic': blocks of 2 samples draw from the same block stream; the second sample uses 1 - u for every
+      uniform u of the first, so that e.g. long failure clocks in one sample are short ones in the other.
+    - 'lhs': every uniform of the block_size samples of a block is stratified (Latin hypercube design): the
+      sample at position j of the block draws u = (perm[j] + v)/block_size, with a random permutation perm of the
+      strata shared by the block and v drawn from the own stream of the sample.
+
+    Each draw is marginally uniform, so the estimates stay unbiased; the samples of a block are not independent
+    and the variance of the estimates has to be computed from the block means (RAUtilities.BlockMeans).
+    '''
+    def __init__(self, method, position, block_size, block_rng, sample_rng=None):
+        """
+        Initializes the stream.
+
+        Parameters:
+            method (str): 'antithetic' or 'lhs'.
+            position (int): Position of the sample in its block.
+            block_size (int): Number of samples of a block; 2 for antithetic pairs.
+            block_rng (numpy.random.Generator): Stream shared by the samples of the block.
+            sample_rng (numpy.random.Generator): Own stream of the sample, used by 'lhs'.
+        """
+        self.method = method
+        self.position = position
+        self.block_size = block_size
+        self.block_rng = block_rng
+        self.sample_rng = sample_rng
+
+    def random(self, size=None):
+        """Returns uniform draws in (0, 1)."""
+        if self.method == 'antithetic':
+            u = self.block_rng.random(size)
+            if self.position % 2 == 1:
+                u = 1 - u
+        else:
+            # strata of the draws: position of this sample in one random permutation per draw
+            n = 1 if size is None else int(np.prod(size))
+            strata = np.argsort(self.block_rng.random((n, self.block_size)), axis = 1)[:, self.position]
+            u = (strata + self.sample_rng.random(n))/self.block_size
+            u = u[0] if size is None else u.reshape(size)
+        return(np.clip(u, U_MIN, U_MAX))
+
+    def uniform(self, low=0.0, high=1.0, size=None):
+        """Returns uniform draws in (low, high)."""
+        return(low + (high - low)*self.random(size))
+
+    def integers(self, low, high=None, size=None):
+        """Returns integers drawn uniformly from [low, high), or from [0, low) if high is None."""
+        if high is None:
+            low, high = 0, low
+        return(low + np.floor(self.random(size)*(high - low)).astype(int))
+
+    def standard_exponential(self, size=None, out=None):
+        """Returns standard exponential draws, by inversion of uniform draws."""
+        if out is not None:
+            out[...] = -np.log(self.random(out.shape))
+            return(out)
+        return(-np.log(self.random(size)))
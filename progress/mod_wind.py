@@ -5,10 +5,10 @@ import os
 from rex import WindResource as WR
 import yaml
 from pathlib import Path
-import cdsapi
-import zipfile
+import hashlib
 import logging
 
+from progress.mod_download import DownloadManager
 from progress.utils.data_validator import validate_file_columns, WIND_SCHEMAS
 
 logger = logging.getLogger(__name__)
@@ -21,6 +21,15 @@ def _validate_csv(filepath: str, fname: str) -> None:
         if errors:
             raise ValueError(f"Invalid {fname}: " + "; ".join(errors))
 
+def _files_digest(paths):
+    """SHA-1 digest of the contents of the files, used as the key of the transition rate cache."""
+    sig = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sig.update(chunk)
+    return(sig.hexdigest())
+
 class Wind:
 
     '''This class contains the methods required for downloading and processing wind data.'''
@@ -38,61 +47,22 @@ class Wind:
         self.sites_df = pd.read_csv(self.wind_site_data)
         _validate_csv(self.wind_site_data, "wind_sites.csv")
 
-    def DownloadWindData(self, start_year, end_year):
-
-        # --- DATA DESCRIPTION FOR ERA5 ---
-        dataset = "reanalysis-era5-single-levels-timeseries"
-        base_request = {
-            "variable": [
-                "100m_u_component_of_wind",
-                "100m_v_component_of_wind",
-            ],
-            "date": [f"{start_year}-01-01/{end_year}-12-31"],
-            "data_format": "csv"
-        }
-
-        client = cdsapi.Client(
-            timeout=60,
-            retry_max=2,
-            sleep_max=10
-        )
-
-        # --- DOWNLOAD LOOP ---
-        for idx, row in self.sites_df.iterrows():
-
-            lat = float(row["Latitude"])
-            lon = float(row["Longitude"])
-            name = row["Site Name"]
-
-            request = base_request.copy()
-            request["location"] = {"longitude": lon, "latitude": lat}
-
-            logger.info(f"Downloading {name} (lat={lat}, lon={lon})...")
-
-            result = client.retrieve(dataset, request)
-            zip_path = self.weather_data_directory / f"{name}.zip"
-            result.download(target=zip_path)
-
-            final_csv_path = self.weather_data_directory / f"{name}.csv"
-
-            # --- EXTRACT FROM DOWNLOADED ZIP ---
-            with zipfile.ZipFile(zip_path, 'r') as z:
-                csv_files = [f for f in z.namelist() if f.endswith(".csv")]
-
-                if not csv_files:
-                    raise RuntimeError(f"No CSV found in ZIP for {name}")
-
-                extracted_name = csv_files[0]
-                z.extract(extracted_name, self.weather_data_directory)
-
-                extracted_path = self.weather_data_directory / extracted_name
-
-                os.replace(extracted_path, final_csv_path) # rename csv file for convenience
+    def DownloadWindData(self, start_year, end_year, client=None, workers=4):
+        """
+        Downloads the ERA5 wind components at 100 m of all sites and consolidates the wind speeds in
+        windspeed_data.csv. The sites are requested concurrently by a DownloadManager, which resumes interrupted
+        downloads and skips sites whose data already cover the requested years.
 
-            # --- CLEANUP ---
-            zip_path.unlink()
+        Parameters:
+            start_year (int): First year to download.
+            end_year (int): Last year to download.
+            client: Client with a retrieve(dataset, request, target) method (e.g. LocalClient); CDSClient if None.
+            workers (int): Maximum number of concurrent requests.
+        """
+        variables = ["100m_u_component_of_wind", "100m_v_component_of_wind"]
+        manager = DownloadManager(self.weather_data_directory, variables, start_year, end_year, client=client, workers=workers)
+        manager.run(self.sites_df)
 
-        
         # ======================================================
         # consolidate all wind speed data into a single csv file
         # ======================================================
@@ -185,15 +155,17 @@ class Wind:
         return(self.w_sites, self.farm_name, self.zone_no, self.w_classes, self.w_turbines, \
                self.turbine_rating, self.p_class, self.out_curve2, self.out_curve3, self.start_speed)
 
-    def CalWindTrRates(self, directory, windspeed_data, pcurve_data):
+    def CalWindTrRates(self, directory, windspeed_data, pcurve_data, export_excel=True, chunk_hours=100000):
         """
         Calculates transition rate matrices for the wind farms using wind speed data downloaded from the wind toolkit.
+        The matrices are cached in t_rate.npz (see GetTrRates), and optionally exported to t_rate.xlsx.
 
         Parameters:
             directory (str): Directory to save the transition rates.
             windspeed_data (str): Path to the CSV file containing wind speed data.
-            site_data (str): Path to the CSV file containing site data.
             pcurve_data (str): Path to the CSV file containing power curve data.
+            export_excel (bool): If True, also write the human-readable t_rate.xlsx (one sheet per site).
+            chunk_hours (int): Hours of wind speed data read at a time, so that large files need not fit in memory.
 
         Returns:
             numpy.ndarray: Transition rate matrices.
@@ -208,47 +180,91 @@ class Wind:
         w_classes = len(start_speed) # no. of wind classes
 
         speed_bins = start_speed
-        wdata_df = pd.read_csv(windspeed_data, index_col=0)
         _validate_csv(windspeed_data, "windspeed_data.csv")
 
-        wdata = {col: wdata_df[col].to_numpy() for col in wdata_df.columns}
-        keys = list(wdata.keys())
-        data_len = len(next(iter(wdata.values())))
+        # count the hourly class transitions of every site, reading the wind speeds in chunks of hours
+        counts = np.zeros(w_sites*w_classes*w_classes, dtype = np.int64)
+        prev_bins = None # classes of the last hour of the previous chunk
+        for chunk in pd.read_csv(windspeed_data, index_col=0, chunksize=chunk_hours):
+            keys = list(chunk.columns)
+            if len(keys) > w_sites:
+                raise ValueError(f"windspeed_data.csv has {len(keys)} sites, wind_sites.csv has {w_sites}")
+            # class j of a speed v with speed_bins[j] <= v < speed_bins[j + 1]; speeds outside the bins are in class 0
+            bins = np.digitize(chunk.to_numpy(dtype = float), speed_bins) - 1
+            bins[(bins < 0) | (bins >= len(speed_bins) - 1)] = 0
+            if prev_bins is not None:
+                bins = np.vstack((prev_bins, bins))
+            pairs = (np.arange(len(keys))*w_classes + bins[:-1])*w_classes + bins[1:] # site, class j -> class k
+            counts += np.bincount(pairs.ravel(), minlength = counts.size)[0:counts.size]
+            prev_bins = bins[-1:]
+
+        rate_matrix = counts.reshape(w_sites, w_classes, w_classes).astype(float)
+        row_sums = rate_matrix.sum(axis = 2, keepdims = True)
+        rate_matrix = np.divide(rate_matrix, row_sums, out = np.zeros_like(rate_matrix), where = row_sums > 0)
+
+        self.SaveTrRates(directory, rate_matrix, keys, _files_digest([windspeed_data, pcurve_data]))
 
-        speedbin_values = {key: np.zeros(data_len).astype(int) for key in keys}
+        #-------------for storing transition rates in an excel file----------------
+        if export_excel:
+            k_temp = 0
+            with pd.ExcelWriter(f'{directory}/t_rate.xlsx') as writer:
+                for idx, array in enumerate(rate_matrix, start=1):
+                    sheet_name = keys[k_temp]
+                    df = pd.DataFrame(array)
+                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+                    k_temp += 1    
+        
+        logger.info("Completed processing wind data and returning transition rate matrices")
+        return(rate_matrix)
 
-        for key in wdata:
-            for i in range(data_len):
-                for j in range(len(speed_bins) - 1):
-                    if speed_bins[j] <= wdata[key][i] < speed_bins[j + 1]:
-                        speedbin_values[key][i] = j
-                        break
+    def SaveTrRates(self, directory, rate_matrix, site_names, key):
+        """
+        Saves transition rate matrices in the binary cache t_rate.npz. The file is written under a temporary name
+        and renamed, so that processes starting together never read a partial cache.
 
-        rate_matrix = np.zeros((w_sites, w_classes, w_classes))
-        s_temp = 0
-        for key in wdata:
-            for i in range(data_len - 1):
-                j = speedbin_values[key][i]
-                k = speedbin_values[key][i + 1]
-                rate_matrix[s_temp, j, k] += 1
-            s_temp += 1
+        Parameters:
+            directory (str): Wind data directory.
+            rate_matrix (array): Transition rate matrices (w_sites x w_classes x w_classes).
+            site_names (list): Site names, in the order of the matrices.
+            key (str): Digest of the source files of the matrices.
+        """
+        cache = f'{directory}/t_rate.npz'
+        np.savez(cache + f'.{os.getpid()}.tmp.npz', rates = rate_matrix, sites = np.array(site_names, dtype = str), key = key)
+        os.replace(cache + f'.{os.getpid()}.tmp.npz', cache)
 
-        for s in range(w_sites):
-            for r in range(w_classes):
-                rate_matrix[s, r] = rate_matrix[s, r]/sum(rate_matrix[s, r])
+    def GetTrRates(self, windspeed_data, pcurve_data, export_excel=False):
+        """
+        Returns the transition rate matrices of the wind farms from the binary cache t_rate.npz. The cache is keyed
+        by a digest of windspeed_data.csv and w_power_curves.csv; if it is missing or stale, the matrices are
+        calculated again with CalWindTrRates. Without wind speed data, the matrices are read from a user-provided
+        t_rate.xlsx and cached with a digest of that file.
 
-        rate_matrix = np.nan_to_num(rate_matrix)
+        Parameters:
+            windspeed_data (str): Path to the CSV file containing wind speed data.
+            pcurve_data (str): Path to the CSV file containing power curve data.
+            export_excel (bool): If True, t_rate.xlsx is written when the matrices are calculated.
 
-        #-------------for storing transition rates in an excel file----------------
-        k_temp = 0
-        with pd.ExcelWriter(f'{directory}/t_rate.xlsx') as writer:
-            for idx, array in enumerate(rate_matrix, start=1):
-                sheet_name = keys[k_temp]
-                df = pd.DataFrame(array)
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                k_temp += 1    
-        
-        logger.info("Completed processing wind data and returning transition rate matrices")
+        Returns:
+            numpy.ndarray: Transition rate matrices (w_sites x w_classes x w_classes).
+        """
+        cache = f'{self.wind_directory}/t_rate.npz'
+        excel = f'{self.wind_directory}/t_rate.xlsx'
+        from_speeds = os.path.exists(windspeed_data)
+        key = _files_digest([windspeed_data, pcurve_data] if from_speeds else [excel])
+
+        if os.path.exists(cache):
+            with np.load(cache) as stored:
+                if str(stored["key"]) == key:
+                    return(stored["rates"])
+
+        if from_speeds:
+            logger.info("Transition rate cache missing or stale, calculating transition rates from wind speed data")
+            return(self.CalWindTrRates(self.wind_directory, windspeed_data, pcurve_data, export_excel = export_excel))
+
+        logger.info("Reading transition rates from t_rate.xlsx into the cache")
+        sheets = pd.read_excel(excel, sheet_name=None)
+        rate_matrix = np.array([sheets[sheet_name].to_numpy() for sheet_name in sheets], dtype = float)
+        self.SaveTrRates(self.wind_directory, rate_matrix, list(sheets), key)
         return(rate_matrix)
 
 # if __name__ == "__main__":
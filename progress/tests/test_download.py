@@ -0,0 +1,88 @@
+import json
+from time import perf_counter
+import pandas as pd
+import pytest
+
+from progress.mod_download import DownloadManager, LocalClient
+
+VARIABLES = ["2m_temperature", "surface_solar_radiation_downwards"]
+
+def make_sites(n):
+    return(pd.DataFrame({"Site Name": [f"site_{i}" for i in range(n)], "Latitude": [33.0 + 0.1*i for i in range(n)], \
+                         "Longitude": [-113.0 - 0.1*i for i in range(n)]}))
+
+def make_manager(directory, client, workers=4):
+    return(DownloadManager(directory, VARIABLES, 2020, 2020, client=client, workers=workers))
+
+def read_state(directory):
+    with open(directory / "download_state.json") as f:
+        return(json.load(f))
+
+def test_concurrent_download(tmp_path):
+    sites, delay = make_sites(4), 0.5
+    client = LocalClient(delay=delay)
+    done = []
+
+    tic = perf_counter()
+    downloaded = make_manager(tmp_path, client, workers=4).run(sites, progress_callback=lambda: done.append(1))
+    elapsed = perf_counter() - tic
+
+    # the requests wait in the (mock) queue together, not one after the other
+    assert elapsed < 2*delay
+    assert client.requests == 4 and len(done) == 4
+    assert sorted(downloaded) == list(sites["Site Name"])
+    state = read_state(tmp_path)
+    for name in sites["Site Name"]:
+        assert state[name]["status"] == "extracted"
+        df = pd.read_csv(tmp_path / f"{name}.csv")
+        assert {"valid_time", "t2m", "ssrd"} <= set(df.columns)
+        assert not (tmp_path / f"{name}.zip").exists()
+
+def test_skip_covered_sites(tmp_path):
+    sites = make_sites(3)
+    make_manager(tmp_path, LocalClient()).run(sites)
+
+    client, done = LocalClient(), []
+    downloaded = make_manager(tmp_path, client).run(sites, progress_callback=lambda: done.append(1))
+    assert client.requests == 0 and downloaded == []
+    assert len(done) == 3
+
+    # a later end year is not covered by the files, so every site is requested again
+    client = LocalClient()
+    DownloadManager(tmp_path, VARIABLES, 2020, 2021, client=client).run(sites)
+    assert client.requests == 3
+
+def test_extract_only_resume(tmp_path):
+    sites = make_sites(2)
+    # a previous run downloaded the ZIP file of site_0 and stopped before extracting it
+    name, row = "site_0", sites.iloc[0]
+    request = {"variable": VARIABLES, "date": ["2020-01-01/2020-12-31"], "data_format": "csv", \
+               "location": {"longitude": float(row["Longitude"]), "latitude": float(row["Latitude"])}}
+    LocalClient().retrieve("", request, tmp_path / f"{name}.zip")
+    with open(tmp_path / "download_state.json", "w") as f:
+        json.dump({name: {"status": "downloaded", "years": [2020, 2020], "variables": VARIABLES}}, f)
+
+    client = LocalClient()
+    downloaded = make_manager(tmp_path, client).run(sites)
+
+    # only site_1 is requested; site_0 is extracted from its ZIP file
+    assert client.requests == 1 and downloaded == ["site_1"]
+    assert (tmp_path / f"{name}.csv").exists() and not (tmp_path / f"{name}.zip").exists()
+    assert read_state(tmp_path)[name]["status"] == "extracted"
+
+def test_retry_failed_site(tmp_path):
+    sites = make_sites(3)
+    failing = (float(sites["Latitude"][1]), float(sites["Longitude"][1]))
+
+    with pytest.raises(RuntimeError, match="site_1"):
+        make_manager(tmp_path, LocalClient(fail_sites=[failing])).run(sites)
+    state = read_state(tmp_path)
+    assert state["site_1"]["status"] == "queued"
+    assert state["site_0"]["status"] == state["site_2"]["status"] == "extracted"
+    assert not (tmp_path / "site_1.csv").exists()
+
+    # the next run submits the failed request again and skips the others
+    client = LocalClient()
+    downloaded = make_manager(tmp_path, client).run(sites)
+    assert client.requests == 1 and downloaded == ["site_1"]
+    assert read_state(tmp_path)["site_1"]["status"] == "extracted"
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from progress.mod_timeline import StateTimeline
+from progress.mod_importance import risk_hours, capacity_margin, cross_entropy_factors
+
+# small system: 8 generators of 50 MW and a daily load peak that is lost when three of them are out
+ng = 8
+pmax = np.full(ng, 50.0)
+lambda_tot, mu_tot = np.full(ng, 1/400), np.full(ng, 1/50)
+sim_hours = 24*14
+load = 200 + 60*np.clip(np.sin(2*np.pi*(np.arange(sim_hours) % 24 - 8)/24), 0, None)
+
+def estimate(samples, seed, bias_factor=None, bias_hours=None):
+    """Weighted LOLP and EUE of the capacity margin proxy, with their standard errors."""
+    timeline = StateTimeline(ng, 0, 0, lambda_tot, mu_tot, np.zeros(0), rng=np.random.default_rng(seed), bias_factor=bias_factor, \
+                             bias_hours=bias_hours)
+    lolp, eue, weights = np.zeros(samples), np.zeros(samples), np.zeros(samples)
+    for s in range(samples):
+        timeline.generate(sim_hours)
+        margin = capacity_margin(timeline, pmax, load)
+        weights[s] = timeline.weight
+        lolp[s] = weights[s]*np.mean(margin < 0)
+        eue[s] = weights[s]*np.sum(np.clip(-margin, 0, None))
+    se = lambda x: np.std(x)/np.sqrt(samples)
+    return({"LOLP": (lolp.mean(), se(lolp)), "EUE": (eue.mean(), se(eue)), "weights": weights})
+
+@pytest.fixture(scope="module")
+def plain():
+    return(estimate(8000, seed=0))
+
+@pytest.mark.parametrize("factor", [1.5, "ce"])
+def test_importance_sampling_unbiased(plain, factor):
+    bias_hours = risk_hours(load, 0.5)
+    if factor == "ce":
+        bias_factor = cross_entropy_factors(ng, 0, 0, lambda_tot, mu_tot, np.zeros(0), pmax, load, bias_hours, np.random.default_rng(1), \
+                                            pilot_samples=100, iterations=3)
+        assert np.all(bias_factor > 1)
+    else:
+        bias_factor = factor
+    biased = estimate(4000, seed=2, bias_factor=bias_factor, bias_hours=bias_hours)
+
+    # the outages are biased (the weights differ from 1), yet the weighted indices agree with plain MCS
+    assert np.std(biased["weights"]) > 0.05
+    assert np.mean(biased["weights"]) == pytest.approx(1, abs=0.05)
+    for index in ["LOLP", "EUE"]:
+        (mean_p, se_p), (mean_b, se_b) = plain[index], biased[index]
+        assert mean_p > 0
+        assert abs(mean_b - mean_p) < 4*np.hypot(se_p, se_b), f"{index}: {mean_b:.4g} (importance sampling) vs {mean_p:.4g} (plain)"
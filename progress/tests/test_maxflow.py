@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("highspy")
+
+from progress.mod_sysdata import RASystemData
+from progress.mod_matrices import RAMatrices
+from progress.mod_utilities import RAUtilities
+from progress.mod_dispatch import HighsDispatch
+from progress.mod_maxflow import MaxFlowCurtailment
+
+SYSTEM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data', 'System')
+BMva = 100
+
+def load_system(model):
+    """Bundled system data and matrices of the single-period transportation model."""
+    rasd = RASystemData('single_period', model)
+    genbus, ng, pmax, pmin, _, _, _, gencost, _ = rasd.gen(SYSTEM_DIR + '/gen.csv')
+    nl, fb, tb, cap_trans, _, _, _ = rasd.branch(SYSTEM_DIR + '/branch.csv', SYSTEM_DIR + '/bus.csv')
+    _, _, nz = rasd.bus(SYSTEM_DIR + '/bus.csv')
+    _, essbus, ness, ess_pmax, ess_pmin, ess_duration, ess_socmax, _, ess_eff, disch_cost, ch_cost, *_ = rasd.storage(SYSTEM_DIR + '/storage.csv')
+    ramat = RAMatrices(nz)
+    gen_mat = ramat.genmat(ng, np.asarray(genbus), ness, essbus)
+    cap_max, cap_min = RAUtilities().capacities(nl, pmax, pmin, ess_pmax, ess_pmin, cap_trans)
+    return({"ng": ng, "nl": nl, "nz": nz, "ness": ness, "pmax": pmax, "gencost": gencost, "ess_pmax": ess_pmax, "ess_eff": ess_eff, \
+            "ess_duration": ess_duration, "ess_socmax": ess_socmax, "disch_cost": disch_cost, "ch_cost": ch_cost, "cap_max": cap_max, \
+            "cap_min": cap_min, "gen_mat": gen_mat, "A_inc": ramat.Ainc(nl, fb, tb), "curt_mat": ramat.curtmat(nz), \
+            "ch_mat": ramat.chmat(ness, essbus, nz)})
+
+def random_hour(system, rng):
+    """
+    Random hour in which the LP keeps the ESS idle: every ESS is either out of service or full (the bundled charge
+    cost is an incentive and the discharge is dearer than generation). The lines are derated so that the network
+    limits the supply, and some zones have a renewable surplus.
+    """
+    ng, nl, nz = system["ng"], system["nl"], system["nz"]
+    state = (rng.uniform(0, 1, system["cap_max"].size) > 0.2).astype(float)
+    state[ng:ng + nl] *= 0.5
+    current_cap = {"max": state*system["cap_max"], "min": state*system["cap_min"]}
+    zone_cap = system["gen_mat"][:, 0:ng] @ system["pmax"]
+    net_load = zone_cap*rng.uniform(0.6, 1.2)*rng.uniform(0.7, 1.3, nz)
+    surplus = rng.random(nz) < 0.1
+    net_load[surplus] *= -0.5
+    ess_smax = current_cap["max"][ng + nl::]*system["ess_duration"]*system["ess_socmax"]
+    ess_smin = np.zeros(system["ness"])
+    return(current_cap, net_load, ess_smax/BMva, ess_smax, ess_smin)
+
+def bound_functions(system, current_cap, ess_smax, ess_smin):
+    ng, nl = system["ng"], system["nl"]
+    g_ub = np.concatenate((current_cap["max"][0:ng], current_cap["max"][ng + nl::]))/BMva
+    tl = current_cap["max"][ng:ng + nl]/BMva
+
+    def fb_Pg(model, i):
+        return(0, g_ub[i])
+    def fb_flow(model, i):
+        return(-tl[i], tl[i])
+    def fb_ess(model, i):
+        return(-current_cap["max"][ng + nl + i]/BMva, current_cap["min"][ng + nl + i]/BMva)
+    def fb_soc(model, i):
+        return(ess_smin[i]/BMva, ess_smax[i]/BMva)
+
+    return(fb_Pg, fb_flow, fb_ess, fb_soc)
+
+@pytest.mark.parametrize("model", ["Zonal", "Nodal"])
+def test_maxflow_matches_lp(model):
+    system = load_system(model)
+    ng, nl, nz, ness = system["ng"], system["nl"], system["nz"], system["ness"]
+    lp = HighsDispatch(ng, nz, nl, ness, BMva, system["A_inc"], system["gen_mat"], system["curt_mat"], system["ch_mat"], system["gencost"], \
+                       system["ess_pmax"], system["ess_eff"], system["disch_cost"], system["ch_cost"], False)
+    maxflow = MaxFlowCurtailment(ng, nz, nl, ness, BMva, system["A_inc"], system["gen_mat"], system["gencost"], system["ess_pmax"], \
+                                 system["ess_eff"], system["disch_cost"], system["ch_cost"])
+
+    rng = np.random.default_rng(0)
+    solved, curtailed = 0, 0
+    for _ in range(300):
+        current_cap, net_load, SOC_old, ess_smax, ess_smin = random_hour(system, rng)
+        result = maxflow.solve(current_cap, net_load, SOC_old, ess_smax, ess_smin)
+        if result is None:
+            continue
+        fb_Pg, fb_flow, fb_ess, fb_soc = bound_functions(system, current_cap, ess_smax, ess_smin)
+        load_curt, SOC_new, *_ = lp.solve(fb_ess, fb_soc, fb_Pg, fb_flow, net_load, SOC_old)
+        solved += 1
+        curtailed += load_curt > 1e-6
+        assert result[0] == pytest.approx(load_curt, abs=1e-6)
+        np.testing.assert_allclose(result[1], SOC_new, rtol=0, atol=1e-6)
+
+    # the hours solved by the max flow include curtailed ones
+    assert solved > 100 and curtailed > 10
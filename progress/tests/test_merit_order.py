@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from pyomo.environ import SolverFactory
+
+from progress.mod_utilities import RAUtilities
+
+SOLVER = "appsi_highs"
+BMva = 100
+
+pytestmark = pytest.mark.skipif(not SolverFactory(SOLVER).available(exception_flag=False), reason=f"{SOLVER} is not available")
+
+def make_system(gencost, disch_cost, charge_ratio=0.9):
+    """Small Copper Sheet system (two zones, one line) with the given generation and ESS discharge costs."""
+    gencost, disch_cost = np.array(gencost, dtype=float), np.array(disch_cost, dtype=float)
+    ng, ness, nz, nl = gencost.size, disch_cost.size, 2, 1
+    ess_eff = np.linspace(0.8, 0.9, ness)
+    system = {"ng": ng, "ness": ness, "nz": nz, "nl": nl, "gencost": gencost, "disch_cost": disch_cost, "ess_eff": ess_eff, \
+              "ch_cost": charge_ratio*ess_eff*disch_cost, "pmax": np.linspace(100, 40, ng), "ess_pmax": np.linspace(50, 30, ness), \
+              "ess_duration": np.full(ness, 4.0), "A_inc": np.array([[1.0, -1.0]]), "curt_mat": np.eye(nz), \
+              "gen_mat": np.zeros((nz, ng + ness)), "ch_mat": np.zeros((nz, ness))}
+    system["gen_mat"][np.arange(ng + ness) % nz, np.arange(ng + ness)] = 1
+    system["ch_mat"][np.arange(ness) % nz, np.arange(ness)] = 1
+    assert RAUtilities().MeritOrderApplicable(gencost, np.zeros(ness), ess_eff, disch_cost, system["ch_cost"])
+    return(system)
+
+def random_hours(system, rng, hours, load_level=(0.2, 1.3), outage_prob=0.2):
+    """Random capacities, net loads, SOC limits and initial SOC of the system."""
+    ng, ness, nz, nl = system["ng"], system["ness"], system["nz"], system["nl"]
+    cap_full = np.concatenate((system["pmax"], [50.0]*nl, system["ess_pmax"]))
+    for _ in range(hours):
+        state = (rng.uniform(0, 1, cap_full.size) > outage_prob).astype(float)
+        current_cap = {"max": state*cap_full, "min": np.zeros(cap_full.size)}
+        net_load = system["pmax"].sum()*rng.uniform(*load_level)*rng.dirichlet(np.ones(nz))
+        ess_smax = current_cap["max"][ng + nl::]*system["ess_duration"]
+        ess_smin = 0.1*ess_smax
+        SOC_old = rng.uniform(ess_smin, ess_smax)/BMva
+        yield current_cap, net_load, SOC_old, ess_smax, ess_smin
+
+def lp_dispatch(raut, system, current_cap, net_load, SOC_old, ess_smax, ess_smin):
+    ng, ness, nz, nl = system["ng"], system["ness"], system["nz"], system["nl"]
+    g_ub = np.concatenate((current_cap["max"][0:ng], current_cap["max"][ng + nl::]))/BMva
+
+    def fb_Pg(model, i):
+        return(0, g_ub[i])
+    def fb_flow(model, i):
+        return(-current_cap["max"][ng + i]/BMva, current_cap["max"][ng + i]/BMva)
+    def fb_ess(model, i):
+        return(-current_cap["max"][ng + nl + i]/BMva, current_cap["min"][ng + nl + i]/BMva)
+    def fb_soc(model, i):
+        return(ess_smin[i]/BMva, ess_smax[i]/BMva)
+
+    return(raut.OptDispatch(ng, nz, nl, ness, fb_ess, fb_soc, BMva, fb_Pg, fb_flow, system["A_inc"], system["gen_mat"], system["curt_mat"], \
+                            system["ch_mat"], system["gencost"], net_load, SOC_old, system["ess_pmax"], system["ess_eff"], \
+                            system["disch_cost"], system["ch_cost"], True))
+
+def compare(system, hours, seed):
+    """Dispatches random hours with OptDispatch, MeritOrderDispatch and MeritOrderDispatchBatch."""
+    raut = RAUtilities(dispatch_solver=SOLVER)
+    costs = (system["gencost"], system["ess_pmax"], system["ess_eff"], system["disch_cost"], system["ch_cost"])
+    data = list(random_hours(system, np.random.default_rng(seed), hours))
+
+    lp, single = [], []
+    for current_cap, net_load, SOC_old, ess_smax, ess_smin in data:
+        lp.append(lp_dispatch(raut, system, current_cap, net_load, SOC_old, ess_smax, ess_smin))
+        single.append(raut.MeritOrderDispatch(system["ng"], system["nl"], BMva, current_cap, net_load, SOC_old, ess_smax, ess_smin, *costs))
+
+    cap_max, net_load, SOC_old, ess_smax, ess_smin = (np.array([h[0]["max"] for h in data]), *(np.array([h[i] for h in data]) for i in range(1, 5)))
+    solved, load_curt, SOC_new, P_dis, P_ch, _ = raut.MeritOrderDispatchBatch(system["ng"], system["nl"], BMva, cap_max, net_load, SOC_old, \
+                                                                              ess_smax, ess_smin, *costs)
+    assert solved.all()
+    # the single-hour dispatch is the batch dispatch of one hour
+    np.testing.assert_allclose([s[0] for s in single], load_curt, rtol=0, atol=1e-12)
+    np.testing.assert_allclose([s[1] for s in single], SOC_new, rtol=0, atol=1e-12)
+    lp = {"load_curt": np.array([h[0] for h in lp]), "SOC": np.array([h[1] for h in lp]), "P_dis": np.array([h[2] for h in lp]), \
+          "P_ch": np.array([h[3] for h in lp])}
+    merit = {"load_curt": load_curt, "SOC": SOC_new, "P_dis": P_dis, "P_ch": P_ch, "smin": ess_smin/BMva, "smax": ess_smax/BMva}
+    return(lp, merit)
+
+def test_merit_order_matches_lp():
+    lp, merit = compare(make_system([1, 3, 5, 8], [4, 6]), hours=150, seed=0)
+
+    # the random hours cover charging, discharging and curtailment
+    assert np.any(lp["P_ch"] < -1e-6) and np.any(lp["P_dis"] > 1e-6) and np.any(lp["load_curt"] > 1e-6)
+    np.testing.assert_allclose(merit["load_curt"], lp["load_curt"], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(merit["SOC"], lp["SOC"], rtol=0, atol=1e-6)
+
+def test_merit_order_ties():
+    # generators with equal costs, and ESS with equal discharge costs: the LP optimum is not unique, so only the
+    # load curtailment and the total charge and discharge (which set the cost) are compared, per ESS the limits
+    system = make_system([1, 1, 3, 3], [2, 2])
+    system["ess_eff"] = np.full(2, 0.85)
+    system["ch_cost"] = 0.9*system["ess_eff"]*system["disch_cost"]
+    lp, merit = compare(system, hours=150, seed=1)
+
+    assert np.any(lp["P_ch"] < -1e-6) and np.any(lp["P_dis"] > 1e-6) and np.any(lp["load_curt"] > 1e-6)
+    np.testing.assert_allclose(merit["load_curt"], lp["load_curt"], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(merit["P_dis"].sum(axis=1), lp["P_dis"].sum(axis=1), rtol=0, atol=1e-6)
+    np.testing.assert_allclose(merit["P_ch"].sum(axis=1), lp["P_ch"].sum(axis=1), rtol=0, atol=1e-6)
+    np.testing.assert_allclose(merit["SOC"].sum(axis=1), lp["SOC"].sum(axis=1), rtol=0, atol=1e-6)
+    assert np.all(merit["SOC"] >= merit["smin"] - 1e-9) and np.all(merit["SOC"] <= merit["smax"] + 1e-9)
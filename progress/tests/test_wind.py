@@ -0,0 +1,66 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+
+from progress.mod_wind import Wind
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data', 'Wind')
+
+def loop_tr_rates(windspeed_data, pcurve_data, w_sites):
+    """Transition rates as calculated by the per-class loops that CalWindTrRates replaced."""
+    speed_bins = pd.read_csv(pcurve_data)['Start (m/s)'].values
+    w_classes = len(speed_bins)
+    wdata_df = pd.read_csv(windspeed_data, index_col=0)
+    wdata = {col: wdata_df[col].to_numpy() for col in wdata_df.columns}
+    data_len = len(next(iter(wdata.values())))
+
+    speedbin_values = {key: np.zeros(data_len).astype(int) for key in wdata}
+    for key in wdata:
+        for i in range(data_len):
+            for j in range(len(speed_bins) - 1):
+                if speed_bins[j] <= wdata[key][i] < speed_bins[j + 1]:
+                    speedbin_values[key][i] = j
+                    break
+
+    rate_matrix = np.zeros((w_sites, w_classes, w_classes))
+    for s, key in enumerate(wdata):
+        for i in range(data_len - 1):
+            rate_matrix[s, speedbin_values[key][i], speedbin_values[key][i + 1]] += 1
+    with np.errstate(invalid='ignore'):
+        for s in range(w_sites):
+            for r in range(w_classes):
+                rate_matrix[s, r] = rate_matrix[s, r]/sum(rate_matrix[s, r])
+    return(np.nan_to_num(rate_matrix))
+
+@pytest.fixture
+def wind_dir(tmp_path):
+    """Bundled wind sites and power curves with synthetic wind speeds, including bin edges, NaN and out-of-range speeds."""
+    for f in ['wind_sites.csv', 'w_power_curves.csv']:
+        shutil.copy(os.path.join(DATA_DIR, f), tmp_path / f)
+    sites = pd.read_csv(tmp_path / 'wind_sites.csv', encoding='utf-8-sig')['Site Name']
+    start_speed = pd.read_csv(tmp_path / 'w_power_curves.csv', encoding='utf-8-sig')['Start (m/s)'].values
+
+    rng = np.random.default_rng(0)
+    hours = 500
+    speeds = np.clip(8 + np.cumsum(rng.normal(0, 1.5, (hours, len(sites))), axis=0), -2, 40)
+    speeds[rng.random(speeds.shape) < 0.05] = np.nan
+    edges = rng.random(speeds.shape) < 0.05
+    speeds[edges] = rng.choice(start_speed, edges.sum())
+    df = pd.DataFrame(speeds.round(2), columns=sites)
+    df.insert(0, 'datetime', pd.date_range('2020-01-01', periods=hours, freq='h'))
+    df.to_csv(tmp_path / 'windspeed_data.csv', index=False)
+    return(tmp_path)
+
+@pytest.mark.parametrize("chunk_hours", [100000, 7])
+def test_tr_rates_match_loop(wind_dir, chunk_hours):
+    wind = Wind(str(wind_dir))
+    windspeed_data, pcurve_data = str(wind_dir / 'windspeed_data.csv'), str(wind_dir / 'w_power_curves.csv')
+    rates = wind.CalWindTrRates(str(wind_dir), windspeed_data, pcurve_data, export_excel=False, chunk_hours=chunk_hours)
+
+    expected = loop_tr_rates(windspeed_data, pcurve_data, rates.shape[0])
+    np.testing.assert_allclose(rates, expected, rtol=0, atol=1e-12)
+    # every visited class has a probability row
+    assert np.allclose(rates.sum(axis=2)[rates.sum(axis=2) > 0], 1)
+    np.testing.assert_array_equal(wind.GetTrRates(windspeed_data, pcurve_data), rates)
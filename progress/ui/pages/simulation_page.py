@@ -1,5 +1,5 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QFileDialog, QDialog, QPushButton
-from PySide6.QtCore import QDate, QSettings, QTimer, Qt
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QFileDialog, QDialog, QPushButton, QFrame, QHBoxLayout, QLabel, QSpinBox
+from PySide6.QtCore import QDate, QSettings, QTimer, Qt, QSize
 from progress.ui.forms.simulation.ui_simulation import Ui_SimulationPage
 from progress.ui.forms.simulation.ui_pcm_config import Ui_PCMConfigPage
 from progress.ui.utils.worker import ProcessingThread
@@ -11,6 +11,7 @@ from dataclasses import dataclass
 from pathlib import Path
 import datetime
 import logging
+import os
 from ruamel.yaml import YAML
 from ruamel.yaml.scalarstring import SingleQuotedScalarString
 import yaml
@@ -138,6 +139,7 @@ class MCSConfig:
     degradation_interval: int = 1000
     detailed_thermal_model: bool = False
     DC_load: bool = True
+    workers: int = 1
 
     @classmethod
     def from_yaml(cls):
@@ -149,7 +151,7 @@ class MCSConfig:
     def save(self, path=None):
         """Write MCSConfig fields into the YAML config file, preserving comments and non-config keys.
 
-        Uses ruamel.yaml to perform a round-trip update of input.yaml. Only the 9 fields
+        Uses ruamel.yaml to perform a round-trip update of input.yaml. Only the 10 fields
         defined on MCSConfig are overwritten; all other keys (data, download_w, n_clusters,
         etc.) and any YAML comments remain untouched.
 
@@ -184,6 +186,7 @@ class SimulationPage(QWidget):
         self.config = MCSConfig.from_yaml()
         self._sim_stopped = False
         self.setMinimumHeight(0)
+        self._add_workers_setting()
 
         # ==== connections ====
         self.ui.radio_degradation_eval_true.clicked.connect(self._update_frame_visibility)
@@ -213,8 +216,33 @@ class SimulationPage(QWidget):
         self._populate_gui()
         self._update_frame_visibility()
 
+    def _add_workers_setting(self):
+        # worker processes row, placed below the samples row
+        self.ui.frame_workers = QFrame(self.ui.frame_progress_params)
+        self.ui.frame_workers.setObjectName("frame_workers")
+        self.ui.frame_workers.setFrameShape(QFrame.NoFrame)
+        layout = QHBoxLayout(self.ui.frame_workers)
+        layout.setContentsMargins(-1, 0, -1, 0)
+        self.ui.label_workers = QLabel("Worker Processes", self.ui.frame_workers)
+        self.ui.label_workers.setMinimumSize(QSize(140, 0))
+        layout.addWidget(self.ui.label_workers)
+        self.ui.spinBox_workers = QSpinBox(self.ui.frame_workers)
+        self.ui.spinBox_workers.setObjectName("spinBox_workers")
+        self.ui.spinBox_workers.setRange(1, os.cpu_count() or 1)
+        layout.addWidget(self.ui.spinBox_workers)
+        self.ui.btn_info_workers = QPushButton(self.ui.frame_workers)
+        self.ui.btn_info_workers.setObjectName("btn_info_workers")
+        self.ui.btn_info_workers.setIcon(self.ui.btn_info_samples.icon())
+        self.ui.btn_info_workers.setIconSize(QSize(40, 40))
+        self.ui.btn_info_workers.setFlat(True)
+        layout.addWidget(self.ui.btn_info_workers)
+        index = self.ui.verticalLayout_2.indexOf(self.ui.frame_samples)
+        self.ui.verticalLayout_2.insertWidget(index + 1, self.ui.frame_workers)
+        self.ui.btn_info_workers.clicked.connect(self._display_workers_info)
+
     def _populate_gui(self):
         self.ui.lineEdit_samples.setText(str(self.config.samples))
+        self.ui.spinBox_workers.setValue(self.config.workers)
         self.ui.lineEdit_hours.setText(str(self.config.sim_hours))
         self.ui.lineEdit_load_factor.setText(str(self.config.load_factor))
         self.ui.comboBox_model_type.setCurrentText(MODEL_MAP_REV[self.config.model])
@@ -249,6 +277,9 @@ class SimulationPage(QWidget):
     def _display_samples_info(self, checked: bool = False) -> None:
         msgbox.information(self, "Samples", "Number of Monte Carlo samples to run. Each sample represents one year of simulated operation.")
 
+    def _display_workers_info(self, checked: bool = False) -> None:
+        msgbox.information(self, "Worker Processes", "Number of local processes the Monte Carlo samples are distributed over. Each process simulates whole samples with its own random stream. Use 1 to run all samples in a single process.")
+
     def _display_hours_info(self, checked: bool = False) -> None:
         msgbox.information(self, "Simulation Hours", "Total number of simulation hours for each sample. 1 non-leap year = 8760 hours.")
 
@@ -333,6 +364,7 @@ class SimulationPage(QWidget):
             degradation_interval=degradation_interval,
             detailed_thermal_model=self._check_thermal_model_selection(),
             DC_load=self.ui.radio_dc_load_true.isChecked(),
+            workers=self.ui.spinBox_workers.value(),
         )
         self.config = config
         config.save()
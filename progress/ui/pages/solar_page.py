@@ -28,6 +28,7 @@ class SolarResultsPage(QWidget):
 class SolarPage(QWidget):
     clusters_skipped = Signal()
     clusters_generated = Signal()
+    site_processed = Signal()
 
     def __init__(self, data_handler: DataHandler):
         super().__init__()
@@ -43,6 +44,8 @@ class SolarPage(QWidget):
         self._cluster_page_unlocked = False
         self._clusters_ready = False
         self._processing = False
+        self._sites_done = 0
+        self._progress_btn = "btn_download_solar"
 
         # UI initialization
         self.ui.spin_box_num_cluster.setValue(0)
@@ -56,6 +59,7 @@ class SolarPage(QWidget):
         self.ui.label_hint_selection.setVisible(True)
 
         self.destroyed.connect(self._cleanup_worker_threads)
+        self.site_processed.connect(self._on_site_processed)
 
         # ========= CONNECTIONS =========
         # ---- data page connections ----
@@ -283,11 +287,15 @@ class SolarPage(QWidget):
     def _run_solar_download(self, start_year: int, end_year: int) -> None:
         config = load_config()
         solar_dir = Path(config['data']) / 'Solar'
-        self._solar = Solar(str(solar_dir), config['model'])
+        self._solar = Solar(str(solar_dir), config['model'], storage_format=config.get('storage_format', 'csv'))
         self.data_handler.solar_directory = solar_dir
+        self._start_site_progress("btn_download_solar")
 
         self._stop_thread(getattr(self, '_download_thread', None))
-        self._download_thread = WorkerThread(self._solar.run_pipeline, start_year, end_year)
+        # the callback runs in the worker thread; the signal carries it to the GUI thread
+        self._download_thread = WorkerThread(self._solar.run_pipeline, start_year, end_year,
+                                             config.get('download_workers', 4), config.get('pv_processes', 1),
+                                             self.site_processed.emit)
         self._download_thread.success.connect(self._on_download_success)
         self._download_thread.error.connect(self._on_download_error)
         self._track_thread(self._download_thread)
@@ -348,7 +356,7 @@ class SolarPage(QWidget):
         gen_all_sites_path = solar_dir / 'gen_all_sites.csv'
 
         if gen_all_sites_path.exists():
-            self._solar = Solar(str(solar_dir), config['model'])
+            self._solar = Solar(str(solar_dir), config['model'], storage_format=config.get('storage_format', 'csv'))
             self.data_handler.solar_directory = solar_dir
             self._cluster_page_unlocked = True
             self._update_page_navigation_ui(self.ui.solarStackedWidget.currentIndex())
@@ -376,24 +384,40 @@ class SolarPage(QWidget):
     def _run_solar_processing(self) -> None:
         config = load_config()
         solar_dir = Path(config['data']) / 'Solar'
-        self._solar = Solar(str(solar_dir), config['model'])
+        self._solar = Solar(str(solar_dir), config['model'], storage_format=config.get('storage_format', 'csv'))
         self.data_handler.solar_directory = solar_dir
+        self._start_site_progress("btn_validate_own_data")
 
         self._stop_thread(getattr(self, '_processing_thread', None))
-        self._processing_thread = WorkerThread(self._solar.run_pipeline_gui)
+        self._processing_thread = WorkerThread(self._solar.run_pipeline_gui, config.get('pv_processes', 1),
+                                               self.site_processed.emit)
         self._processing_thread.success.connect(self._on_processing_success)
         self._processing_thread.error.connect(self._on_processing_error)
         self._track_thread(self._processing_thread)
         self._processing_thread.start()
 
+    def _start_site_progress(self, btn_name: str) -> None:
+        self._sites_done = 0
+        self._progress_btn = btn_name
+
+    def _on_site_processed(self) -> None:
+        self._sites_done += 1
+        n_sites = self._solar.n_sites if self._solar is not None else 0
+        logger.info(f"Solar generation modeled for {self._sites_done}/{n_sites} sites")
+        btn = getattr(self.ui, self._progress_btn, None)
+        if btn is not None:
+            btn.setText(f"Modeling sites {self._sites_done}/{n_sites}...")
+
     def _on_processing_success(self) -> None:
         self._processing = False
+        self.ui.btn_validate_own_data.setText("Validate Uploaded Data")
         self._cluster_page_unlocked = True
         self._update_page_navigation_ui(self.ui.solarStackedWidget.currentIndex())
         msgbox.information(self, "Solar Processing", "Solar data processing completed.")
 
     def _on_processing_error(self, error_msg: str) -> None:
         self._processing = False
+        self.ui.btn_validate_own_data.setText("Validate Uploaded Data")
         msgbox.critical(self, "Solar Processing Error",
             f"Solar data processing failed:\n{error_msg}\n\n"
             "This typically means weather data files (solar_weather_data/*_gen.csv) are missing. "
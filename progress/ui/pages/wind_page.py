@@ -10,8 +10,6 @@ from progress.utils.data_validator import validate_domain
 from progress.ui import msgbox
 from pathlib import Path
 import datetime
-import pandas as pd
-import numpy as np
 import yaml
 import logging
 
@@ -53,7 +51,7 @@ class WindPage(QWidget):
         if self._t_rate_ready:
             return True
         wind_dir = self.data_handler.wind_directory
-        if wind_dir and (Path(wind_dir) / 't_rate.xlsx').exists():
+        if wind_dir and (Path(wind_dir) / 't_rate.npz').exists():
             self._t_rate_ready = True
             return True
         return False
@@ -172,21 +170,16 @@ class WindPage(QWidget):
 
         config = load_config()
         wind_dir = Path(config['data']) / 'Wind'
-        t_rate_path = wind_dir / 't_rate.xlsx'
 
-        if t_rate_path.exists():
-            self.data_handler.wind_directory = wind_dir
-            self.wind_tr_rate = str(t_rate_path)
-            tr_mats = pd.read_excel(t_rate_path, sheet_name=None)
-            self.data_handler.tr_mats = np.array([tr_mats[sheet].to_numpy() for sheet in tr_mats])
-            self._t_rate_ready = True
-            self.wind_ready.emit()
+        if (wind_dir / 't_rate.npz').exists():
             msgbox.information(self, "Wind Data Download",
-                "Successfully downloaded data. Transition rate file (t_rate.xlsx) already exists. It is OK to continue to the simulation.")
+                "Successfully downloaded data. Transition rates (t_rate.npz) already exist and will be loaded, "
+                "or calculated again if the wind data has changed.")
+            self._run_wind_process()
         else:
             self.ui.frame_process_wind.setVisible(True)
             msgbox.information(self, "Wind Data Download",
-                "Successfully downloaded data. You must process wind data to generate transition rate metrics (t_rate.xlsx) in order to proceed.")
+                "Successfully downloaded data. You must process wind data to generate transition rate metrics (t_rate.npz) in order to proceed.")
 
     def _on_wind_download_error(self, error_msg: str) -> None:
         self._processing = False
@@ -222,28 +215,22 @@ class WindPage(QWidget):
         self.wind_sites: str = str(wind_dir / 'wind_sites.csv')
         self.wind_power_curves: str = str(wind_dir / 'w_power_curves.csv')
         self.windspeed_data: str = str(wind_dir / 'windspeed_data.csv')
-        self.wind_tr_rate: str = str(wind_dir / 't_rate.xlsx')
 
-        self._process_thread = WorkerThread(
-            self._wind.CalWindTrRates,
-            wind_dir,
-            self.windspeed_data,
-            self.wind_power_curves
-        )
+        self._process_thread = WorkerThread(self._load_tr_rates)
 
-        self._process_thread.success.connect(
-            lambda: self._on_wind_process_success(self.wind_tr_rate)
-        )
+        self._process_thread.success.connect(self._on_wind_process_success)
         self._process_thread.error.connect(self._on_wind_process_error)
         self._process_thread.start()
 
 
-    def _on_wind_process_success(self, wind_tr_rate: str) -> None:
+    def _load_tr_rates(self) -> None:
+        # reads t_rate.npz, or calculates the rates again (and exports t_rate.xlsx) if it is missing or stale
+        self.data_handler.tr_mats = self._wind.GetTrRates(self.windspeed_data, self.wind_power_curves, export_excel=True)
+
+    def _on_wind_process_success(self) -> None:
         self._processing = False
         self.ui.btn_process_wind.setEnabled(True)
         self.ui.btn_process_wind.setText("Process Wind Data")
-        tr_mats = pd.read_excel(wind_tr_rate, sheet_name=None)
-        self.data_handler.tr_mats = np.array([tr_mats[sheet].to_numpy() for sheet in tr_mats])
         self._t_rate_ready = True
         self.wind_ready.emit()
         logger.info("Successfully processed data can proceed to simulation")
@@ -272,21 +259,16 @@ class WindPage(QWidget):
             msgbox.warning(self, "Wind Data Validation", msg)
 
         wind_dir = Path(config['data']) / 'Wind'
-        t_rate_path = wind_dir / 't_rate.xlsx'
 
-        if t_rate_path.exists():
-            self.data_handler.wind_directory = wind_dir
-            self.wind_tr_rate = str(t_rate_path)
-            tr_mats = pd.read_excel(t_rate_path, sheet_name=None)
-            self.data_handler.tr_mats = np.array([tr_mats[sheet].to_numpy() for sheet in tr_mats])
-            self._t_rate_ready = True
-            self.wind_ready.emit()
+        if (wind_dir / 't_rate.npz').exists():
             msgbox.information(self, "Wind Data Validation",
-                "User Wind data is valid and transition rate file (t_rate.xlsx) already exists. OK to continue to simulation.")
+                "User Wind data is valid and transition rates (t_rate.npz) already exist. They will be loaded, "
+                "or calculated again if the wind data has changed.")
+            self._user_data_run_wind_process()
         else:
             self.ui.frame_process_wind.setVisible(True)
             msgbox.information(self, "Wind Data Validation",
-                "Wind data is valid. You must process wind data to generate transition rate metrics (t_rate.xlsx) in order to proceed.")
+                "Wind data is valid. You must process wind data to generate transition rate metrics (t_rate.npz) in order to proceed.")
     
     def _user_data_run_wind_process(self) -> None:
         config = load_config()
@@ -297,27 +279,17 @@ class WindPage(QWidget):
         self.wind_sites: str = str(wind_dir / 'wind_sites.csv')
         self.wind_power_curves: str = str(wind_dir / 'w_power_curves.csv')
         self.windspeed_data: str = str(wind_dir / 'windspeed_data.csv')
-        self.wind_tr_rate: str = str(wind_dir / 't_rate.xlsx')
 
-        self._process_thread = WorkerThread(
-            self._wind.CalWindTrRates,
-            wind_dir,
-            self.windspeed_data,
-            self.wind_power_curves
-        )
+        self._process_thread = WorkerThread(self._load_tr_rates)
 
-        self._process_thread.success.connect(
-            lambda: self._on_wind_process_user_data_success(self.wind_tr_rate)
-        )
+        self._process_thread.success.connect(self._on_wind_process_user_data_success)
         self._process_thread.error.connect(self._on_wind_process_user_data_error)
         self._process_thread.start()
 
-    def _on_wind_process_user_data_success(self, wind_tr_rate: str) -> None:
+    def _on_wind_process_user_data_success(self) -> None:
         self._processing = False
         self.ui.btn_process_wind.setEnabled(True)
         self.ui.btn_process_wind.setText("Process Wind Data")
-        tr_mats = pd.read_excel(wind_tr_rate, sheet_name=None)
-        self.data_handler.tr_mats = np.array([tr_mats[sheet].to_numpy() for sheet in tr_mats])
         self._t_rate_ready = True
         self.wind_ready.emit()
         msgbox.critical(self, "Wind Data Download", f"Successfully processed data can proceed to simulation")